@@ -2,9 +2,18 @@
 
 # analyze/analyzer.py
 
+import hashlib
 import re
-from analyze.patterns import PATTERN_SEQUENCE
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator
+
+from analyze import patterns
+from analyze.parser import parse_folder_name
+from analyze.patterns import PARSER_VERSION, PATTERN_SEQUENCE
+from analyze.profiler import PatternProfiler
+from config import ANALYZE_CHUNK_SIZE, LOG_DIR
 from db.handler import get_connection
+from db.migrator import add_column_if_missing, ensure_draft_name_triggers
 
 
 # プレフィックス除去（例：〔非表示〕）
@@ -20,7 +29,13 @@ def strip_suffix_id(name: str) -> str:
 
 # 最初にマッチしたパターンを適用
 def try_match(name: str) -> dict | None:
-    "🍣"
+    """
+    🍣 フォルダ名を構文解析して groupdict を返す
+    - 標準のパターン列なら区切り記号ベースのパーサ（バックトラックなし）で解析する
+    - PATTERN_SEQUENCE が差し替えられている場合は正規表現を順に試す
+    """
+    if PATTERN_SEQUENCE is patterns.PATTERN_SEQUENCE:
+        return parse_folder_name(name)
     for pattern in PATTERN_SEQUENCE:
         match = pattern.match(name)
         if match:
@@ -28,51 +43,193 @@ def try_match(name: str) -> dict | None:
     return None
 
 
+def name_hash(original_name: str) -> str:
+    "解析元の original_name のハッシュ（変更検出用）"
+    return hashlib.blake2b(original_name.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def analyze_name(
+    original_name: str, matcher: Callable[[str], dict | None] | None = None
+) -> dict | None:
+    """
+    original_name からプレフィックス・#id を除去して構文解析する
+    - matcher を渡すと try_match の代わりに使う（PatternProfiler.match など）
+    """
+    name = strip_prefix(original_name)
+    name = strip_suffix_id(name)
+    return (matcher or try_match)(name)
+
+
+def analyze_chunk(
+    rows: list[tuple[int, str]], matcher: Callable[[str], dict | None] | None = None
+) -> list[tuple]:
+    """
+    (work_id, original_name) のチャンクを解析し、works_draft の upsert 用パラメータを返す
+    - プロセスプールのワーカーで実行される（DB には触れない）
+    - 解析できなかった名前は結果に含めない
+    - 名前のハッシュと PARSER_VERSION も一緒に返し、次回以降の差分判定に使う
+    """
+    params = []
+    for work_id, original_name in rows:
+        parsed = analyze_name(original_name, matcher)
+        if not parsed:
+            continue
+        params.append(
+            (
+                work_id,
+                parsed.get("circle"),
+                parsed.get("author"),
+                parsed.get("source"),
+                parsed.get("type"),
+                parsed.get("title"),
+                name_hash(original_name),
+                PARSER_VERSION,
+            )
+        )
+    return params
+
+
+def profile_chunk(
+    rows: list[tuple[int, str]], profiler: PatternProfiler
+) -> tuple[list[tuple], PatternProfiler]:
+    "ワーカー用: profiler で計測しながら analyze_chunk し、(結果, 計測値) を返す"
+    return analyze_chunk(rows, profiler.match), profiler
+
+
+def iter_analyzed_chunks(
+    rows: list[tuple[int, str]],
+    workers: int,
+    chunk_size: int,
+    profiler: PatternProfiler | None = None,
+) -> Iterator[list[tuple]]:
+    """
+    rows を chunk_size 件ずつ解析し、チャンクごとの結果を入力順に返す
+    - workers > 1 ならプロセスプールに分散する（結果の受け取りは呼び出し元の1スレッドのみ）
+    - profiler を渡すと、各ワーカーで計測しながら解析し、計測値を profiler に合算する
+    - adaptive な profiler はチャンクごとに適用順を見直すため、このプロセスで順に解析する
+    """
+    chunks = [rows[i : i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    adaptive = profiler is not None and profiler.adaptive
+    if workers <= 1 or len(chunks) <= 1 or adaptive:
+        for chunk in chunks:
+            if profiler is None:
+                yield analyze_chunk(chunk)
+                continue
+            yield analyze_chunk(chunk, profiler.match)
+            profiler.reorder()
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        if profiler is None:
+            yield from executor.map(analyze_chunk, chunks)
+            return
+        measuring = [profiler.fresh() for _ in chunks]
+        for params, measured in executor.map(profile_chunk, chunks, measuring):
+            profiler.merge(measured)
+            yield params
+
+
+def ensure_draft_columns(conn):
+    "works_draft に差分判定用の列（migration 5）とトリガー（migration 13）が無ければ追加する"
+    add_column_if_missing(conn, "works_draft", "name_hash", "TEXT")
+    add_column_if_missing(conn, "works_draft", "parser_version", "INTEGER")
+    ensure_draft_name_triggers(conn)
+
+
+def select_changed_works(cur, full: bool = False) -> tuple[list[tuple[int, str]], int]:
+    """
+    pending の works のうち、再解析が必要なものを (work_id, original_name) で返す
+    - draft が無い / name_hash が無い / parser_version が古い ものが対象
+      （original_name が変わると migration 13 のトリガーが name_hash を消す）
+    - 絞り込みは SQL で行い、変更のない作品は DB から読み出さない
+    - full=True なら全件を対象にする
+    戻り値は (対象一覧, スキップ件数)
+    """
+    cur.execute(
+        """
+        SELECT w.id, w.original_name
+        FROM works w
+        LEFT JOIN works_draft d ON d.work_id = w.id
+        WHERE w.status = 'pending'
+          AND (
+            ? OR d.work_id IS NULL OR d.name_hash IS NULL OR d.parser_version IS NOT ?
+          )
+        """,
+        (full, PARSER_VERSION),
+    )
+    targets = [(row["id"], row["original_name"]) for row in cur.fetchall()]
+    pending = cur.execute("SELECT COUNT(*) FROM works WHERE status = 'pending'").fetchone()[0]
+    return targets, pending - len(targets)
+
+
 # works → works_draft を生成・更新
-def parse_original_names():
-    "🍣"
+def parse_original_names(
+    workers: int = 1,
+    chunk_size: int = ANALYZE_CHUNK_SIZE,
+    full: bool = False,
+    profile: bool = False,
+    adaptive: bool = False,
+):
+    """
+    🍣 pending の works を解析して works_draft に upsert する
+
+    - 前回の解析から original_name も PARSER_VERSION も変わっていない作品はスキップする
+      （full=True なら全件を再解析）
+    - 解析（純粋な文字列処理）は workers 個のプロセスに chunk_size 件ずつ分散する
+    - DB への書き込みはこのプロセスの1接続だけが行い、チャンクごとに executemany する
+    - profile=True なら try_match と同じ解析器をパターン別に計測し、レポートを LOG_DIR に保存する
+      （ワーカーごとの計測値を合算するので、並列解析のまま計測できる）
+    - adaptive=True はライブラリとして PATTERN_SEQUENCE を差し替えて呼ぶ場合のための指定で、
+      一致率に応じて結果が変わらない範囲で適用順を入れ替える（このときは1プロセスで解析）。
+      標準の区切り記号パーサは先頭文字で構文を選ぶため、適用順の入れ替えは無い（CLI には無い）
+    """
+    profiler = None
+    if profile or adaptive:
+        profiler = PatternProfiler(PATTERN_SEQUENCE, adaptive=adaptive)
+
     with get_connection() as conn:
         cur = conn.cursor()
 
-        cur.execute("SELECT id, original_name FROM works WHERE status = 'pending'")
-        rows = cur.fetchall()
+        ensure_draft_columns(conn)
+        rows, skipped = select_changed_works(cur, full=full)
 
         print(f"🔍 解析対象: {len(rows)} 件")
+        if skipped:
+            print(f"⏭ 変更なしのためスキップ: {skipped} 件")
+        if adaptive and not profiler.adaptive:
+            print("ℹ️ 区切り記号パーサは先頭文字で構文を選ぶため、適用順の入れ替えは行いません")
+        if profiler is not None and profiler.adaptive:
+            print("🔀 適用順を見直しながら解析するため1プロセスで解析します")
+        elif workers > 1:
+            print(f"⚙️ 並列解析: {workers} プロセス（{chunk_size} 件/チャンク）")
 
         inserted = 0
 
-        for row in rows:
-            work_id = row["id"]
-            name = strip_prefix(row["original_name"])
-            name = strip_suffix_id(name)
-
-            parsed = try_match(name)
-            if not parsed:
+        for params in iter_analyzed_chunks(rows, workers, chunk_size, profiler):
+            if not params:
                 continue
-
-            cur.execute(
+            cur.executemany(
                 """
                 INSERT INTO works_draft (
-                    work_id, circle_raw, author_raw, source_raw, type_raw, title_raw
-                ) VALUES (?, ?, ?, ?, ?, ?)
+                    work_id, circle_raw, author_raw, source_raw, type_raw, title_raw,
+                    name_hash, parser_version
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                 ON CONFLICT(work_id) DO UPDATE SET
                     circle_raw = excluded.circle_raw,
                     author_raw = excluded.author_raw,
                     source_raw = excluded.source_raw,
                     type_raw = excluded.type_raw,
-                    title_raw = excluded.title_raw
+                    title_raw = excluded.title_raw,
+                    name_hash = excluded.name_hash,
+                    parser_version = excluded.parser_version
             """,
-                (
-                    work_id,
-                    parsed.get("circle"),
-                    parsed.get("author"),
-                    parsed.get("source"),
-                    parsed.get("type"),
-                    parsed.get("title"),
-                ),
+                params,
             )
-
-            inserted += 1
+            inserted += len(params)
 
         conn.commit()
         print(f"✅ 構文解析完了: {inserted} 件の draft を登録")
+
+    if profiler is not None:
+        profiler.print_report()
+        print(f"📝 計測レポート: {profiler.write_report(LOG_DIR)}")
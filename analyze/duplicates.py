@@ -0,0 +1,333 @@
+"🍣"
+
+# analyze/duplicates.py
+#
+# 重複ダウンロード候補の検出（文字 n-gram の MinHash + LSH）
+# - 作品ごとの照合テキスト = normalize_for_matching(タイトル) の n-gram と サークル名
+# - MinHash シグネチャは work_minhash に保存し、テキストが変わった作品だけ計算し直す
+# - シグネチャを帯（band）に分けたバケットで候補ペアを絞り、n-gram の Jaccard 係数で確認する
+
+import hashlib
+import json
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+
+from analyze.analyzer import strip_prefix, strip_suffix_id
+from config import (
+    ANALYZE_CHUNK_SIZE,
+    DUPLICATE_BANDS,
+    DUPLICATE_NGRAM,
+    DUPLICATE_NUM_PERM,
+    DUPLICATE_THRESHOLD,
+    LOG_DIR,
+)
+from db.handler import get_connection
+from utils.normalizer import normalize_for_matching
+
+MINHASH_DDL = """
+CREATE TABLE IF NOT EXISTS work_minhash (
+  work_id INTEGER PRIMARY KEY,
+  text_hash TEXT NOT NULL,
+  signature BLOB NOT NULL
+);
+"""
+
+# ハッシュ関数の系列を決めるシード（変えると保存済みシグネチャは再計算される）
+MINHASH_SEED = 1
+
+
+def ensure_minhash_table(conn):
+    "work_minhash が無ければ作成する"
+    conn.executescript(MINHASH_DDL)
+
+
+class MinHasher:
+    """
+    MinHash シグネチャの計算器
+
+    - 特徴1つにつき shake_128 の出力を num_perm 個の 32bit 値に切り分け、
+      num_perm 個の独立したハッシュ関数の値として使う（Python の整数演算を避ける）
+    - 特徴ごとの値の列はキャッシュし、同じ n-gram を含むタイトルでは計算を省く
+    - シグネチャは各特徴の値の列の要素ごとの最小値（map(min, ...) で一括計算）
+    """
+
+    def __init__(self, num_perm: int = DUPLICATE_NUM_PERM, cache_size: int = 65536):
+        self.num_perm = num_perm
+        self._salt = f"{MINHASH_SEED}:".encode("ascii")
+        self._vector = lru_cache(maxsize=cache_size)(self._compute_vector)
+
+    def _compute_vector(self, feature: str) -> array:
+        digest = hashlib.shake_128(self._salt + feature.encode("utf-8")).digest(4 * self.num_perm)
+        return array("I", digest)
+
+    def signature(self, features: set[str]) -> bytes:
+        "特徴集合の MinHash シグネチャ（32bit 値 × num_perm のバイト列）"
+        vectors = [self._vector(feature) for feature in features]
+        if len(vectors) == 1:
+            return vectors[0].tobytes()
+        return array("I", map(min, *vectors)).tobytes()
+
+
+def work_text(row) -> tuple[str, str]:
+    """
+    作品1件の照合テキスト (タイトル, サークル) を normalize_for_matching 済みで返す
+    - タイトルは works.title → works_draft.title_raw → original_name の順に採用
+    """
+    title = row["title"] or row["title_raw"]
+    if not title:
+        title = strip_suffix_id(strip_prefix(row["original_name"]))
+    return normalize_for_matching(title), normalize_for_matching(row["circle_raw"] or "")
+
+
+def shingles(title: str, circle: str, n: int = DUPLICATE_NGRAM) -> set[str]:
+    """
+    照合テキストの特徴集合
+    - タイトルの文字 n-gram（n 文字以下ならタイトル全体）と、サークル名1要素
+    """
+    if len(title) <= n:
+        grams = {title} if title else set()
+    else:
+        grams = {title[i : i + n] for i in range(len(title) - n + 1)}
+    if circle:
+        grams.add("\0circle:" + circle)
+    return grams
+
+
+def text_hash(title: str, circle: str, num_perm: int) -> str:
+    "シグネチャの再計算が必要かを判定するためのハッシュ（パラメータも含める）"
+    key = f"{num_perm}:{MINHASH_SEED}:{DUPLICATE_NGRAM}:{circle}\t{title}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def jaccard(a: set[str], b: set[str]) -> float:
+    "Jaccard 係数"
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def compute_signatures(
+    texts: list[tuple[str, str]], num_perm: int = DUPLICATE_NUM_PERM
+) -> list[bytes]:
+    "(title, circle) の一覧のシグネチャ（プロセスプールのワーカーでも実行される）"
+    hasher = MinHasher(num_perm)
+    return [hasher.signature(shingles(title, circle)) for title, circle in texts]
+
+
+def _compute_all(
+    texts: list[tuple[str, str]], num_perm: int, workers: int, chunk_size: int
+) -> list[bytes]:
+    "texts のシグネチャを入力順に計算する（workers > 1 ならプロセスに分散）"
+    chunks = [texts[i : i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        return compute_signatures(texts, num_perm)
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        results = executor.map(compute_signatures, chunks, [num_perm] * len(chunks))
+        return [signature for chunk in results for signature in chunk]
+
+
+def update_signatures(
+    conn,
+    num_perm: int = DUPLICATE_NUM_PERM,
+    workers: int = 1,
+    chunk_size: int = ANALYZE_CHUNK_SIZE,
+) -> dict:
+    """
+    全作品のシグネチャを work_minhash と同期し、
+    work_id → (title, circle, シグネチャ) を返す
+    - 照合テキストが前回と同じ作品は保存済みシグネチャを使う
+    - 計算が必要な作品は workers 個のプロセスに chunk_size 件ずつ分散する
+    - 削除された作品の行は消す
+    - シグネチャは bytes のまま扱う（大量のタプルを作ると GC の走査が支配的になるため）
+    """
+    ensure_minhash_table(conn)
+    stored = {
+        row[0]: (row[1], row[2])
+        for row in conn.execute("SELECT work_id, text_hash, signature FROM work_minhash")
+    }
+    rows = conn.execute(
+        """
+        SELECT w.id, w.title, w.original_name, d.title_raw, d.circle_raw
+        FROM works w
+        LEFT JOIN works_draft d ON d.work_id = w.id
+        ORDER BY w.id
+        """
+    ).fetchall()
+
+    works = {}
+    pending = []  # (work_id, text_hash, title, circle)
+    for row in rows:
+        title, circle = work_text(row)
+        if not title and not circle:
+            continue
+        digest = text_hash(title, circle, num_perm)
+        saved = stored.get(row["id"])
+        if saved is not None and saved[0] == digest:
+            works[row["id"]] = (title, circle, saved[1])
+        else:
+            pending.append((row["id"], digest, title, circle))
+
+    signatures = _compute_all(
+        [(title, circle) for _, _, title, circle in pending], num_perm, workers, chunk_size
+    )
+    changed = []
+    for (work_id, digest, title, circle), signature in zip(pending, signatures):
+        works[work_id] = (title, circle, signature)
+        changed.append((work_id, digest, signature))
+
+    conn.executemany(
+        """
+        INSERT INTO work_minhash (work_id, text_hash, signature) VALUES (?, ?, ?)
+        ON CONFLICT(work_id) DO UPDATE SET
+            text_hash = excluded.text_hash,
+            signature = excluded.signature
+        """,
+        changed,
+    )
+    stale = [(work_id,) for work_id in stored.keys() - works.keys()]
+    conn.executemany("DELETE FROM work_minhash WHERE work_id = ?", stale)
+    conn.commit()
+
+    print(f"🧮 シグネチャ: 計算 {len(changed)} 件 / 再利用 {len(works) - len(changed)} 件")
+    return works
+
+
+def candidate_pairs(signatures: dict[int, bytes], bands: int) -> set[tuple[int, int]]:
+    "LSH：いずれかの帯（band）が完全一致する作品のペア"
+    pairs = set()
+    if not signatures:
+        return pairs
+    band_bytes = len(next(iter(signatures.values()))) // bands
+    for band in range(bands):
+        start = band * band_bytes
+        end = start + band_bytes
+        # 1件だけのバケットが大半なので、リストは2件目が来たときだけ作る
+        first: dict[bytes, int] = {}
+        shared: dict[bytes, list[int]] = {}
+        for work_id, signature in signatures.items():
+            key = signature[start:end]
+            other = first.setdefault(key, work_id)
+            if other != work_id:
+                shared.setdefault(key, [other]).append(work_id)
+        for members in shared.values():
+            for i, left in enumerate(members):
+                for right in members[i + 1 :]:
+                    pairs.add((left, right) if left < right else (right, left))
+    return pairs
+
+
+def cluster_pairs(pairs: list[tuple[int, int, float]]) -> list[dict]:
+    """
+    類似ペア (work_id, work_id, 類似度) を Union-Find でクラスタにまとめる
+    各クラスタは {"work_ids": [...], "pairs": [...], "max_similarity": float}
+    """
+    parent: dict[int, int] = {}
+
+    def find(x: int) -> int:
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for left, right, _ in pairs:
+        root_left, root_right = find(left), find(right)
+        if root_left != root_right:
+            parent[max(root_left, root_right)] = min(root_left, root_right)
+
+    clusters: dict[int, dict] = {}
+    for left, right, similarity in pairs:
+        cluster = clusters.setdefault(
+            find(left), {"work_ids": set(), "pairs": [], "max_similarity": 0.0}
+        )
+        cluster["work_ids"].update((left, right))
+        cluster["pairs"].append((left, right, similarity))
+        cluster["max_similarity"] = max(cluster["max_similarity"], similarity)
+
+    result = []
+    for cluster in clusters.values():
+        cluster["work_ids"] = sorted(cluster["work_ids"])
+        cluster["pairs"].sort(key=lambda p: -p[2])
+        result.append(cluster)
+    result.sort(key=lambda c: (-c["max_similarity"], -len(c["work_ids"]), c["work_ids"][0]))
+    return result
+
+
+def find_duplicate_clusters(
+    conn,
+    threshold: float = DUPLICATE_THRESHOLD,
+    num_perm: int = DUPLICATE_NUM_PERM,
+    bands: int = DUPLICATE_BANDS,
+    workers: int = 1,
+) -> list[dict]:
+    """
+    重複候補のクラスタを返す
+    - LSH の候補ペアのうち、n-gram の Jaccard 係数が threshold 以上のものだけを採用
+    """
+    works = update_signatures(conn, num_perm, workers=workers)
+    candidates = candidate_pairs({k: v[2] for k, v in works.items()}, bands)
+
+    features: dict[int, set[str]] = {}
+
+    def features_of(work_id: int) -> set[str]:
+        if work_id not in features:
+            features[work_id] = shingles(*works[work_id][:2])
+        return features[work_id]
+
+    verified = []
+    for left, right in candidates:
+        similarity = jaccard(features_of(left), features_of(right))
+        if similarity >= threshold:
+            verified.append((left, right, round(similarity, 3)))
+    print(f"🔗 候補ペア {len(candidates)} 件 → 類似度 {threshold} 以上: {len(verified)} 件")
+    return cluster_pairs(verified)
+
+
+def report_duplicates(
+    threshold: float = DUPLICATE_THRESHOLD, limit: int = 50, workers: int = 1
+):
+    """
+    🍣 重複ダウンロード候補のクラスタを表示し、全件を LOG_DIR に JSON で保存する（dupes サブコマンド）
+    """
+    with get_connection() as conn:
+        clusters = find_duplicate_clusters(conn, threshold=threshold, workers=workers)
+        ids = sorted({work_id for c in clusters for work_id in c["work_ids"]})
+        info = {}
+        for i in range(0, len(ids), 500):
+            chunk = ids[i : i + 500]
+            marks = ",".join("?" * len(chunk))
+            for row in conn.execute(
+                f"SELECT id, original_name, folder_path, status FROM works WHERE id IN ({marks})",
+                chunk,
+            ):
+                info[row["id"]] = dict(row)
+
+    print(f"👯 重複候補: {len(clusters)} クラスタ")
+    for cluster in clusters[:limit]:
+        print(f"— 類似度 {cluster['max_similarity']:.2f}（{len(cluster['work_ids'])} 件）")
+        for work_id in cluster["work_ids"]:
+            work = info.get(work_id, {})
+            print(f"    [{work_id}] {work.get('original_name')}  ({work.get('status')})")
+    if len(clusters) > limit:
+        print(f"  …ほか {len(clusters) - limit} クラスタ")
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    path = os.path.join(LOG_DIR, f"duplicates_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            [
+                {
+                    "max_similarity": c["max_similarity"],
+                    "works": [info.get(work_id, {"id": work_id}) for work_id in c["work_ids"]],
+                    "pairs": c["pairs"],
+                }
+                for c in clusters
+            ],
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    print(f"📝 重複候補レポート: {path}")
@@ -0,0 +1,185 @@
+"🍣"
+
+# analyze/parser.py
+#
+# patterns.PATTERN_SEQUENCE（正規表現の連鎖）と同じ結果を返す、区切り記号ベースのパーサ。
+#
+# 各正規表現の .+? / .*? は「区切り記号が最初に現れる位置」から順に試される。
+# 後続部分が成立するかどうかは開始位置が後ろになるほど厳しくなる（単調）ため、
+# 最初の候補位置だけを調べれば正規表現の最左・最短一致と同じ結果になる。
+# これにより、括弧の多い長いタイトルでもバックトラックなしで str.find だけで解析できる。
+#
+# 末尾の (?:[_\s]?\d+)?$ は「末尾の数字列」を先に求めておけば、
+# 閉じ括弧として許される位置は高々1か所、タイトル終端も定数時間で決まる。
+
+# PATTERN_SEQUENCE 内の位置（プロファイル等で使う）
+WITH_AUTHOR = 0
+NO_AUTHOR = 1
+CIRCLE_TITLE = 2
+TITLE_SOURCE = 3
+TITLE_ONLY = 4
+
+
+def _is_sep(ch: str) -> bool:
+    "[_\\s] に相当"
+    return ch == "_" or ch.isspace()
+
+
+def _digit_start(name: str) -> int:
+    "末尾の数字列（\\d+）の開始位置。末尾が数字でなければ len(name)"
+    i = len(name)
+    while i > 0 and name[i - 1].isdecimal():
+        i -= 1
+    return i
+
+
+def _close_position(name: str, d: int) -> int:
+    """
+    \\)(?:[_\\s]?\\d+)?$ が成立する「)」の位置（無ければ -1）
+    - 成立しうるのは 末尾の ")"、数字列直前の ")"、"_" / 空白 + 数字列 の直前の ")" の
+      いずれか1か所だけ
+    """
+    n = len(name)
+    if d < n:
+        if d >= 2 and name[d - 2] == ")" and _is_sep(name[d - 1]):
+            return d - 2
+        if d >= 1 and name[d - 1] == ")":
+            return d - 1
+        return -1
+    if n >= 1 and name[n - 1] == ")":
+        return n - 1
+    return -1
+
+
+def _title_end(name: str, d: int, lo: int) -> int | None:
+    """
+    (?P<title>.+?)(?:[_\\s]?\\d+)?$ で、title の終端として成立する最小位置（lo 以上）
+    - 終端は 文字列末尾 / 数字列中 / "_"・空白 + 数字列の直前 のいずれか
+    """
+    n = len(name)
+    if lo > n:
+        return None
+    if d < n and d - 1 >= lo and _is_sep(name[d - 1]):
+        return d - 1
+    return max(d, lo)
+
+
+def _parse_with_author(name: str, close: int) -> dict | None:
+    "｛type｝[circle (author)] title (source)"
+    a = name.find("｝[", 2)
+    if a < 0:
+        return None
+    c = name.find(" (", a + 3)
+    if c < 0:
+        return None
+    e = name.find(")] ", c + 3)
+    if e < 0:
+        return None
+    j = name.find(" (", e + 4)
+    if j < 0:
+        return None
+    if close < j + 2:
+        return None
+    return {
+        "type": name[1:a],
+        "circle": name[a + 2 : c],
+        "author": name[c + 2 : e],
+        "title": name[e + 3 : j],
+        "source": name[j + 2 : close],
+    }
+
+
+def _parse_no_author(name: str, close: int) -> dict | None:
+    "｛type｝[circle] title (source)"
+    a = name.find("｝[", 2)
+    if a < 0:
+        return None
+    b = name.find("] ", a + 2)
+    if b < 0:
+        return None
+    j = name.find(" (", b + 3)
+    if j < 0:
+        return None
+    if close < j + 2:
+        return None
+    return {
+        "type": name[1:a],
+        "circle": name[a + 2 : b],
+        "title": name[b + 2 : j],
+        "source": name[j + 2 : close],
+    }
+
+
+def _parse_circle_title(name: str, d: int) -> dict | None:
+    "[circle] title"
+    c = name.find("] ", 2)
+    if c < 0:
+        return None
+    t = _title_end(name, d, c + 3)
+    if t is None:
+        return None
+    return {"circle": name[1:c], "title": name[c + 2 : t]}
+
+
+def _parse_title_source(name: str, close: int) -> dict | None:
+    "title (source)"
+    j = name.find(" (", 1)
+    if j < 0:
+        return None
+    if close < j + 3:
+        return None
+    return {"title": name[:j], "source": name[j + 2 : close]}
+
+
+def _parse_title_only(name: str, d: int) -> dict | None:
+    "title"
+    t = _title_end(name, d, 1)
+    if t is None:
+        return None
+    return {"title": name[:t]}
+
+
+def parse_with_index(name: str) -> tuple[int, dict] | None:
+    """
+    フォルダ名を解析し、(一致した PATTERN_SEQUENCE 上の位置, groupdict) を返す
+    - 先頭文字で適用可能な構文だけを試す（｛ → 種別付き、[ → サークル付き）
+    - 改行を含む名前は正規表現（$ の扱いが特殊）に任せる
+    """
+    if "\n" in name:
+        from analyze.patterns import PATTERN_SEQUENCE
+
+        for index, pattern in enumerate(PATTERN_SEQUENCE):
+            match = pattern.match(name)
+            if match:
+                return index, match.groupdict()
+        return None
+
+    d = _digit_start(name)
+    close = _close_position(name, d)
+    head = name[:1]
+
+    if head == "｛":
+        parsed = _parse_with_author(name, close)
+        if parsed is not None:
+            return WITH_AUTHOR, parsed
+        parsed = _parse_no_author(name, close)
+        if parsed is not None:
+            return NO_AUTHOR, parsed
+    elif head == "[":
+        parsed = _parse_circle_title(name, d)
+        if parsed is not None:
+            return CIRCLE_TITLE, parsed
+
+    parsed = _parse_title_source(name, close)
+    if parsed is not None:
+        return TITLE_SOURCE, parsed
+    parsed = _parse_title_only(name, d)
+    if parsed is not None:
+        return TITLE_ONLY, parsed
+    return None
+
+
+def parse_folder_name(name: str) -> dict | None:
+    "フォルダ名を解析して groupdict を返す（PATTERN_SEQUENCE の先頭一致と同じ結果）"
+    result = parse_with_index(name)
+    return None if result is None else result[1]
@@ -4,6 +4,10 @@
 
 import re
 
+# パターン（および analyze/parser.py）の解析結果が変わる変更をしたら上げる
+# works_draft.parser_version がこれと異なる行は analyze で再解析される
+PARSER_VERSION = 1
+
 # 【タイプ】[サークル名 (作者名)] タイトル (ソース) [_1]
 PATTERN_WITH_AUTHOR = re.compile(
     r"^｛(?P<type>.+?)｝\[(?P<circle>.+?) \((?P<author>.+?)\)\] (?P<title>.+?) \((?P<source>.*?)\)(?:[_\s]?\d+)?$"
@@ -0,0 +1,228 @@
+"🍣"
+
+# analyze/profiler.py
+
+import heapq
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+from analyze import patterns
+from analyze.parser import parse_with_index
+
+# 1パターンあたりに保持する「最も遅かった名前」の件数
+WORST_NAMES = 5
+
+# 正規表現の先頭で1文字リテラルとして扱えない記号
+_REGEX_SPECIAL = set(".^$*+?{}[]\\|()")
+
+
+def pattern_name(pattern: re.Pattern, index: int) -> str:
+    "patterns モジュール内の変数名（見つからなければ位置）"
+    for name, value in vars(patterns).items():
+        if name.startswith("PATTERN_") and value is pattern:
+            return name
+    return f"pattern[{index}]"
+
+
+def leading_literal(pattern: re.Pattern) -> str | None:
+    """
+    パターンが一致するために名前の先頭に必要な1文字（無ければ None）
+    例: ^｛... → "｛"、^\\[... → "["、^(?P<title>... → None
+    """
+    source = pattern.pattern
+    if not source.startswith("^") or len(source) < 2:
+        return None
+    head = source[1]
+    if head == "\\":
+        escaped = source[2:3]
+        return escaped if escaped and not escaped.isalnum() else None
+    if head in _REGEX_SPECIAL:
+        return None
+    return head
+
+
+def can_swap(a: re.Pattern, b: re.Pattern) -> bool:
+    """
+    隣り合う a, b の順序を入れ替えても結果が変わらないか
+    - 先頭に必要な文字が互いに異なれば、同じ名前に両方が一致することはない
+    """
+    head_a = leading_literal(a)
+    head_b = leading_literal(b)
+    return head_a is not None and head_b is not None and head_a != head_b
+
+
+class PatternStats:
+    "1パターン分の計測値"
+
+    def __init__(self, name: str):
+        self.name = name
+        self.attempts = 0
+        self.hits = 0
+        self.total_ns = 0
+        self._worst: list[tuple[int, str]] = []  # (ns, 名前) の最小ヒープ
+
+    def record(self, name: str, elapsed_ns: int, hit: bool):
+        "1回の試行を記録する"
+        self.attempts += 1
+        self.hits += hit
+        self.total_ns += elapsed_ns
+        if len(self._worst) < WORST_NAMES:
+            heapq.heappush(self._worst, (elapsed_ns, name))
+        elif elapsed_ns > self._worst[0][0]:
+            heapq.heapreplace(self._worst, (elapsed_ns, name))
+
+    def merge(self, other: "PatternStats"):
+        "別プロセスで計測した同じパターンの値を合算する"
+        self.attempts += other.attempts
+        self.hits += other.hits
+        self.total_ns += other.total_ns
+        for ns, name in other._worst:
+            if len(self._worst) < WORST_NAMES:
+                heapq.heappush(self._worst, (ns, name))
+            elif ns > self._worst[0][0]:
+                heapq.heapreplace(self._worst, (ns, name))
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.attempts if self.attempts else 0.0
+
+    def worst(self) -> list[tuple[int, str]]:
+        "遅い順の (ns, 名前)"
+        return sorted(self._worst, reverse=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "pattern": self.name,
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "hit_rate": round(self.hit_rate, 4),
+            "total_ms": round(self.total_ns / 1e6, 3),
+            "avg_us": round(self.total_ns / self.attempts / 1e3, 3) if self.attempts else 0,
+            "worst": [
+                {"us": round(ns / 1e3, 3), "name": name} for ns, name in self.worst()
+            ],
+        }
+
+
+class PatternProfiler:
+    """
+    try_match と同じ解析器を計測しながら名前を解析する
+
+    - 標準の PATTERN_SEQUENCE なら区切り記号パーサ（parse_with_index）を1件ずつ計測し、
+      一致したパターンに 件数・累計時間・最も遅かった名前 を記録する
+      （パーサは先頭文字で構文を選ぶので、適用順という概念がなく adaptive は無効）
+    - 差し替えた sequence なら正規表現を1パターンずつ計測し、試行回数・一致回数も記録する。
+      adaptive=True なら reorder() で一致率の高いパターンを前へ移す。
+      ただし入れ替えるのは can_swap() な隣接ペアだけなので、結果は変わらない
+    - 計測値は pickle でき、ワーカープロセスで計測した分を merge() で合算できる
+    """
+
+    def __init__(self, sequence: list[re.Pattern] | None = None, adaptive: bool = False):
+        self.uses_parser = sequence is None or sequence is patterns.PATTERN_SEQUENCE
+        self.sequence = list(patterns.PATTERN_SEQUENCE if sequence is None else sequence)
+        self.adaptive = adaptive and not self.uses_parser
+        self.order = list(range(len(self.sequence)))
+        self.stats = [
+            PatternStats(pattern_name(pattern, i)) for i, pattern in enumerate(self.sequence)
+        ]
+        self.names = 0
+        self.unmatched = 0
+
+    def match(self, name: str) -> dict | None:
+        "名前を解析して groupdict を返す（try_match 互換）"
+        self.names += 1
+        if self.uses_parser:
+            started = time.perf_counter_ns()
+            result = parse_with_index(name)
+            elapsed = time.perf_counter_ns() - started
+            if result is None:
+                self.unmatched += 1
+                return None
+            index, groups = result
+            self.stats[index].record(name, elapsed, True)
+            return groups
+        for index in self.order:
+            started = time.perf_counter_ns()
+            match = self.sequence[index].match(name)
+            self.stats[index].record(name, time.perf_counter_ns() - started, bool(match))
+            if match:
+                return match.groupdict()
+        self.unmatched += 1
+        return None
+
+    def fresh(self) -> "PatternProfiler":
+        "同じ解析器・適用順で、計測値が空のプロファイラ（ワーカーに渡す用）"
+        profiler = PatternProfiler(self.sequence, adaptive=self.adaptive)
+        profiler.uses_parser = self.uses_parser
+        profiler.order = list(self.order)
+        return profiler
+
+    def merge(self, other: "PatternProfiler"):
+        "ワーカーで計測した値を合算する"
+        self.names += other.names
+        self.unmatched += other.unmatched
+        for stats, measured in zip(self.stats, other.stats):
+            stats.merge(measured)
+
+    def reorder(self) -> bool:
+        """
+        一致回数の多いパターンを、入れ替え可能な範囲で前へ移す（安定な隣接交換）
+        順序が変わったら True
+        """
+        if not self.adaptive:
+            return False
+        changed = False
+        swapped = True
+        while swapped:
+            swapped = False
+            for pos in range(len(self.order) - 1):
+                a, b = self.order[pos], self.order[pos + 1]
+                if self.stats[b].hits > self.stats[a].hits and can_swap(
+                    self.sequence[a], self.sequence[b]
+                ):
+                    self.order[pos], self.order[pos + 1] = b, a
+                    swapped = changed = True
+        return changed
+
+    def report(self) -> dict:
+        "計測結果（JSON 化できる dict）"
+        return {
+            "parser": "delimiter" if self.uses_parser else "regex",
+            "names": self.names,
+            "unmatched": self.unmatched,
+            "order": [self.stats[i].name for i in self.order],
+            "patterns": [stats.to_dict() for stats in self.stats],
+        }
+
+    def print_report(self):
+        "計測結果を表形式で表示する"
+        print(f"🔬 パターン別統計（{self.names} 件）")
+        for stats in self.stats:
+            if self.uses_parser:
+                share = stats.hits / self.names if self.names else 0.0
+                print(
+                    f"  {stats.name:<22} 件数 {stats.hits:>7} ({share:6.1%})"
+                    f"  合計 {stats.total_ns / 1e6:9.2f} ms"
+                )
+                continue
+            print(
+                f"  {stats.name:<22} 試行 {stats.attempts:>7}  一致 {stats.hits:>7}"
+                f" ({stats.hit_rate:6.1%})  合計 {stats.total_ns / 1e6:9.2f} ms"
+            )
+        if self.unmatched:
+            print(f"  ⚠️ どのパターンにも一致せず: {self.unmatched} 件")
+        if self.adaptive:
+            print("  🔀 適用順: " + " → ".join(self.stats[i].name for i in self.order))
+
+    def write_report(self, log_dir: str) -> str:
+        "計測結果を log_dir/pattern_profile_YYYYmmdd_HHMMSS.json に保存し、パスを返す"
+        os.makedirs(log_dir, exist_ok=True)
+        path = os.path.join(
+            log_dir, f"pattern_profile_{datetime.now():%Y%m%d_%H%M%S}.json"
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        return path
@@ -2,106 +2,264 @@
 
 # analyze/reviewer.py
 
-from db.handler import get_connection
+from config import REVIEW_BATCH_SIZE
+from db.handler import (
+    clear_checkpoint,
+    ensure_checkpoint_table,
+    get_checkpoint,
+    get_connection,
+    save_checkpoint,
+)
+from utils.diagnostics import stage
 from utils.normalizer import normalize_for_matching, normalize_for_filename
 
 
-def get_or_create_id(cursor, table: str, name: str) -> int:
+# 進捗チェックポイントのジョブ名
+REVIEW_JOB = "review"
+
+# 照合キー（match_key 列）を持つ辞書テーブル
+DICTIONARY_TABLES = ("circles", "authors", "sources", "types")
+
+
+def has_match_key(cursor, table: str) -> bool:
+    "辞書テーブルに match_key 列があるか（migrator 適用前のDBでは無い）"
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == "match_key" for row in cursor.fetchall())
+
+
+class MatchKeyCache:
+    """
+    review 実行中だけ使う 照合キー → id の辞書キャッシュ
+
+    - テーブルごとに初回アクセス時に全件を1回だけ読み込む
+    - 同じキーが複数あれば id の小さい方を採用（従来の先頭一致と同じ）
+    - match_key 列があればそれを使い、NULL の行だけ name から計算する
+    """
+
+    def __init__(self):
+        self._keys: dict[str, dict[str, int]] = {}
+        self._has_column: dict[str, bool] = {}
+
+    def has_column(self, cursor, table: str) -> bool:
+        "match_key 列の有無（テーブルごとに1回だけ確認）"
+        if table not in self._has_column:
+            self._has_column[table] = has_match_key(cursor, table)
+        return self._has_column[table]
+
+    def keys(self, cursor, table: str) -> dict[str, int]:
+        "テーブルの 照合キー → id（未ロードなら読み込む）"
+        if table in self._keys:
+            return self._keys[table]
+
+        if self.has_column(cursor, table):
+            cursor.execute(f"SELECT id, name, match_key FROM {table} ORDER BY id")
+        else:
+            cursor.execute(f"SELECT id, name, NULL AS match_key FROM {table} ORDER BY id")
+        mapping: dict[str, int] = {}
+        for row in cursor.fetchall():
+            key = row["match_key"]
+            if key is None:
+                key = normalize_for_matching(row["name"])
+            mapping.setdefault(key, row["id"])
+        self._keys[table] = mapping
+        return mapping
+
+
+def _find_id(cursor, table: str, match_key: str) -> int | None:
+    "キャッシュなしの照合（match_key 列があればインデックスで引く）"
+    if has_match_key(cursor, table):
+        cursor.execute(
+            f"""
+            SELECT id, name, match_key FROM {table}
+            WHERE match_key = ? OR match_key IS NULL
+            ORDER BY id
+            """,
+            (match_key,),
+        )
+        for row in cursor.fetchall():
+            key = row["match_key"]
+            if key is None:
+                key = normalize_for_matching(row["name"])
+            if key == match_key:
+                return row["id"]
+        return None
+
+    cursor.execute(f"SELECT id, name FROM {table} ORDER BY id")
+    for row in cursor.fetchall():
+        if normalize_for_matching(row["name"]) == match_key:
+            return row["id"]
+    return None
+
+
+def get_or_create_id(
+    cursor, table: str, name: str, cache: MatchKeyCache | None = None
+) -> int:
     """
     指定の辞書テーブルに name を登録 or 照合付き取得
 
     - normalize_for_matching で表記ゆれ吸収し、既存と照合
     - 見つからなければ normalize_for_filename で保存可能形式にして新規登録
+    - cache を渡すと照合は辞書引き（O(1)）になる
     """
     match_key = normalize_for_matching(name)
 
     # 表記ゆれを吸収した一致確認
-    cursor.execute(f"SELECT id, name FROM {table}")
-    for row in cursor.fetchall():
-        existing = row["name"]
-        if normalize_for_matching(existing) == match_key:
-            return row["id"]
+    if cache is not None:
+        existing_id = cache.keys(cursor, table).get(match_key)
+        with_column = cache.has_column(cursor, table)
+    else:
+        existing_id = _find_id(cursor, table, match_key)
+        with_column = has_match_key(cursor, table)
+    if existing_id is not None:
+        return existing_id
 
     # 一致がなければ、新たに登録（記号変換済みの安全名で）
     safe_name = normalize_for_filename(name)
-    cursor.execute(f"INSERT INTO {table} (name) VALUES (?)", (safe_name,))
-    return cursor.lastrowid
+    stored_key = normalize_for_matching(safe_name)
+    if with_column:
+        cursor.execute(
+            f"INSERT INTO {table} (name, match_key) VALUES (?, ?)",
+            (safe_name, stored_key),
+        )
+    else:
+        cursor.execute(f"INSERT INTO {table} (name) VALUES (?)", (safe_name,))
+    new_id = cursor.lastrowid
+    if cache is not None:
+        cache.keys(cursor, table).setdefault(stored_key, new_id)
+    return new_id
+
+
+def resolve_draft_ids(cur, row, cache: MatchKeyCache) -> tuple:
+    """
+    draft 1行分の辞書IDを解決する
+    戻り値は (type_id, source_id, circle_id, author_id)
+    """
+    type_id = source_id = circle_id = author_id = None
+
+    # type
+    if row["type_raw"]:
+        type_id = get_or_create_id(cur, "types", row["type_raw"], cache)
+    # source
+    if row["source_raw"]:
+        source_id = get_or_create_id(cur, "sources", row["source_raw"], cache)
+    # circle
+    if row["circle_raw"]:
+        circle_id = get_or_create_id(cur, "circles", row["circle_raw"], cache)
+    # author
+    if row["author_raw"]:
+        author_id = get_or_create_id(cur, "authors", row["author_raw"], cache)
+
+    return type_id, source_id, circle_id, author_id
 
 
-def apply_draft_to_works():
-    "🍣 works_draft から works への補完適用処理"
+def apply_draft_to_works(batch_size: int = REVIEW_BATCH_SIZE, restart: bool = False):
+    """
+    🍣 works_draft から works への補完適用処理
+
+    - work_id 順に batch_size 件ずつ処理し、チャンクごとに commit する
+    - チャンクの commit と同じトランザクションで進捗（最後の work_id）を保存し、
+      中断後の再実行では続きから再開する（restart=True で最初からやり直す）
+    """
     with get_connection() as conn:
         cur = conn.cursor()
 
+        ensure_checkpoint_table(conn)
+        if restart:
+            clear_checkpoint(conn, REVIEW_JOB)
+            conn.commit()
+        last_id = get_checkpoint(conn, REVIEW_JOB)
+        if last_id is None:
+            last_id = -1
+        else:
+            print(f"⏯ 前回の続き（work_id > {last_id}）から再開します")
+
         cur.execute(
             """
-            SELECT w.id, d.*
+            SELECT COUNT(*)
             FROM works w
             JOIN works_draft d ON w.id = d.work_id
-            WHERE w.status = 'pending'
-            """
+            WHERE w.status = 'pending' AND w.id > ?
+            """,
+            (last_id,),
         )
-        rows = cur.fetchall()
-        print(f"🧩 draft → works 補完対象: {len(rows)} 件")
+        print(f"🧩 draft → works 補完対象: {cur.fetchone()[0]} 件")
 
         updated = 0
+        cache = MatchKeyCache()
+
+        while True:
+            with stage("review.fetch"):
+                cur.execute(
+                    """
+                    SELECT w.id, d.*
+                    FROM works w
+                    JOIN works_draft d ON w.id = d.work_id
+                    WHERE w.status = 'pending' AND w.id > ?
+                    ORDER BY w.id
+                    LIMIT ?
+                    """,
+                    (last_id, batch_size),
+                )
+                rows = cur.fetchall()
+            if not rows:
+                break
+
+            # 1. チャンク分の辞書IDを解決
+            work_params = []
+            state_params = []
+            with stage("review.resolve"):
+                for row in rows:
+                    work_id = row["work_id"]
+                    type_id, source_id, circle_id, author_id = resolve_draft_ids(
+                        cur, row, cache
+                    )
+                    work_params.append(
+                        (type_id, source_id, circle_id, author_id, row["title_raw"], work_id)
+                    )
+                    state_params.append(
+                        (
+                            work_id,
+                            int(circle_id is not None),
+                            int(author_id is not None),
+                            int(source_id is not None),
+                            int(type_id is not None),
+                        )
+                    )
+
+            # 2. works 更新
+            with stage("review.update_works"):
+                cur.executemany(
+                    """
+                    UPDATE works
+                    SET type_id = ?, source_id = ?, circle_id = ?, author_id = ?, title = ?
+                    WHERE id = ?
+                    """,
+                    work_params,
+                )
+
+            # 3. 完了状態登録
+            with stage("review.completion_state"):
+                cur.executemany(
+                    """
+                    INSERT INTO work_completion_state (
+                        work_id, circle_id_done, author_id_done, source_id_done, type_id_done
+                    ) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(work_id) DO UPDATE SET
+                        circle_id_done = excluded.circle_id_done,
+                        author_id_done = excluded.author_id_done,
+                        source_id_done = excluded.source_id_done,
+                        type_id_done = excluded.type_id_done
+                    """,
+                    state_params,
+                )
 
-        for row in rows:
-            work_id = row["work_id"]
-            type_id = source_id = circle_id = author_id = None
-
-            # type
-            if row["type_raw"]:
-                type_id = get_or_create_id(cur, "types", row["type_raw"])
-            # source
-            if row["source_raw"]:
-                source_id = get_or_create_id(cur, "sources", row["source_raw"])
-            # circle
-            if row["circle_raw"]:
-                circle_id = get_or_create_id(cur, "circles", row["circle_raw"])
-            # author
-            if row["author_raw"]:
-                author_id = get_or_create_id(cur, "authors", row["author_raw"])
-
-            # works 更新
-            cur.execute(
-                """
-                UPDATE works
-                SET type_id = ?, source_id = ?, circle_id = ?, author_id = ?, title = ?
-                WHERE id = ?
-                """,
-                (
-                    type_id,
-                    source_id,
-                    circle_id,
-                    author_id,
-                    row["title_raw"],
-                    work_id,
-                ),
-            )
-
-            # 完了状態登録
-            cur.execute(
-                """
-                INSERT INTO work_completion_state (
-                    work_id, circle_id_done, author_id_done, source_id_done, type_id_done
-                ) VALUES (?, ?, ?, ?, ?)
-                ON CONFLICT(work_id) DO UPDATE SET
-                    circle_id_done = excluded.circle_id_done,
-                    author_id_done = excluded.author_id_done,
-                    source_id_done = excluded.source_id_done,
-                    type_id_done = excluded.type_id_done
-                """,
-                (
-                    work_id,
-                    int(circle_id is not None),
-                    int(author_id is not None),
-                    int(source_id is not None),
-                    int(type_id is not None),
-                ),
-            )
-
-            updated += 1
+            # 4. 進捗を保存して commit（チャンク単位で確定）
+            with stage("review.commit"):
+                last_id = rows[-1]["id"]
+                save_checkpoint(conn, REVIEW_JOB, last_id)
+                conn.commit()
+            updated += len(rows)
 
+        clear_checkpoint(conn, REVIEW_JOB)
         conn.commit()
         print(f"✅ 補完完了: {updated} 件を更新しました")
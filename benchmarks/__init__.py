@@ -0,0 +1,3 @@
+"🍣"
+
+# benchmarks/__init__.py
@@ -0,0 +1,261 @@
+"🍣"
+
+# benchmarks/bench_commands.py
+#
+# 合成アーカイブ（benchmarks.synthetic）に対してサブコマンドを通しで実行し、所要時間を計測する
+#   python -m benchmarks.bench_commands [--works N] [--bases N] [--images N] [--repeat R]
+#                                       [--commands load,sync,...] [--output PATH]
+#                                       [--compare OLD.json]
+#
+# load → analyze → review → rename → sync → clean-* を main.py と同じ既定値で順に実行する。
+# config の DB_PATH / BASE_DIRS / LOG_DIR は計測中だけ合成アーカイブ側へ差し替え、
+# clean-fs / clean-zero / sync は既定どおり dry-run（実フォルダは隔離しない）。
+# 結果は JSON に保存し、--compare で別コミットの結果と比べられる。
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import analyze.analyzer
+import db.handler
+import db.loader
+import folders.rename
+import sync.cleaner
+import sync.inventory
+import sync.reconciler
+from analyze.analyzer import parse_original_names
+from analyze.reviewer import apply_draft_to_works
+from benchmarks.synthetic import SyntheticArchive, generate_archive
+from config import ANALYZE_WORKERS, LOG_DIR
+from db.handler import db_session
+from db.loader import load_classified_works
+from folders.rename import rename_all_confirmed_works
+from sync.cleaner import (
+    delete_folders_with_zero_images,
+    delete_orphan_relations,
+    delete_physical_folders_not_in_db,
+    delete_works_with_missing_folders,
+)
+from sync.reconciler import compare_db_and_folders
+
+# (サブコマンド名, 実行する関数) ― 処理フローの順
+COMMANDS = [
+    ("load", load_classified_works),
+    ("analyze", lambda: parse_original_names(workers=ANALYZE_WORKERS)),
+    ("review", apply_draft_to_works),
+    ("rename", rename_all_confirmed_works),
+    ("sync", compare_db_and_folders),
+    ("clean-db", delete_works_with_missing_folders),
+    ("clean-fs", delete_physical_folders_not_in_db),
+    ("clean-zero", delete_folders_with_zero_images),
+    ("clean-orphan", delete_orphan_relations),
+]
+
+
+@contextlib.contextmanager
+def redirect_config(archive: SyntheticArchive):
+    "計測の間だけ、各モジュールが名前で取り込んだ設定値を合成アーカイブ側へ向ける"
+    overrides = [(db.handler, "DB_PATH", archive.db_path)]
+    overrides += [
+        (module, "BASE_DIRS", archive.base_dirs)
+        for module in (db.loader, sync.cleaner, sync.inventory, sync.reconciler)
+    ]
+    overrides += [
+        (module, "LOG_DIR", str(archive.log_dir))
+        for module in (analyze.analyzer, folders.rename)
+    ]
+    saved = [(module, name, getattr(module, name)) for module, name, _ in overrides]
+    for module, name, value in overrides:
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
+
+
+def quiet(verbose: bool):
+    "verbose でなければ標準出力を捨てる（計測対象の print を端末に出さない）"
+    if verbose:
+        return contextlib.nullcontext()
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def run_commands(
+    archive: SyntheticArchive, names: list[str], verbose: bool = False
+) -> dict[str, float]:
+    "names のサブコマンドを順に実行し、{サブコマンド: 秒} を返す"
+    selected = [(name, func) for name, func in COMMANDS if name in names]
+    timings = {}
+    with redirect_config(archive):
+        for name, func in selected:
+            started = time.perf_counter()
+            # main.py と同じく、コマンド実行中は DB 接続を1本だけ保持する
+            with quiet(verbose), db_session():
+                func()
+            timings[name] = time.perf_counter() - started
+    return timings
+
+
+def git_commit() -> str | None:
+    "計測したコードのコミット（git が無い・リポジトリ外なら None）"
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).resolve().parents[1],
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run(
+    root: Path,
+    works: int,
+    bases: int,
+    images: int,
+    repeat: int,
+    names: list[str],
+    seed: int = 0,
+    verbose: bool = False,
+) -> dict:
+    """
+    repeat 回、同じ seed の合成アーカイブを作り直して names を計測し、結果（JSON 用の dict）を返す
+    - アーカイブの生成時間は含めない
+    """
+    rounds = []
+    counts = {}
+    for index in range(repeat):
+        with quiet(verbose):
+            archive = generate_archive(
+                root / f"round_{index}", bases=bases, works=works, images=images, seed=seed
+            )
+        counts = archive.counts
+        rounds.append(run_commands(archive, names, verbose=verbose))
+
+    results = []
+    for name, _ in COMMANDS:
+        if name not in names:
+            continue
+        seconds = [timings[name] for timings in rounds]
+        results.append(
+            {
+                "command": name,
+                "seconds": seconds,
+                "min": min(seconds),
+                "median": statistics.median(seconds),
+            }
+        )
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": {
+            "works": works,
+            "bases": bases,
+            "images": images,
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "archive": counts,
+        "results": results,
+    }
+
+
+def print_results(report: dict, baseline: dict | None = None):
+    "計測結果（baseline があれば比較）を表示する"
+    before = {}
+    if baseline is not None:
+        before = {r["command"]: r["min"] for r in baseline["results"]}
+        if baseline["params"] != report["params"]:
+            print(f"⚠️ 計測条件が異なります: {baseline['params']} → {report['params']}")
+    for result in report["results"]:
+        line = (
+            f"⏱ {result['command']:<13}"
+            f" min {result['min']:.3f}s  median {result['median']:.3f}s"
+        )
+        old = before.get(result["command"])
+        if old:
+            line += f"  （前回 {old:.3f}s, x{old / result['min']:.2f}）"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="end-to-end command benchmark")
+    parser.add_argument("--works", type=int, default=1000, help="作品フォルダ数")
+    parser.add_argument("--bases", type=int, default=3, help="ベースディレクトリ数")
+    parser.add_argument("--images", type=int, default=5, help="作品あたりの画像数")
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数（毎回作り直す）")
+    parser.add_argument("--seed", type=int, default=0, help="合成アーカイブの乱数の種")
+    parser.add_argument(
+        "--commands",
+        default=",".join(name for name, _ in COMMANDS),
+        help="計測するサブコマンド（カンマ区切り、実行順は処理フロー順）",
+    )
+    parser.add_argument(
+        "--root", help="合成アーカイブの作成先（既定は一時ディレクトリ、終了時に削除）"
+    )
+    parser.add_argument(
+        "--output", help="結果 JSON の保存先（既定は LOG_DIR/bench_commands_*.json）"
+    )
+    parser.add_argument("--compare", metavar="JSON", help="比較する以前の結果 JSON")
+    parser.add_argument("--verbose", action="store_true", help="各コマンドの出力を表示")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.commands.split(",") if name.strip()]
+    unknown = set(names) - {name for name, _ in COMMANDS}
+    if unknown:
+        sys.exit(f"❌ 未対応のサブコマンド: {', '.join(sorted(unknown))}")
+
+    with contextlib.ExitStack() as stack:
+        if args.root:
+            root = Path(args.root)
+            root.mkdir(parents=True, exist_ok=True)
+        else:
+            root = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="bench_")))
+        report = run(
+            root,
+            works=args.works,
+            bases=args.bases,
+            images=args.images,
+            repeat=args.repeat,
+            names=names,
+            seed=args.seed,
+            verbose=args.verbose,
+        )
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(report, baseline)
+
+    output = args.output
+    if output is None:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        output = os.path.join(LOG_DIR, f"bench_commands_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📝 結果: {output}")
+
+
+if __name__ == "__main__":
+    main()
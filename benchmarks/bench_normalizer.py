@@ -0,0 +1,122 @@
+"🍣"
+
+# benchmarks/bench_normalizer.py
+#
+# 正規化関数のマイクロベンチマーク
+#   python -m benchmarks.bench_normalizer [--names N] [--repeat R]
+#
+# 変更前の実装（毎回 NFKC・未コンパイル正規表現・replace ループ）と、
+# 現在の utils.normalizer（メモ化・事前コンパイル・translate・ASCII 高速経路）を比較する。
+
+import argparse
+import random
+import re
+import time
+import unicodedata
+
+from utils import normalizer
+from utils.normalizer import FILENAME_REPLACEMENTS
+
+
+# --- 変更前の実装（比較用） ---
+def legacy_normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("　", " ")
+    text = re.sub(r"\s+", " ", text)
+    return text.strip()
+
+
+def legacy_normalize_for_matching(text: str) -> str:
+    text = legacy_normalize_text(text)
+    text = text.lower()
+    text = re.sub(r"[^\wぁ-んァ-ン一-龥]", "", text)
+    return text
+
+
+def legacy_normalize_for_filename(text: str) -> str:
+    text = legacy_normalize_text(text)
+    for k, v in FILENAME_REPLACEMENTS.items():
+        text = text.replace(k, v)
+    return text
+
+
+# --- 入力データ ---
+_PARTS = ["サークル", "作者", "ｶﾞｲﾄﾞ", "ＡＢＣ", "Studio", "team", "・", "〜", "★", "/", "?", "　", " "]
+
+
+def make_names(count: int, seed: int = 0) -> list[str]:
+    "辞書名・フォルダ名に似た文字列を count 種類作る（ASCII のみの名前も混ぜる）"
+    rng = random.Random(seed)
+    names = []
+    for i in range(count):
+        if i % 3 == 0:
+            names.append(f"Circle {i} feat. Artist_{i % 97}")
+        else:
+            names.append("".join(rng.choice(_PARTS) for _ in range(rng.randint(2, 6))) + str(i))
+    return names
+
+
+def make_workload(names: list[str], repeat: int, seed: int = 0) -> list[str]:
+    "review / rename のように同じ名前が何度も現れる呼び出し列"
+    workload = names * repeat
+    random.Random(seed).shuffle(workload)
+    return workload
+
+
+def _time(func, workload: list[str]) -> float:
+    started = time.perf_counter()
+    for text in workload:
+        func(text)
+    return time.perf_counter() - started
+
+
+def run(names: int, repeat: int) -> list[dict]:
+    "各関数の所要時間（秒）を計測して返す"
+    workload = make_workload(make_names(names), repeat)
+    cases = [
+        ("normalize_for_matching", legacy_normalize_for_matching, normalizer.normalize_for_matching),
+        ("normalize_for_filename", legacy_normalize_for_filename, normalizer.normalize_for_filename),
+    ]
+    results = []
+    for label, legacy, current in cases:
+        for func in (normalizer.normalize_text, current):
+            func.cache_clear()
+        legacy_sec = _time(legacy, workload)
+        current_sec = _time(current, workload)
+
+        current.cache_clear()
+        normalizer.normalize_text.cache_clear()
+        started = time.perf_counter()
+        normalizer.normalize_many(workload, current)
+        batch_sec = time.perf_counter() - started
+
+        results.append(
+            {
+                "function": label,
+                "calls": len(workload),
+                "legacy_sec": legacy_sec,
+                "current_sec": current_sec,
+                "batch_sec": batch_sec,
+            }
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="normalizer micro-benchmark")
+    parser.add_argument("--names", type=int, default=5000, help="異なる名前の数")
+    parser.add_argument("--repeat", type=int, default=10, help="各名前の出現回数")
+    args = parser.parse_args()
+
+    for result in run(args.names, args.repeat):
+        legacy = result["legacy_sec"]
+        print(
+            f"⏱ {result['function']:<24} {result['calls']} 回"
+            f"  旧 {legacy:.3f}s"
+            f"  新 {result['current_sec']:.3f}s (x{legacy / result['current_sec']:.1f})"
+            f"  normalize_many {result['batch_sec']:.3f}s (x{legacy / result['batch_sec']:.1f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
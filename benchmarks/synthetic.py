@@ -0,0 +1,339 @@
+"🍣"
+
+# benchmarks/synthetic.py
+#
+# ベンチマーク用の合成アーカイブ（ベースディレクトリ群・作品フォルダ・画像）と、
+# それに対応する SQLite DB を生成する。
+#   python -m benchmarks.synthetic ROOT [--bases N] [--works N] [--images N] [--seed S]
+#
+# 作品名は PATTERN_SEQUENCE の全形式（｛タイプ｝[サークル (作者)] タイトル (ソース) など）を
+# 順に使い、サークル名には全角/半角・空白・大文字小文字の表記ゆれと同名作品（_2 など）を混ぜる。
+# DB には load / analyze / review / rename / sync / clean-* の各コマンドに仕事が残るよう、
+# 分類済み未登録フォルダ・未分類フォルダ・消えたフォルダ・画像0枚フォルダ・移動済み作品・
+# 孤立レコードを含める。
+
+import argparse
+import json
+import random
+import sqlite3
+from pathlib import Path
+
+from config import CLASSIFY_OUTPUT_PREFIX
+from db.handler import open_connection
+from db.migrator import migrate
+from utils.normalizer import (
+    FILENAME_REPLACEMENTS,
+    normalize_for_filename,
+    normalize_for_matching,
+)
+
+# --- 名前の素材 ---
+CIRCLES = [
+    "ぱんだ工房",
+    "らびっと☆はうす",
+    "Studio Kitsune",
+    "ねこまんま屋",
+    "月見草",
+    "鉄板焼きの会",
+    "Moon Drop",
+    "さくらんぼ組",
+    "ブルーベリー畑",
+    "ひよこ堂",
+    "Team Hayabusa",
+    "夜更かし本舗",
+]
+AUTHORS = ["みかん", "たぬきち", "Sora", "あおい", "黒猫ノワール", "ゆず", "K-ta", "しずく"]
+SOURCES = [
+    "オリジナル",
+    "東方Project",
+    "艦隊これくしょん -艦これ-",
+    "Fate/Grand Order",
+    "ブルーアーカイブ",
+    "アイドルマスター",
+    "原神",
+]
+TYPES = ["同人誌", "同人CG集", "成年コミック", "画集"]
+TITLE_WORDS = [
+    "夏の日",
+    "ひみつ",
+    "放課後",
+    "星空",
+    "おやすみ",
+    "ないしょ",
+    "総集編",
+    "Memories",
+    "らぶらぶ",
+    "温泉旅行",
+    "雨宿り",
+    "Vol.",
+]
+
+# 作品フォルダの割合（残りは「登録済みで変化なし」）
+CLASSIFIED_RATIO = 0.15  # 分類結果 JSON にあるが works に無い（load で登録される）
+UNREGISTERED_RATIO = 0.10  # フォルダはあるが JSON にも works にも無い（sync / clean-fs）
+MISSING_RATIO = 0.05  # works にあるがフォルダが無い（sync / clean-db）
+EMPTY_RATIO = 0.03  # 画像0枚（clean-zero）
+MOVED_RATIO = 0.02  # 別のベースディレクトリへ移動済み（sync の移動検出）
+CONFIRMED_RATIO = 0.05  # 補完済み confirmed（rename）
+DUPLICATE_RATIO = 0.05  # 既出の作品名を再利用（同名は _2, _3 ... で区別）
+ORPHAN_RATIO = 0.02  # 存在しない work_id を指す中間テーブル行（clean-orphan）
+
+
+# ファイル名に使えない文字だけを置き換える（NFKC はかけず、｛｝や全角を残す）
+_FILENAME_SAFE = str.maketrans(FILENAME_REPLACEMENTS)
+
+# 半角英数記号 → 全角
+_ZENKAKU = str.maketrans(
+    {chr(code): chr(code + 0xFEE0) for code in range(0x21, 0x7F)} | {" ": "　"}
+)
+
+
+def circle_variant(circle: str, rng: random.Random) -> str:
+    "同じサークルの表記ゆれ（全角化・空白・大文字小文字・接尾辞）を返す"
+    choice = rng.randrange(6)
+    if choice == 1:
+        return circle.translate(_ZENKAKU)
+    if choice == 2:
+        return circle.upper()
+    if choice == 3:
+        return circle.replace(" ", "　")
+    if choice == 4:
+        return f"{circle} "
+    if choice == 5:
+        return f"サークル{circle}"
+    return circle
+
+
+def make_work_name(index: int, rng: random.Random) -> tuple[str, dict]:
+    """
+    index 番目の作品名と、その素材（circle / author / source / type / title）を返す
+    - 形式は PATTERN_SEQUENCE の順に巡回する
+    """
+    circle = circle_variant(rng.choice(CIRCLES), rng)
+    author = rng.choice(AUTHORS)
+    source = rng.choice(SOURCES)
+    type_name = rng.choice(TYPES)
+    title = " ".join(rng.sample(TITLE_WORDS, rng.randint(1, 3))) + f" {index}"
+    parts = {
+        "circle": circle,
+        "author": author,
+        "source": source,
+        "type": type_name,
+        "title": title,
+    }
+
+    shape = index % 5
+    if shape == 0:
+        name = f"｛{type_name}｝[{circle} ({author})] {title} ({source})"
+    elif shape == 1:
+        name = f"｛{type_name}｝[{circle}] {title} ({source})"
+    elif shape == 2:
+        name = f"[{circle}] {title}"
+    elif shape == 3:
+        name = f"{title} ({source})"
+    else:
+        name = title
+    return name.translate(_FILENAME_SAFE), parts
+
+
+class SyntheticArchive:
+    "生成したアーカイブの場所と内訳"
+
+    def __init__(self, root: Path, base_dirs: list[str], db_path: Path, counts: dict):
+        self.root = root
+        self.base_dirs = base_dirs
+        self.db_path = db_path
+        self.counts = counts
+
+    @property
+    def log_dir(self) -> Path:
+        return self.root / "logs"
+
+
+def _write_images(folder: Path, images: int):
+    folder.mkdir()
+    for i in range(images):
+        (folder / f"{i:03d}.jpg").write_bytes(b"\xff\xd8\xff" + bytes([i % 256]))
+    (folder / "readme.txt").write_bytes(b"x")
+
+
+def _insert_dictionary(cur: sqlite3.Cursor, table: str, name: str) -> int:
+    "辞書テーブルに name を登録（既存なら再利用）して id を返す"
+    name = normalize_for_filename(name)
+    cur.execute(
+        f"INSERT OR IGNORE INTO {table} (name, match_key) VALUES (?, ?)",
+        (name, normalize_for_matching(name)),
+    )
+    return cur.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+
+
+def _confirm_work(cur: sqlite3.Cursor, work_id: int, parts: dict):
+    "review 済み・全項目補完済み（confirmed）の状態を作る"
+    type_id = _insert_dictionary(cur, "types", parts["type"])
+    circle_id = _insert_dictionary(cur, "circles", parts["circle"])
+    author_id = _insert_dictionary(cur, "authors", parts["author"])
+    source_id = _insert_dictionary(cur, "sources", parts["source"])
+    cur.execute(
+        "UPDATE works SET status = 'confirmed', type_id = ?, title = ? WHERE id = ?",
+        (type_id, parts["title"], work_id),
+    )
+    cur.execute(
+        "INSERT INTO work_circle_authors (work_id, circle_id, author_id) VALUES (?, ?, ?)",
+        (work_id, circle_id, author_id),
+    )
+    cur.execute(
+        "INSERT INTO work_sources (work_id, source_id) VALUES (?, ?)", (work_id, source_id)
+    )
+    cur.execute(
+        """
+        INSERT INTO work_completion_state (
+            work_id, circle_id_done, author_id_done, source_id_done, type_id_done, title_done
+        ) VALUES (?, 1, 1, 1, 1, 1)
+        """,
+        (work_id,),
+    )
+
+
+def generate_archive(
+    root: Path | str,
+    bases: int = 3,
+    works: int = 1000,
+    images: int = 5,
+    seed: int = 0,
+) -> SyntheticArchive:
+    """
+    root 以下に合成アーカイブと DB（root/metadata.sqlite3）を作る
+    - root/archive/base_XX/<作品名>/NNN.jpg（画像は数バイトのダミー）
+    - 各ベースディレクトリに load 用の分類結果 JSON を置く
+      （登録済みフォルダと classified のフォルダ。unregistered と移動先は sync / clean-fs 用）
+    - 同じ seed なら同じ内容になる（コミット間で比較できるように）
+    """
+    root = Path(root)
+    rng = random.Random(seed)
+    base_dirs = [root / "archive" / f"base_{i:02d}" for i in range(bases)]
+    for base in base_dirs:
+        base.mkdir(parents=True)
+
+    db_path = root / "metadata.sqlite3"
+    conn = open_connection(db_path)
+    migrate(conn)
+    cur = conn.cursor()
+    cur.executemany(
+        "INSERT INTO scan_targets (path, active) VALUES (?, 1)",
+        ((str(base),) for base in base_dirs),
+    )
+
+    counts = dict.fromkeys(
+        ("folders", "registered", "duplicates", "unchanged", "classified", "unregistered")
+        + ("missing", "empty", "moved", "confirmed"),
+        0,
+    )
+    classified: dict[Path, list[dict]] = {base: [] for base in base_dirs}
+    used_names: dict[Path, set] = {base: set() for base in base_dirs}
+    generated: list[tuple[str, dict]] = []
+
+    for index in range(works):
+        base = base_dirs[index % bases]
+        if generated and rng.random() < DUPLICATE_RATIO:
+            name, parts = rng.choice(generated)
+            counts["duplicates"] += 1
+        else:
+            name, parts = make_work_name(index, rng)
+            generated.append((name, parts))
+        # 同名作品は _2, _3 ... を付けて区別する（ダウンロードの重複を模す）
+        unique, suffix = name, 1
+        while unique in used_names[base]:
+            suffix += 1
+            unique = f"{name}_{suffix}"
+        used_names[base].add(unique)
+        folder = base / unique
+
+        roll = rng.random()
+        kind = "unchanged"
+        for label, ratio in (
+            ("classified", CLASSIFIED_RATIO),
+            ("unregistered", UNREGISTERED_RATIO),
+            ("missing", MISSING_RATIO),
+            ("empty", EMPTY_RATIO),
+            ("moved", MOVED_RATIO),
+            ("confirmed", CONFIRMED_RATIO),
+        ):
+            if roll < ratio:
+                kind = label
+                break
+            roll -= ratio
+        counts[kind] += 1
+
+        image_count = 0 if kind == "empty" else images
+        if kind != "missing":
+            target = folder
+            if kind == "moved" and bases > 1:
+                # 実体は隣のベースディレクトリにあり、DB は元の場所を指す
+                target = base_dirs[(index + 1) % bases] / unique
+                if target.exists():
+                    target = folder
+                used_names[target.parent].add(unique)
+            _write_images(target, image_count)
+            counts["folders"] += 1
+            if kind not in ("moved", "unregistered"):
+                classified[target.parent].append(
+                    {
+                        "folder_path": str(target),
+                        "original_name": unique,
+                        "image_count": image_count,
+                    }
+                )
+        if kind in ("classified", "unregistered"):
+            continue
+
+        cur.execute(
+            "INSERT INTO works (folder_path, original_name, image_count, status)"
+            " VALUES (?, ?, ?, 'pending')",
+            (str(folder), unique, image_count),
+        )
+        counts["registered"] += 1
+        if kind == "confirmed":
+            _confirm_work(cur, cur.lastrowid, parts)
+
+    # 存在しない work_id を指す中間テーブル行
+    max_id = cur.execute("SELECT COALESCE(MAX(id), 0) FROM works").fetchone()[0]
+    orphans = int(works * ORPHAN_RATIO)
+    circle_id = _insert_dictionary(cur, "circles", CIRCLES[0])
+    source_id = _insert_dictionary(cur, "sources", SOURCES[0])
+    for offset in range(1, orphans + 1):
+        cur.execute(
+            "INSERT INTO work_circle_authors (work_id, circle_id, author_id) VALUES (?, ?, NULL)",
+            (max_id + offset, circle_id),
+        )
+        cur.execute(
+            "INSERT INTO work_sources (work_id, source_id) VALUES (?, ?)",
+            (max_id + offset, source_id),
+        )
+    counts["orphans"] = orphans
+    conn.commit()
+    conn.close()
+
+    for base, records in classified.items():
+        # ファイル名も固定にして、同じ seed なら同じ内容になるようにする
+        path = base / f"{CLASSIFY_OUTPUT_PREFIX}_synthetic.json"
+        path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+
+    return SyntheticArchive(root, [str(base) for base in base_dirs], db_path, counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="synthetic archive generator")
+    parser.add_argument("root", help="生成先（空のディレクトリ）")
+    parser.add_argument("--bases", type=int, default=3, help="ベースディレクトリ数")
+    parser.add_argument("--works", type=int, default=1000, help="作品フォルダ数")
+    parser.add_argument("--images", type=int, default=5, help="作品あたりの画像数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    args = parser.parse_args()
+
+    archive = generate_archive(args.root, args.bases, args.works, args.images, args.seed)
+    print(f"🏭 {archive.root}: {archive.counts}")
+    print(f" - DB: {archive.db_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,25 @@
 
 # config.py
 
+import os
 from pathlib import Path
 
 # DB
 DB_PATH = Path("metadata.sqlite3")
 
+# SQLite 接続時に適用する PRAGMA（値はそのまま SQL に埋め込まれる）
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 268435456,  # 256MB
+    "cache_size": -65536,  # 64MB（負数は KiB 指定）
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,  # ms
+}
+
+# 接続ごとにキャッシュする準備済みステートメント数
+SQLITE_CACHED_STATEMENTS = 256
+
 # 対象フォルダ群（BASE_DIRS）
 BASE_DIRS = [
     r"E:\2021年12月19日ダウンロード",
@@ -59,5 +73,57 @@ BASE_DIRS = [
 # 画像枚数による分類閾値
 THRESHOLD = 100
 
+# 画像数カウントの並列数（ベースディレクトリごとのスレッド数）
+# scan / ingest / sync / clean-fs / clean-zero ではデバイスごとの同時アクセス数の上限として使い、
+# scan_targets.max_concurrency が設定された対象はそちらを優先する（HDD なら 1 など）
+SCAN_WORKERS = 16
+
+# ログ・レポートの出力先
+LOG_DIR = "data/logs"
+
 # 出力ファイル共通接頭辞
 CLASSIFY_OUTPUT_PREFIX = "classification_result"
+
+# ingest: 1トランザクションあたりの登録件数
+INGEST_BATCH_SIZE = 5000
+
+# review: 1チャンク（1 commit）あたりの処理件数
+REVIEW_BATCH_SIZE = 1000
+
+# rename: 並列にリネームするディレクトリ数
+RENAME_WORKERS = 4
+
+# analyze: 構文解析に使うプロセス数と、1プロセスへ渡す件数
+ANALYZE_WORKERS = os.cpu_count() or 1
+ANALYZE_CHUNK_SIZE = 2000
+
+# search: 1ページあたりの表示件数
+SEARCH_PAGE_SIZE = 20
+
+# dupes: 重複候補検出（MinHash の置換数・LSH の帯数・n-gram 長・採用する類似度の下限）
+DUPLICATE_NUM_PERM = 64
+DUPLICATE_BANDS = 16
+DUPLICATE_NGRAM = 3
+DUPLICATE_THRESHOLD = 0.5
+
+# 削除の代わりにフォルダを移す隔離ディレクトリの名前と、purge までの保持日数
+# 隔離ディレクトリは QUARANTINE_ROOT 直下（作品フォルダと同じボリュームのときだけ）、
+# それ以外は作品フォルダのあるベースディレクトリ直下に作る（rename で移せる場所に限るため）
+QUARANTINE_DIR_NAME = ".doujin_quarantine"
+QUARANTINE_ROOT = None
+QUARANTINE_RETENTION_DAYS = 30
+
+# purge: 隔離フォルダを並列に削除するスレッド数
+PURGE_WORKERS = 4
+
+# sync / clean 系: 前回の走査（folder_inventory）をそのまま使ってよい経過時間（分）
+INVENTORY_MAX_AGE_MINUTES = 60
+
+# watch: 同じフォルダへの変更が静まってから反映するまでの秒数と、
+# inotify が使えないマウントでベースディレクトリの mtime を確認する間隔（秒）
+WATCH_DEBOUNCE_SECONDS = 2.0
+WATCH_POLL_SECONDS = 60
+
+# main.py --profile / --trace-malloc: 表示・保存する上位件数と、確保箇所として記録するスタックの深さ
+PROFILE_TOP_N = 30
+TRACEMALLOC_FRAMES = 10
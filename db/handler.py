@@ -1,23 +1,121 @@
 "🍣"
 
+import os
 import sqlite3
+import threading
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable
 
-from config import DB_PATH
+from config import DB_PATH, SQLITE_CACHED_STATEMENTS, SQLITE_PRAGMAS
 
 
-# --- Connection Wrapper ---
-@contextmanager
-def get_connection(db_path: Path = DB_PATH):
-    "🍣"
-    conn = sqlite3.connect(db_path)
+# --- Connection Manager ---
+def open_connection(db_path: Path | str) -> sqlite3.Connection:
+    """
+    新しい接続を開き、row_factory と PRAGMA プロファイル（config.SQLITE_PRAGMAS）を適用する
+    - cached_statements で準備済みステートメントを接続ごとにキャッシュする
+    """
+    conn = sqlite3.connect(db_path, cached_statements=SQLITE_CACHED_STATEMENTS)
     conn.row_factory = sqlite3.Row
-    try:
+    for name, value in SQLITE_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+class ConnectionManager:
+    """
+    スレッドごと・DBパスごとに接続を1本だけ持ち、入れ子の利用では使い回す
+
+    - 最も外側の get_connection を抜けると接続を閉じる（従来どおり）
+    - session() の間は接続を開いたまま保持し、その中の get_connection はすべて同じ接続を使う
+    - 接続を保持したままスコープを抜けるとき、未 commit の変更は破棄する
+      （接続を閉じていた従来の挙動と同じ結果にするため）
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _slots(self) -> dict[str, list]:
+        slots = getattr(self._local, "slots", None)
+        if slots is None:
+            slots = self._local.slots = {}
+        return slots
+
+    @contextmanager
+    def connection(self, db_path: Path | str, hold: bool = False):
+        "接続を取得する（hold=True の場合は session として保持する）"
+        key = os.fspath(db_path)
+        slots = self._slots()
+        slot = slots.get(key)
+        if slot is None:
+            # [接続, 入れ子の深さ, session として保持中か]
+            slot = slots[key] = [open_connection(db_path), 0, False]
+        conn = slot[0]
+        outermost_hold = hold and not slot[2]
+        if outermost_hold:
+            slot[2] = True
+        # session 直下のスコープか（抜けるときに未 commit 分を破棄する単位）
+        session_scope = slot[2] and not outermost_hold and slot[1] == 1
+        began_in_transaction = conn.in_transaction
+        slot[1] += 1
+        try:
+            yield conn
+        finally:
+            slot[1] -= 1
+            if outermost_hold:
+                slot[2] = False
+            if slot[1] == 0 and not slot[2]:
+                del slots[key]
+                conn.close()
+            elif session_scope and conn.in_transaction and not began_in_transaction:
+                conn.rollback()
+
+    def close_all(self):
+        "このスレッドで保持している接続をすべて閉じる"
+        slots = self._slots()
+        for conn, _depth, _hold in slots.values():
+            conn.close()
+        slots.clear()
+
+
+_manager = ConnectionManager()
+
+
+@contextmanager
+def get_connection(db_path: Path | str | None = None):
+    """
+    DB接続を取得する（既定は config.DB_PATH）
+    - 同じスレッドで既に開いている接続があれば使い回す
+    """
+    with _manager.connection(db_path or DB_PATH) as conn:
+        yield conn
+
+
+@contextmanager
+def db_session(db_path: Path | str | None = None):
+    """
+    サブコマンド1回分など、まとまった処理の間だけ接続を開いたまま保持する
+    """
+    with _manager.connection(db_path or DB_PATH, hold=True) as conn:
         yield conn
+
+
+@contextmanager
+def foreign_keys_enabled(conn: sqlite3.Connection):
+    """
+    この間だけ PRAGMA foreign_keys を有効にし、抜けるときに元へ戻す
+    - 有効になったかを yield する（トランザクション中は PRAGMA が効かないため False になりうる）
+    - 宣言済みの ON DELETE CASCADE を発火させたい削除処理で使う
+    """
+    previous = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = ON")
+    enabled = bool(conn.execute("PRAGMA foreign_keys").fetchone()[0])
+    try:
+        yield enabled
     finally:
-        conn.close()
+        if not previous:
+            conn.execute("PRAGMA foreign_keys = OFF")
 
 
 # --- 汎用実行関数 ---
@@ -48,6 +146,61 @@ def insert_work(folder_path: str, original_name: str, image_count: int):
     execute_sql(sql, (folder_path, original_name, image_count), commit=True)
 
 
+def _stage_works(conn: sqlite3.Connection, records: Iterable[dict]):
+    "一時テーブル _staging_works に登録候補を詰め直す"
+    conn.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS _staging_works (
+            folder_path TEXT NOT NULL,
+            original_name TEXT NOT NULL,
+            image_count INTEGER
+        )
+        """
+    )
+    conn.execute("DELETE FROM _staging_works")
+    conn.executemany(
+        "INSERT INTO _staging_works (folder_path, original_name, image_count) VALUES (?, ?, ?)",
+        ((r["folder_path"], r["original_name"], r["image_count"]) for r in records),
+    )
+
+
+def insert_works_batch(conn: sqlite3.Connection, records: Iterable[dict]) -> int:
+    """
+    未登録の作品フォルダをまとめて登録する（commit は呼び出し側）
+    - 一時テーブルに流し込み、works との差分だけを1文の INSERT ... SELECT で登録
+    - folder_path が既に works にあるもの、バッチ内の重複（2件目以降）は無視する
+    - 戻り値は新規登録件数
+    """
+    _stage_works(conn, records)
+    cur = conn.execute(
+        """
+        INSERT INTO works (folder_path, original_name, image_count, status)
+        SELECT s.folder_path, s.original_name, s.image_count, 'pending'
+        FROM _staging_works s
+        LEFT JOIN works w ON w.folder_path = s.folder_path
+        WHERE w.id IS NULL
+          AND s.rowid IN (
+              SELECT MIN(rowid) FROM _staging_works GROUP BY folder_path
+          )
+        ORDER BY s.rowid
+        """
+    )
+    inserted = cur.rowcount
+    conn.execute("DELETE FROM _staging_works")
+    return inserted
+
+
+def bulk_insert_works(records: list[dict]) -> tuple[int, int]:
+    """
+    1接続・1トランザクションで作品フォルダを一括登録する
+    戻り値は (新規登録件数, スキップ件数)
+    """
+    with get_connection() as conn:
+        inserted = insert_works_batch(conn, records)
+        conn.commit()
+    return inserted, len(records) - inserted
+
+
 # --- 確認系（例） ---
 def work_exists(folder_path: str) -> bool:
     "🍣"
@@ -55,6 +208,69 @@ def work_exists(folder_path: str) -> bool:
     return bool(fetch_all(sql, (folder_path,)))
 
 
+def exists_many(folder_paths: Iterable[str]) -> set[str]:
+    "与えられた folder_path のうち works に登録済みのものを集合で返す"
+    with get_connection() as conn:
+        conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS _lookup_paths (folder_path TEXT PRIMARY KEY)"
+        )
+        conn.execute("DELETE FROM _lookup_paths")
+        conn.executemany(
+            "INSERT OR IGNORE INTO _lookup_paths (folder_path) VALUES (?)",
+            ((p,) for p in folder_paths),
+        )
+        rows = conn.execute(
+            """
+            SELECT l.folder_path
+            FROM _lookup_paths l
+            JOIN works w ON w.folder_path = l.folder_path
+            """
+        ).fetchall()
+    return {row["folder_path"] for row in rows}
+
+
+# --- 進捗チェックポイント（中断・再開用） ---
+CHECKPOINT_DDL = """
+CREATE TABLE IF NOT EXISTS job_checkpoints (
+  job TEXT PRIMARY KEY,
+  last_id INTEGER NOT NULL,
+  updated_at TEXT NOT NULL
+)
+"""
+
+
+def ensure_checkpoint_table(conn: sqlite3.Connection):
+    "job_checkpoints テーブルが無い既存DBのために作成しておく"
+    conn.execute(CHECKPOINT_DDL)
+
+
+def get_checkpoint(conn: sqlite3.Connection, job: str) -> int | None:
+    "ジョブの最後に確定した id（未記録なら None）"
+    row = conn.execute(
+        "SELECT last_id FROM job_checkpoints WHERE job = ?", (job,)
+    ).fetchone()
+    return None if row is None else row[0]
+
+
+def save_checkpoint(conn: sqlite3.Connection, job: str, last_id: int):
+    "ジョブの進捗を記録する（commit は呼び出し側で、処理結果と同じトランザクションに含める）"
+    conn.execute(
+        """
+        INSERT INTO job_checkpoints (job, last_id, updated_at)
+        VALUES (?, ?, datetime('now', 'localtime'))
+        ON CONFLICT(job) DO UPDATE SET
+            last_id = excluded.last_id,
+            updated_at = excluded.updated_at
+        """,
+        (job, last_id),
+    )
+
+
+def clear_checkpoint(conn: sqlite3.Connection, job: str):
+    "ジョブ完了時に進捗記録を消す"
+    conn.execute("DELETE FROM job_checkpoints WHERE job = ?", (job,))
+
+
 def get_all_works() -> list[sqlite3.Row]:
     "🍣"
     return fetch_all("SELECT * FROM works")
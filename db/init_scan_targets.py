@@ -7,6 +7,7 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from db.handler import get_connection
+from db.migrator import add_column_if_missing
 
 
 def initialize_scan_targets():
@@ -17,21 +18,32 @@ def initialize_scan_targets():
         path TEXT NOT NULL UNIQUE,
         active BOOLEAN NOT NULL DEFAULT 1,
         note TEXT DEFAULT NULL,
-        last_scanned_at TEXT
+        last_scanned_at TEXT,
+        max_concurrency INTEGER
     )
     """
     with get_connection() as conn:
         conn.execute(sql)
+        # Existing tables created before migration 11 lack max_concurrency.
+        add_column_if_missing(conn, "scan_targets", "max_concurrency", "INTEGER")
         conn.commit()
 
 
-def add_scan_target(path: str, note: str | None = None):
-    """Add a directory path into scan_targets as active."""
+def add_scan_target(
+    path: str, note: str | None = None, max_concurrency: int | None = None
+):
+    """Add a directory path into scan_targets as active.
+
+    max_concurrency limits parallel reads on the target's device
+    (e.g. 1 for an HDD, 16 for an SSD/NAS); None falls back to SCAN_WORKERS.
+    """
     full_path = str(Path(path).resolve())
     with get_connection() as conn:
+        add_column_if_missing(conn, "scan_targets", "max_concurrency", "INTEGER")
         conn.execute(
-            "INSERT OR IGNORE INTO scan_targets (path, active, note) VALUES (?, 1, ?)",
-            (full_path, note),
+            "INSERT OR IGNORE INTO scan_targets (path, active, note, max_concurrency)"
+            " VALUES (?, 1, ?, ?)",
+            (full_path, note, max_concurrency),
         )
         conn.commit()
 
@@ -39,19 +51,22 @@ def add_scan_target(path: str, note: str | None = None):
 def list_scan_targets():
     """Print all registered scan target directories."""
     with get_connection() as conn:
+        add_column_if_missing(conn, "scan_targets", "max_concurrency", "INTEGER")
         rows = conn.execute(
-            "SELECT id, path, active, note FROM scan_targets ORDER BY id"
+            "SELECT id, path, active, note, max_concurrency FROM scan_targets ORDER BY id"
         ).fetchall()
 
     print("\N{file folder} 登録ディレクトリ一覧")
     for row in rows:
         status = "✔ 有効" if row["active"] else "✘ 無効"
         note = f" （{row['note']}）" if row["note"] else ""
-        print(f"- ID:{row['id']} | {status} | {row['path']}{note}")
+        limit = f" | 同時 {row['max_concurrency']}" if row["max_concurrency"] else ""
+        print(f"- ID:{row['id']} | {status} | {row['path']}{limit}{note}")
 
 
 if __name__ == "__main__":
     initialize_scan_targets()
     add_scan_target("D:/DL/2025_07", "2025年7月DL分")
     add_scan_target("D:/DL/2025_06", "保留中")
+    add_scan_target("E:/Archive", "外付けHDD", max_concurrency=1)
     list_scan_targets()
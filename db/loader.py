@@ -5,8 +5,9 @@
 import json
 import re
 from pathlib import Path
-from db.handler import insert_work, work_exists
-from config import BASE_DIRS, CLASSIFY_OUTPUT_PREFIX
+from db.handler import bulk_insert_works, get_connection, insert_works_batch
+from config import BASE_DIRS, CLASSIFY_OUTPUT_PREFIX, INGEST_BATCH_SIZE
+from folders.scanner import export_scan_json, iter_scanned_targets
 
 
 # 🔍 一番新しい JSON ファイルを探す
@@ -20,10 +21,10 @@ def find_latest_json(base_dir: Path) -> Path | None:
 
 
 def load_classified_works():
-    "🍣"
-    total = 0
-    skipped = 0
-
+    """
+    各ベースディレクトリの最新分類結果 JSON を読み込み、未登録分を works に一括登録する
+    - ベースディレクトリごとに1接続・1トランザクション（bulk_insert_works）
+    """
     for base_dir in BASE_DIRS:
         base = Path(base_dir)
         json_path = find_latest_json(base)
@@ -37,16 +38,44 @@ def load_classified_works():
 
         print(f"📤 {json_path.name} をロード中...")
 
-        for record in records:
-            folder = record["folder_path"]
-            name = record["original_name"]
-            count = record["image_count"]
+        inserted, skipped = bulk_insert_works(records)
+
+        print(f"📥 {base.name} → 新規登録: {inserted} 件（スキップ: {skipped}）")
+
+
+def ingest_scanned_works(
+    incremental: bool = False,
+    export_json: bool = False,
+    batch_size: int = INGEST_BATCH_SIZE,
+    workers: int | None = None,
+):
+    """
+    scan_targets を走査し、JSON を経由せずに works へ直接登録する
+
+    - batch_size 件ごとにまとめて INSERT し、1トランザクションで commit
+    - export_json=True の場合のみ、従来の scan_*.json も副次的に出力する
+    """
+    total = 0
+    skipped = 0
+
+    with get_connection() as conn:
+        for base, records in iter_scanned_targets(
+            conn, workers=workers, incremental=incremental
+        ):
+            inserted = 0
+            for start in range(0, len(records), batch_size):
+                inserted += insert_works_batch(conn, records[start : start + batch_size])
+                conn.commit()
 
-            if work_exists(folder):
-                skipped += 1
-                continue
+            total += inserted
+            skipped += len(records) - inserted
+            print(
+                f"📥 {base.name} → 新規登録: {inserted} 件"
+                f"（スキップ: {len(records) - inserted}）"
+            )
 
-            insert_work(folder, name, count)
-            total += 1
+            if export_json:
+                json_path = export_scan_json(base, records, indent=None)
+                print(f" - JSON: {json_path.name}")
 
-        print(f"📥 {base.name} → 新規登録: {total} 件（スキップ: {skipped}）")
+    print(f"✅ ingest 完了: 新規登録 {total} 件 / スキップ {skipped} 件")
@@ -0,0 +1,335 @@
+"🍣"
+
+# db/migrator.py
+
+import sqlite3
+from pathlib import Path
+from typing import Callable
+
+from db.handler import CHECKPOINT_DDL, get_connection
+from db.search import (
+    SEARCH_SOURCE_TABLES,
+    ensure_search_index,
+    fts5_available,
+    rebuild_search_index,
+)
+from sync.quarantine import QUARANTINE_DDL
+from utils.normalizer import normalize_many
+
+SCHEMA_PATH = Path(__file__).resolve().parent / "schema.sql"
+
+
+# --- 補助関数 ---
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    "PRAGMA user_version に記録されたスキーマバージョンを返す"
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    "テーブルが存在するか"
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()
+    return row is not None
+
+
+def column_exists(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    "テーブルに列が存在するか"
+    return any(
+        row[1] == column for row in conn.execute(f"PRAGMA table_info({table})")
+    )
+
+
+def add_column_if_missing(
+    conn: sqlite3.Connection, table: str, column: str, definition: str
+):
+    "ALTER TABLE ADD COLUMN を、既に列がある場合は何もしない形で実行する"
+    if not column_exists(conn, table, column):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def execute_ddl(conn: sqlite3.Connection, ddl: str):
+    """
+    複数文の DDL を1文ずつ実行する
+    - executescript は先に COMMIT してしまうため、共有接続・マイグレーションのトランザクション内ではこちらを使う
+    """
+    statement = ""
+    for line in ddl.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+
+
+# --- マイグレーションが追加するテーブルの DDL ---
+# 適用済みのマイグレーションの意味が変わらないよう、導入時の定義のまま固定する
+# （folders.scanner.ensure_folder_inventory も同じ定義を使う）
+
+# migration 2: 作品フォルダごとの走査結果
+FOLDER_INVENTORY_DDL = """
+CREATE TABLE IF NOT EXISTS folder_inventory (
+  folder_path TEXT PRIMARY KEY,
+  base_dir TEXT NOT NULL,
+  inode INTEGER,
+  mtime_ns INTEGER,
+  dir_mtimes TEXT, -- JSON: 配下サブディレクトリの相対パス → mtime_ns
+  image_count INTEGER NOT NULL,
+  scanned_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_folder_inventory_base_dir
+  ON folder_inventory (base_dir);
+"""
+
+# migration 10: ベースディレクトリごとの最終走査（folder_inventory を再利用してよいかの判断に使う）
+INVENTORY_SNAPSHOTS_DDL = """
+CREATE TABLE IF NOT EXISTS inventory_snapshots (
+  base_dir TEXT PRIMARY KEY,
+  base_mtime_ns INTEGER,
+  scanned_at TEXT NOT NULL
+);
+"""
+
+# migration 13: original_name が変わった（または id が再利用された）作品の draft を解析し直させる
+DRAFT_NAME_TRIGGERS_DDL = """
+CREATE TRIGGER IF NOT EXISTS trg_works_name_changed
+AFTER UPDATE OF original_name ON works
+WHEN NEW.original_name IS NOT OLD.original_name
+BEGIN
+  UPDATE works_draft SET name_hash = NULL WHERE work_id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_works_inserted
+AFTER INSERT ON works
+BEGIN
+  UPDATE works_draft SET name_hash = NULL WHERE work_id = NEW.id;
+END;
+"""
+
+
+def ensure_draft_name_triggers(conn: sqlite3.Connection):
+    """
+    works_draft.name_hash を消すトリガー（DRAFT_NAME_TRIGGERS_DDL）が無ければ作成する
+    - トリガーが無かった間の名前の変更は分からないので、作成時に既存 draft の name_hash を消す
+      （次回の analyze で pending の作品を一度だけ解析し直す）
+    """
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_works_name_changed'"
+    ).fetchone()
+    if row is not None or not table_exists(conn, "works_draft"):
+        return
+    execute_ddl(conn, DRAFT_NAME_TRIGGERS_DDL)
+    conn.execute("UPDATE works_draft SET name_hash = NULL WHERE name_hash IS NOT NULL")
+
+
+
+# --- マイグレーション本体 ---
+# 各マイグレーションは冪等に書く（schema.sql から作った新規DBにも適用されるため）
+
+
+def _migration_1_hot_path_indexes(conn: sqlite3.Connection):
+    """
+    works.folder_path / works.status と中間テーブルの逆引き用インデックスを追加
+    - folder_path に重複がある既存DBでは UNIQUE を諦めて通常インデックスにする
+    """
+    duplicates = conn.execute(
+        """
+        SELECT COUNT(*) FROM (
+            SELECT folder_path FROM works GROUP BY folder_path HAVING COUNT(*) > 1
+        )
+        """
+    ).fetchone()[0]
+    if duplicates:
+        print(
+            f"[warn] works.folder_path に重複 {duplicates} 件があるため"
+            " UNIQUE ではないインデックスを作成します"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_works_folder_path ON works (folder_path)"
+        )
+    else:
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_works_folder_path"
+            " ON works (folder_path)"
+        )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_works_status ON works (status)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_work_circle_authors_circle"
+        " ON work_circle_authors (circle_id)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_work_circle_authors_author"
+        " ON work_circle_authors (author_id)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_work_sources_source ON work_sources (source_id)"
+    )
+
+
+def _migration_2_scan_tables(conn: sqlite3.Connection):
+    """
+    scan_targets / folder_inventory を既存DBに追加し、
+    reviewer が更新する works の補完列（schema.sql 未定義のDB向け）を揃える
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scan_targets (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          path TEXT NOT NULL UNIQUE,
+          active BOOLEAN NOT NULL DEFAULT 1,
+          note TEXT DEFAULT NULL,
+          last_scanned_at TEXT
+        )
+        """
+    )
+    execute_ddl(conn, FOLDER_INVENTORY_DDL)
+    for column in ("circle_id", "author_id", "source_id"):
+        add_column_if_missing(conn, "works", column, "INTEGER")
+
+
+def _migration_3_match_keys(conn: sqlite3.Connection):
+    """
+    辞書テーブル（circles / authors / sources / types）に照合キー match_key を追加し、
+    既存行を normalize_for_matching（normalize_many）で埋めてインデックスを張る
+    """
+    for table in ("circles", "authors", "sources", "types"):
+        if not table_exists(conn, table):
+            continue
+        add_column_if_missing(conn, table, "match_key", "TEXT")
+        rows = conn.execute(
+            f"SELECT id, name FROM {table} WHERE match_key IS NULL"
+        ).fetchall()
+        keys = normalize_many(name for _, name in rows)
+        conn.executemany(
+            f"UPDATE {table} SET match_key = ? WHERE id = ?",
+            ((key, row_id) for key, (row_id, _) in zip(keys, rows)),
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_match_key ON {table} (match_key)"
+        )
+
+
+def _migration_4_job_checkpoints(conn: sqlite3.Connection):
+    "review などのチャンク処理の進捗を保存する job_checkpoints を追加"
+    conn.execute(CHECKPOINT_DDL)
+
+
+def _migration_5_draft_versions(conn: sqlite3.Connection):
+    "works_draft に解析元の名前ハッシュとパーサのバージョンを記録する列を追加"
+    if not table_exists(conn, "works_draft"):
+        return
+    add_column_if_missing(conn, "works_draft", "name_hash", "TEXT")
+    add_column_if_missing(conn, "works_draft", "parser_version", "INTEGER")
+
+
+def _migration_6_search_index(conn: sqlite3.Connection):
+    """
+    全文検索用の works_fts（FTS5 trigram）と同期トリガーを作成し、既存の works で埋める
+    - FTS5 に対応していない SQLite ではスキップする（search は使えない）
+    """
+    missing = [t for t in SEARCH_SOURCE_TABLES if not table_exists(conn, t)]
+    if missing:
+        print(f"[warn] {', '.join(missing)} が無いため検索インデックスを作成しません")
+        return
+    if not fts5_available(conn):
+        print("[warn] SQLite が FTS5（trigram）に対応していないため検索インデックスを作成しません")
+        return
+    ensure_search_index(conn)
+    rebuild_search_index(conn)
+
+
+def _migration_7_work_minhash(conn: sqlite3.Connection):
+    "重複候補検出（dupes）の MinHash シグネチャを保存する work_minhash を追加"
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS work_minhash (
+          work_id INTEGER PRIMARY KEY,
+          text_hash TEXT NOT NULL,
+          signature BLOB NOT NULL
+        )
+        """
+    )
+
+
+def _migration_8_quarantine(conn: sqlite3.Connection):
+    "clean-fs / clean-zero で隔離したフォルダを記録する quarantine を追加"
+    conn.execute(QUARANTINE_DDL)
+
+
+def _migration_9_work_fingerprint(conn: sqlite3.Connection):
+    "sync の移動検出に使うフォルダの指紋 works.fingerprint を追加"
+    add_column_if_missing(conn, "works", "fingerprint", "TEXT")
+
+
+def _migration_10_inventory_snapshots(conn: sqlite3.Connection):
+    "sync / clean 系コマンドが folder_inventory を共有するための inventory_snapshots を追加"
+    execute_ddl(conn, INVENTORY_SNAPSHOTS_DDL)
+
+
+def _migration_11_scan_concurrency(conn: sqlite3.Connection):
+    "デバイスごとの同時走査数の上限 scan_targets.max_concurrency を追加"
+    add_column_if_missing(conn, "scan_targets", "max_concurrency", "INTEGER")
+
+
+def _migration_12_fingerprint_state(conn: sqlite3.Connection):
+    "指紋を計算したときのフォルダの状態 works.fingerprint_state を追加（中身の変化で再計算する）"
+    add_column_if_missing(conn, "works", "fingerprint_state", "TEXT")
+
+
+def _migration_13_draft_name_triggers(conn: sqlite3.Connection):
+    "works.original_name の変更で works_draft.name_hash を消すトリガーを追加（analyze の差分判定を SQL で行う）"
+    ensure_draft_name_triggers(conn)
+
+
+# (バージョン, 説明, 適用関数) ― バージョンは 1 からの連番
+MIGRATIONS: list[tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "hot-path indexes", _migration_1_hot_path_indexes),
+    (2, "scan tables and review columns", _migration_2_scan_tables),
+    (3, "dictionary match keys", _migration_3_match_keys),
+    (4, "job checkpoints", _migration_4_job_checkpoints),
+    (5, "draft name hash and parser version", _migration_5_draft_versions),
+    (6, "full-text search index", _migration_6_search_index),
+    (7, "work minhash signatures", _migration_7_work_minhash),
+    (8, "folder quarantine", _migration_8_quarantine),
+    (9, "work folder fingerprint", _migration_9_work_fingerprint),
+    (10, "inventory snapshots", _migration_10_inventory_snapshots),
+    (11, "scan target concurrency", _migration_11_scan_concurrency),
+    (12, "work fingerprint state", _migration_12_fingerprint_state),
+    (13, "draft name hash triggers", _migration_13_draft_name_triggers),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def migrate(conn: sqlite3.Connection | None = None, target: int | None = None) -> int:
+    """
+    未適用のマイグレーションを順に適用し、適用後のバージョンを返す
+
+    - 現在のバージョンは PRAGMA user_version で管理する
+    - works テーブルが無い新規DBには、先に schema.sql を適用する
+    - 各マイグレーションは1トランザクションで適用し、失敗時はそのバージョンで止まる
+    """
+    if conn is None:
+        with get_connection() as own_conn:
+            return migrate(own_conn, target)
+
+    target = LATEST_VERSION if target is None else target
+
+    if not table_exists(conn, "works"):
+        conn.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
+        print("🆕 schema.sql から新規DBを作成しました")
+
+    current = get_schema_version(conn)
+    for version, description, apply in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+        conn.execute("BEGIN")
+        try:
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"⬆️ migration {version}: {description}")
+        current = version
+
+    return current
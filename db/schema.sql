@@ -7,7 +7,9 @@ CREATE TABLE "works" (
   image_count INTEGER,
   status TEXT,
   type_id INTEGER REFERENCES types (id),
-  title TEXT
+  title TEXT,
+  fingerprint TEXT, -- 配下ファイル名 + サイズのハッシュ（sync の移動検出用）
+  fingerprint_state TEXT -- 指紋を計算したときの folder_inventory の状態（変化したら再計算）
 );
 
 CREATE TABLE works_draft (
@@ -18,6 +20,8 @@ CREATE TABLE works_draft (
   type_raw TEXT,
   title_raw TEXT,
   note TEXT,
+  name_hash TEXT,
+  parser_version INTEGER,
   FOREIGN KEY (work_id) REFERENCES works (id) ON DELETE CASCADE
 );
 CREATE TABLE work_circle_authors (
@@ -47,20 +51,24 @@ CREATE TABLE work_completion_state (
 
 CREATE TABLE circles (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
-  name TEXT NOT NULL UNIQUE
+  name TEXT NOT NULL UNIQUE,
+  match_key TEXT -- normalize_for_matching(name)
 );
 CREATE TABLE authors (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
-  name TEXT NOT NULL UNIQUE
+  name TEXT NOT NULL UNIQUE,
+  match_key TEXT -- normalize_for_matching(name)
 );
 CREATE TABLE sources (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   name TEXT NOT NULL UNIQUE,
-  type TEXT
+  type TEXT,
+  match_key TEXT -- normalize_for_matching(name)
 );
 CREATE TABLE types (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
-  name TEXT NOT NULL UNIQUE
+  name TEXT NOT NULL UNIQUE,
+  match_key TEXT -- normalize_for_matching(name)
 );
 
 CREATE TABLE IF NOT EXISTS scan_targets (
@@ -68,5 +76,48 @@ CREATE TABLE IF NOT EXISTS scan_targets (
   path TEXT NOT NULL UNIQUE,
   active BOOLEAN NOT NULL DEFAULT 1,
   note TEXT DEFAULT NULL,
-  last_scanned_at TEXT
+  last_scanned_at TEXT,
+  max_concurrency INTEGER
+);
+
+-- folder_inventory / inventory_snapshots は db/migrator.py の FOLDER_INVENTORY_DDL /
+-- INVENTORY_SNAPSHOTS_DDL で作成する（migration 2 / 10、走査時の ensure_folder_inventory）
+
+-- works.original_name の変更で works_draft.name_hash を消すトリガーは
+-- db/migrator.py の DRAFT_NAME_TRIGGERS_DDL で作成する（migration 13、analyze 時の ensure_draft_name_triggers）
+
+-- 検索・照合のホットパス用インデックス（既存DBは db/migrator.py で追加）
+CREATE UNIQUE INDEX IF NOT EXISTS idx_works_folder_path ON works (folder_path);
+CREATE INDEX IF NOT EXISTS idx_works_status ON works (status);
+CREATE INDEX IF NOT EXISTS idx_work_circle_authors_circle ON work_circle_authors (circle_id);
+CREATE INDEX IF NOT EXISTS idx_work_circle_authors_author ON work_circle_authors (author_id);
+CREATE INDEX IF NOT EXISTS idx_work_sources_source ON work_sources (source_id);
+CREATE INDEX IF NOT EXISTS idx_circles_match_key ON circles (match_key);
+CREATE INDEX IF NOT EXISTS idx_authors_match_key ON authors (match_key);
+CREATE INDEX IF NOT EXISTS idx_sources_match_key ON sources (match_key);
+CREATE INDEX IF NOT EXISTS idx_types_match_key ON types (match_key);
+
+-- 長時間ジョブ（review 等）の進捗。チャンク commit と同じトランザクションで更新する
+CREATE TABLE IF NOT EXISTS job_checkpoints (
+  job TEXT PRIMARY KEY,
+  last_id INTEGER NOT NULL,
+  updated_at TEXT NOT NULL
+);
+
+-- 重複候補検出（dupes）の MinHash シグネチャ。照合テキストが変わった作品だけ再計算する
+CREATE TABLE IF NOT EXISTS work_minhash (
+  work_id INTEGER PRIMARY KEY,
+  text_hash TEXT NOT NULL,
+  signature BLOB NOT NULL
+);
+
+-- clean-fs / clean-zero で隔離ディレクトリへ移したフォルダ（purge で実削除、restore で復元）
+CREATE TABLE IF NOT EXISTS quarantine (
+  id INTEGER PRIMARY KEY,
+  original_path TEXT NOT NULL,
+  quarantine_path TEXT NOT NULL UNIQUE,
+  reason TEXT,
+  quarantined_at TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'quarantined',
+  resolved_at TEXT
 );
@@ -0,0 +1,277 @@
+"🍣"
+
+# db/search.py
+#
+# works の全文検索（FTS5 trigram）
+# - 検索用の表 works_fts（rowid = works.id）は works / works_draft / 中間テーブル /
+#   辞書テーブルのトリガーが記録した変更（works_fts_dirty）を、検索前にまとめて反映する
+# - trigram は3文字未満の語を索引で引けないため、短い語は LIKE で絞り込む
+
+import sqlite3
+
+from config import SEARCH_PAGE_SIZE
+from db.handler import get_connection
+
+# bm25 の列ごとの重み（title, original_name, circles, authors, sources）
+SEARCH_WEIGHTS = (10.0, 2.0, 5.0, 5.0, 3.0)
+
+# trigram で索引を引ける最短の語長
+MIN_TRIGRAM_LENGTH = 3
+
+SEARCH_COLUMNS = ("title", "original_name", "circles", "authors", "sources")
+
+# 検索用テキストの元になるテーブル
+SEARCH_SOURCE_TABLES = (
+    "works",
+    "works_draft",
+    "work_circle_authors",
+    "work_sources",
+    "circles",
+    "authors",
+    "sources",
+)
+
+# works 1件分の検索用テキスト（サークル等は確定済みの中間テーブル + draft の解析結果）
+SEARCH_SOURCE_VIEW = """
+CREATE VIEW IF NOT EXISTS works_search_source AS
+SELECT
+  w.id AS work_id,
+  COALESCE(w.title, d.title_raw, '') AS title,
+  w.original_name AS original_name,
+  TRIM(
+    COALESCE(
+      (SELECT GROUP_CONCAT(DISTINCT c.name) FROM work_circle_authors wca
+       JOIN circles c ON c.id = wca.circle_id WHERE wca.work_id = w.id), ''
+    ) || ' ' || COALESCE(d.circle_raw, '')
+  ) AS circles,
+  TRIM(
+    COALESCE(
+      (SELECT GROUP_CONCAT(DISTINCT a.name) FROM work_circle_authors wca
+       JOIN authors a ON a.id = wca.author_id WHERE wca.work_id = w.id), ''
+    ) || ' ' || COALESCE(d.author_raw, '')
+  ) AS authors,
+  TRIM(
+    COALESCE(
+      (SELECT GROUP_CONCAT(DISTINCT s.name) FROM work_sources ws
+       JOIN sources s ON s.id = ws.source_id WHERE ws.work_id = w.id), ''
+    ) || ' ' || COALESCE(d.source_raw, '')
+  ) AS sources
+FROM works w
+LEFT JOIN works_draft d ON d.work_id = w.id
+"""
+
+SEARCH_TABLE_DDL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS works_fts USING fts5(
+  title, original_name, circles, authors, sources,
+  tokenize = 'trigram'
+)
+"""
+
+
+# 変更のあった work_id（次の検索・sync_search_index で works_fts に反映する）
+SEARCH_DIRTY_DDL = """
+CREATE TABLE IF NOT EXISTS works_fts_dirty (
+  work_id INTEGER PRIMARY KEY
+)
+"""
+
+
+def _mark(work_ids: str) -> str:
+    "work_ids（SQL式 / 副問い合わせ）を works_fts_dirty に記録する文"
+    if work_ids.lstrip().upper().startswith("SELECT"):
+        return f"INSERT OR IGNORE INTO works_fts_dirty (work_id) {work_ids};"
+    return f"INSERT OR IGNORE INTO works_fts_dirty (work_id) VALUES ({work_ids});"
+
+
+# (トリガー名, 発火条件, 本文)
+# FTS5 は行ごとの DELETE で未書き込みの索引をフラッシュするため、トリガーでは
+# works_fts を直接更新せず、変更された work_id を記録するだけにする
+SEARCH_TRIGGERS = [
+    ("works_fts_works_ai", "AFTER INSERT ON works", _mark("NEW.id")),
+    ("works_fts_works_au", "AFTER UPDATE OF title, original_name ON works", _mark("NEW.id")),
+    ("works_fts_works_ad", "AFTER DELETE ON works", _mark("OLD.id")),
+    ("works_fts_draft_ai", "AFTER INSERT ON works_draft", _mark("NEW.work_id")),
+    ("works_fts_draft_au", "AFTER UPDATE ON works_draft", _mark("NEW.work_id")),
+    ("works_fts_draft_ad", "AFTER DELETE ON works_draft", _mark("OLD.work_id")),
+    ("works_fts_wca_ai", "AFTER INSERT ON work_circle_authors", _mark("NEW.work_id")),
+    ("works_fts_wca_ad", "AFTER DELETE ON work_circle_authors", _mark("OLD.work_id")),
+    ("works_fts_ws_ai", "AFTER INSERT ON work_sources", _mark("NEW.work_id")),
+    ("works_fts_ws_ad", "AFTER DELETE ON work_sources", _mark("OLD.work_id")),
+    (
+        "works_fts_circles_au",
+        "AFTER UPDATE OF name ON circles",
+        _mark("SELECT work_id FROM work_circle_authors WHERE circle_id = NEW.id"),
+    ),
+    (
+        "works_fts_authors_au",
+        "AFTER UPDATE OF name ON authors",
+        _mark("SELECT work_id FROM work_circle_authors WHERE author_id = NEW.id"),
+    ),
+    (
+        "works_fts_sources_au",
+        "AFTER UPDATE OF name ON sources",
+        _mark("SELECT work_id FROM work_sources WHERE source_id = NEW.id"),
+    ),
+]
+
+
+def fts5_available(conn: sqlite3.Connection) -> bool:
+    "SQLite が FTS5（trigram トークナイザ）に対応しているか"
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x, tokenize = 'trigram')")
+    except sqlite3.OperationalError:
+        return False
+    conn.execute("DROP TABLE temp._fts5_probe")
+    return True
+
+
+def search_index_exists(conn: sqlite3.Connection) -> bool:
+    "works_fts が作成済みか"
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'works_fts'"
+    ).fetchone()
+    return row is not None
+
+
+def ensure_search_index(conn: sqlite3.Connection):
+    "検索用のビュー・FTS5 表・変更記録表・同期トリガーを作成する（作成済みなら何もしない）"
+    conn.execute(SEARCH_SOURCE_VIEW)
+    conn.execute(SEARCH_TABLE_DDL)
+    conn.execute(SEARCH_DIRTY_DDL)
+    for name, event, body in SEARCH_TRIGGERS:
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+
+def rebuild_search_index(conn: sqlite3.Connection) -> int:
+    "works_fts を works 全件から作り直し、登録件数を返す"
+    conn.execute("DELETE FROM works_fts")
+    conn.execute("DELETE FROM works_fts_dirty")
+    cur = conn.execute(
+        """
+        INSERT INTO works_fts (rowid, title, original_name, circles, authors, sources)
+        SELECT work_id, title, original_name, circles, authors, sources
+        FROM works_search_source
+        """
+    )
+    return cur.rowcount
+
+
+def sync_search_index(conn: sqlite3.Connection) -> int:
+    """
+    works_fts_dirty に記録された work_id だけ works_fts を作り直し、件数を返す
+    - まとめて DELETE / INSERT するので、大量登録の直後でも1回の書き込みで済む
+    - 削除された works は作り直されない（索引から消える）
+    """
+    dirty = conn.execute("SELECT COUNT(*) FROM works_fts_dirty").fetchone()[0]
+    if not dirty:
+        return 0
+    conn.execute(
+        "DELETE FROM works_fts WHERE rowid IN (SELECT work_id FROM works_fts_dirty)"
+    )
+    conn.execute(
+        """
+        INSERT INTO works_fts (rowid, title, original_name, circles, authors, sources)
+        SELECT s.work_id, s.title, s.original_name, s.circles, s.authors, s.sources
+        FROM works_fts_dirty x
+        JOIN works_search_source s ON s.work_id = x.work_id
+        """
+    )
+    conn.execute("DELETE FROM works_fts_dirty")
+    return dirty
+
+
+def _phrase(term: str) -> str:
+    "FTS5 のフレーズとして安全に引用する"
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _like_pattern(term: str) -> str:
+    "LIKE 用の部分一致パターン（% _ \\ をエスケープ）"
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def build_search_query(query: str) -> tuple[str, list, bool]:
+    """
+    検索語（空白区切り・すべて AND）から WHERE 句とパラメータを組み立てる
+    戻り値は (WHERE 句, パラメータ, MATCH を使うか)
+    - 3文字以上の語は FTS5 MATCH（フレーズ一致）
+    - 3文字未満の語はいずれかの列に LIKE で部分一致
+    """
+    terms = query.split()
+    long_terms = [t for t in terms if len(t) >= MIN_TRIGRAM_LENGTH]
+    short_terms = [t for t in terms if len(t) < MIN_TRIGRAM_LENGTH]
+
+    clauses = []
+    params: list = []
+    if long_terms:
+        clauses.append("works_fts MATCH ?")
+        params.append(" ".join(_phrase(t) for t in long_terms))
+    for term in short_terms:
+        clauses.append(
+            "(" + " OR ".join(f"f.{col} LIKE ? ESCAPE '\\'" for col in SEARCH_COLUMNS) + ")"
+        )
+        params.extend([_like_pattern(term)] * len(SEARCH_COLUMNS))
+    return " AND ".join(clauses), params, bool(long_terms)
+
+
+def search_works(
+    conn: sqlite3.Connection, query: str, limit: int = SEARCH_PAGE_SIZE, offset: int = 0
+) -> tuple[int, list[sqlite3.Row]]:
+    """
+    works を全文検索し、(総件数, 該当ページの行) を返す
+    - 未反映の変更（works_fts_dirty）があれば先に反映する（commit は呼び出し側）
+    - MATCH を使う場合は bm25（SEARCH_WEIGHTS で列ごとに重み付け）の順、
+      短い語だけの場合は work_id 順
+    """
+    sync_search_index(conn)
+    where, params, ranked = build_search_query(query)
+    if not where:
+        return 0, []
+
+    total = conn.execute(
+        f"SELECT COUNT(*) FROM works_fts f WHERE {where}", params
+    ).fetchone()[0]
+
+    weights = ", ".join(str(w) for w in SEARCH_WEIGHTS)
+    order = f"bm25(works_fts, {weights})" if ranked else "w.id"
+    rows = conn.execute(
+        f"""
+        SELECT w.id, w.title, w.original_name, w.folder_path, w.status
+        FROM works_fts f
+        JOIN works w ON w.id = f.rowid
+        WHERE {where}
+        ORDER BY {order}
+        LIMIT ? OFFSET ?
+        """,
+        [*params, limit, offset],
+    ).fetchall()
+    return total, rows
+
+
+def print_search_results(
+    query: str, limit: int = SEARCH_PAGE_SIZE, page: int = 1, rebuild: bool = False
+):
+    """
+    🍣 検索して結果を表示する（search サブコマンド）
+    - 検索インデックスが無ければ作成してから検索する
+    """
+    with get_connection() as conn:
+        if not search_index_exists(conn) or rebuild:
+            if not fts5_available(conn):
+                print("❌ この SQLite は FTS5（trigram）に対応していません")
+                return
+            ensure_search_index(conn)
+            count = rebuild_search_index(conn)
+            conn.commit()
+            print(f"🛠 検索インデックスを作成しました: {count} 件")
+
+        page = max(page, 1)
+        total, rows = search_works(conn, query, limit=limit, offset=(page - 1) * limit)
+        conn.commit()
+
+    pages = max((total + limit - 1) // limit, 1)
+    print(f"🔎 「{query}」: {total} 件（{page}/{pages} ページ）")
+    for row in rows:
+        title = row["title"] or row["original_name"]
+        print(f"  [{row['id']}] {title}  ({row['status']})  {row['folder_path']}")
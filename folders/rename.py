@@ -4,85 +4,134 @@
 
 import os
 import csv
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Iterable
+from config import LOG_DIR, RENAME_WORKERS
 from utils.normalizer import normalize_for_filename
 from db.handler import get_connection
+from utils.diagnostics import stage
+from folders.rename_journal import (
+    ERROR,
+    PLANNED,
+    RENAMED,
+    ROLLED_BACK,
+    SKIPPED,
+    RenameJournal,
+    load_journal,
+)
+
+
+def build_folder_name(
+    work_id: int,
+    title: str,
+    type_name: str,
+    circle_map: dict[str, list],
+    sources: list[str],
+) -> str:
+    "取得済みのメタ情報からフォルダ名を組み立てる（DBアクセスなし）"
+    # 1. [サークル (作者1、作者2)、サークル] の部分
+    circle_parts = []
+    for circle, authors in circle_map.items():
+        if authors and any(a for a in authors):
+            authors_str = "、".join(a for a in authors if a)
+            part = f"{circle} ({authors_str})"
+        else:
+            part = circle
+        circle_parts.append(part)
+    circle_section = "、".join(circle_parts)
 
+    # 2. (ソース1、ソース2)
+    source_section = f"（{'、'.join(sources)}）" if sources else ""
+
+    # 3. 全体構成
+    parts = [f"｛{type_name}｝[{circle_section}]", title]
+    if source_section:
+        parts.append(source_section)
+    parts.append(f"#id{work_id}")
+    raw_name = " ".join(parts)
+    return normalize_for_filename(raw_name)
 
-def compose_folder_name(work_id: int) -> str:
-    "work_id に対応する新しいフォルダ名を構築する"
 
+def compose_folder_names(work_ids: Iterable[int]) -> dict[int, str]:
+    """
+    複数 work_id の新しいフォルダ名をまとめて構築する
+    - 対象 id を一時テーブルに入れ、作品・サークル/作者・ソースを各1クエリで取得
+    - 存在しない work_id は結果に含まれない
+    """
     with get_connection() as conn:
         cur = conn.cursor()
+        cur.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS _compose_ids (id INTEGER PRIMARY KEY)"
+        )
+        cur.execute("DELETE FROM _compose_ids")
+        cur.executemany(
+            "INSERT OR IGNORE INTO _compose_ids (id) VALUES (?)",
+            ((work_id,) for work_id in work_ids),
+        )
 
         # works.title, type名
         cur.execute(
             """
-            SELECT w.title, t.name AS type_name
-            FROM works w
+            SELECT w.id, w.title, t.name AS type_name
+            FROM _compose_ids i
+            JOIN works w ON w.id = i.id
             LEFT JOIN types t ON w.type_id = t.id
-            WHERE w.id = ?
-        """,
-            (work_id,),
+        """
         )
-        row = cur.fetchone()
-        if not row:
-            raise ValueError(f"work_id {work_id} が存在しません")
-
-        title = row["title"]
-        type_name = row["type_name"]
+        works = {row["id"]: (row["title"], row["type_name"]) for row in cur.fetchall()}
 
         # work_circle_authors: {circle_id, author_id} → name
         cur.execute(
             """
-            SELECT c.name AS circle_name, a.name AS author_name
-            FROM work_circle_authors wca
+            SELECT wca.work_id, c.name AS circle_name, a.name AS author_name
+            FROM _compose_ids i
+            JOIN work_circle_authors wca ON wca.work_id = i.id
             JOIN circles c ON wca.circle_id = c.id
             LEFT JOIN authors a ON wca.author_id = a.id
-            WHERE wca.work_id = ?
-        """,
-            (work_id,),
+            ORDER BY wca.work_id, wca.circle_id, wca.author_id
+        """
         )
-        circle_map = {}
+        circle_maps: dict[int, dict[str, list]] = {}
         for row in cur.fetchall():
-            c = row["circle_name"]
-            a = row["author_name"]
-            circle_map.setdefault(c, []).append(a)
+            circle_map = circle_maps.setdefault(row["work_id"], {})
+            circle_map.setdefault(row["circle_name"], []).append(row["author_name"])
 
         # work_sources: source名
         cur.execute(
             """
-            SELECT s.name AS source_name
-            FROM work_sources ws
+            SELECT ws.work_id, s.name AS source_name
+            FROM _compose_ids i
+            JOIN work_sources ws ON ws.work_id = i.id
             JOIN sources s ON ws.source_id = s.id
-            WHERE ws.work_id = ?
-        """,
-            (work_id,),
+            ORDER BY ws.work_id, ws.source_id
+        """
+        )
+        sources: dict[int, list[str]] = {}
+        for row in cur.fetchall():
+            sources.setdefault(row["work_id"], []).append(row["source_name"])
+
+        cur.execute("DELETE FROM _compose_ids")
+
+    # --- フォルダ名構築（メモリ上） ---
+    return {
+        work_id: build_folder_name(
+            work_id,
+            title,
+            type_name,
+            circle_maps.get(work_id, {}),
+            sources.get(work_id, []),
         )
-        sources = [row["source_name"] for row in cur.fetchall()]
+        for work_id, (title, type_name) in works.items()
+    }
 
-    # --- フォルダ名構築 ---
-    # 1. [サークル (作者1、作者2)、サークル] の部分
-    circle_parts = []
-    for circle, authors in circle_map.items():
-        if authors and any(a for a in authors):
-            authors_str = "、".join(a for a in authors if a)
-            part = f"{circle} ({authors_str})"
-        else:
-            part = circle
-        circle_parts.append(part)
-    circle_section = "、".join(circle_parts)
 
-    # 2. (ソース1、ソース2)
-    source_section = f"（{'、'.join(sources)}）" if sources else ""
-
-    # 3. 全体構成
-    parts = [f"｛{type_name}｝[{circle_section}]", title]
-    if source_section:
-        parts.append(source_section)
-    parts.append(f"#id{work_id}")
-    raw_name = " ".join(parts)
-    return normalize_for_filename(raw_name)
+def compose_folder_name(work_id: int) -> str:
+    "work_id に対応する新しいフォルダ名を構築する"
+    names = compose_folder_names([work_id])
+    if work_id not in names:
+        raise ValueError(f"work_id {work_id} が存在しません")
+    return names[work_id]
 
 
 def rename_one_work(work_id: int) -> bool:
@@ -133,11 +182,102 @@ def rename_one_work(work_id: int) -> bool:
         return True
 
 
-def rename_all_confirmed_works():
+def _rename_in_directory(
+    entries: list[tuple[int, str, str]], journal: RenameJournal
+) -> dict[int, list]:
     """
-    補完完了かつ confirmed な works を一括リネーム＋CSVログ出力
+    同一ディレクトリ内のリネームを順に実行する（ディレクトリ単位のワーカー）
+
+    - ディレクトリを1回だけ一覧し、存在確認・衝突検出はメモリ上の集合で行う
+    - 戻り値は work_id → ログ行 [work_id, old_path, new_path, status, reason]
     """
+    base_dir = os.path.dirname(entries[0][1])
+    try:
+        listing = {os.path.normcase(name) for name in os.listdir(base_dir)}
+    except OSError:
+        listing = set()
+
+    results = {}
+    for work_id, old_path, new_path in entries:
+        old_key = os.path.normcase(os.path.basename(old_path))
+        new_key = os.path.normcase(os.path.basename(new_path))
+        try:
+            if old_key not in listing:
+                results[work_id] = [work_id, old_path, "", "error", "missing folder"]
+                journal.mark(work_id, ERROR, "missing folder")
+                print(f"[error] フォルダが存在しません: {old_path}")
+                continue
+
+            if new_key in listing:
+                results[work_id] = [
+                    work_id, old_path, new_path, "skipped", "already exists"
+                ]
+                journal.mark(work_id, SKIPPED, "already exists")
+                print(f"[skip] 既に存在: {new_path}")
+                continue
+
+            # 実行・成功記録
+            os.rename(old_path, new_path)
+            listing.discard(old_key)
+            listing.add(new_key)
+            journal.mark(work_id, RENAMED)
+            results[work_id] = [work_id, old_path, new_path, "renamed", ""]
+            print(f"[renamed] {old_path} → {new_path}")
+
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            results[work_id] = [work_id, old_path, "", "error", str(e)]
+            journal.mark(work_id, ERROR, str(e))
+            print(f"[error] work_id={work_id}: {e}")
+
+    return results
+
+
+def execute_rename_plan(
+    plan: list[tuple[int, str, str]],
+    journal: RenameJournal,
+    workers: int = RENAME_WORKERS,
+) -> dict[int, list]:
+    """
+    リネーム計画をディレクトリごとに並列実行する
+    - 同じディレクトリ内は1スレッドで順に処理する（衝突判定の一貫性のため）
+    """
+    groups: dict[str, list[tuple[int, str, str]]] = {}
+    for entry in plan:
+        groups.setdefault(os.path.dirname(entry[1]), []).append(entry)
+    if not groups:
+        return {}
+
+    results: dict[int, list] = {}
+    max_workers = max(1, min(workers, len(groups)))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for group_result in pool.map(
+            lambda entries: _rename_in_directory(entries, journal), groups.values()
+        ):
+            results.update(group_result)
+    return results
+
+
+def apply_renames_to_db(renamed: list[tuple[int, str]]):
+    "リネーム済み (work_id, new_path) を1トランザクションで DB に反映する"
+    if not renamed:
+        return
     with get_connection() as conn:
+        conn.executemany(
+            "UPDATE works SET folder_path = ?, status = 'renamed' WHERE id = ?",
+            [(new_path, work_id) for work_id, new_path in renamed],
+        )
+        conn.commit()
+
+
+def rename_all_confirmed_works(workers: int = RENAME_WORKERS):
+    """
+    補完完了かつ confirmed な works を一括リネーム＋CSVログ出力
+
+    - 実行前に計画をジャーナル（data/logs/rename_journal_*.jsonl）へ書き出す
+    - リネームはディレクトリ単位で並列実行し、DB 更新は最後にまとめて反映する
+    - 途中で停止した場合は resume_renames / rollback_renames でジャーナルから復旧できる
+    """
+    with stage("rename.select"), get_connection() as conn:
         cur = conn.cursor()
 
         cur.execute(
@@ -157,60 +297,133 @@ def rename_all_confirmed_works():
 
     print(f"🔍 リネーム対象: {len(records)} 件")
 
-    log_rows = []
-    renamed = skipped = failed = 0
+    # 新しいフォルダ名は対象全件分をまとめて構築
+    with stage("rename.compose"):
+        new_names = compose_folder_names(row["id"] for row in records)
 
+    results: dict[int, list] = {}
+    plan = []
     for row in records:
         work_id = row["id"]
         old_path = row["folder_path"]
-        try:
-            new_name = compose_folder_name(work_id)
-            base_dir = os.path.dirname(old_path)
-            new_path = os.path.join(base_dir, new_name)
-
-            if not os.path.exists(old_path):
-                log_rows.append([work_id, old_path, "", "error", "missing folder"])
-                print(f"[error] フォルダが存在しません: {old_path}")
-                failed += 1
-                continue
-
-            if os.path.exists(new_path):
-                log_rows.append(
-                    [work_id, old_path, new_path, "skipped", "already exists"]
-                )
-                print(f"[skip] 既に存在: {new_path}")
-                skipped += 1
-                continue
-
-            # 実行・成功記録
-            os.rename(old_path, new_path)
-            with get_connection() as conn:
-                conn.execute(
-                    """
-                    UPDATE works SET folder_path = ?, status = 'renamed' WHERE id = ?
-                """,
-                    (new_path, work_id),
-                )
-                conn.commit()
+        new_name = new_names.get(work_id)
+        if new_name is None:
+            reason = f"work_id {work_id} が存在しません"
+            results[work_id] = [work_id, old_path, "", "error", reason]
+            print(f"[error] work_id={work_id}: {reason}")
+            continue
+        plan.append((work_id, old_path, os.path.join(os.path.dirname(old_path), new_name)))
+
+    with RenameJournal.create(LOG_DIR, plan) as journal:
+        with stage("rename.move_folders"):
+            results.update(execute_rename_plan(plan, journal, workers=workers))
+
+        with stage("rename.apply_db"):
+            renamed = [(r[0], r[2]) for r in results.values() if r[3] == "renamed"]
+            apply_renames_to_db(renamed)
+            journal.mark_committed([work_id for work_id, _ in renamed])
+
+    log_rows = [results[row["id"]] for row in records]
+    with stage("rename.write_log"):
+        log_path = write_rename_log(log_rows)
 
-            log_rows.append([work_id, old_path, new_path, "renamed", ""])
-            print(f"[renamed] {old_path} → {new_path}")
-            renamed += 1
+    print(f"📄 ログ出力完了: {log_path}")
+    print(f"🧾 ジャーナル: {journal.path}")
+    print_rename_summary(log_rows)
 
-        except Exception as e:  # pylint: disable=broad-exception-caught
-            log_rows.append([work_id, old_path, "", "error", str(e)])
-            print(f"[error] work_id={work_id}: {e}")
-            failed += 1
 
-    # ログ書き出し
-    log_dir = "data/logs"
-    os.makedirs(log_dir, exist_ok=True)
+def write_rename_log(log_rows: list[list]) -> str:
+    "リネーム結果を data/logs/rename_YYYYmmdd.csv に書き出す"
+    os.makedirs(LOG_DIR, exist_ok=True)
     filename = f"rename_{datetime.now():%Y%m%d}.csv"
-    log_path = os.path.join(log_dir, filename)
+    log_path = os.path.join(LOG_DIR, filename)
     with open(log_path, "w", newline="", encoding="utf-8-sig") as f:
         writer = csv.writer(f)
         writer.writerow(["work_id", "old_path", "new_path", "status", "reason"])
         writer.writerows(log_rows)
+    return log_path
 
-    print(f"📄 ログ出力完了: {log_path}")
+
+def print_rename_summary(log_rows: list[list]):
+    "ログ行から件数を集計して表示する"
+    renamed = sum(1 for r in log_rows if r[3] == "renamed")
+    skipped = sum(1 for r in log_rows if r[3] == "skipped")
+    failed = sum(1 for r in log_rows if r[3] == "error")
     print(f"✅ renamed: {renamed} / ⏩ skipped: {skipped} / ❌ error: {failed}")
+
+
+def resume_renames(journal_path: str, workers: int = RENAME_WORKERS):
+    """
+    中断したリネームをジャーナルから再開する
+
+    - 計画のみの項目は、新パスだけが存在すれば実行済みとみなし、未実行なら実行する
+    - リネーム済みで DB 未反映の項目をまとめて DB に反映する
+    """
+    entries = load_journal(journal_path)
+    with RenameJournal(journal_path) as journal:
+        plan = []
+        for work_id, entry in entries.items():
+            if entry["state"] != PLANNED:
+                continue
+            old_exists = os.path.exists(entry["old_path"])
+            new_exists = os.path.exists(entry["new_path"])
+            if new_exists and not old_exists:
+                entry["state"] = RENAMED
+                journal.mark(work_id, RENAMED, "recovered")
+            else:
+                plan.append((work_id, entry["old_path"], entry["new_path"]))
+
+        for work_id, row in execute_rename_plan(plan, journal, workers=workers).items():
+            entries[work_id]["state"] = row[3]
+
+        pending = [
+            (work_id, entry["new_path"])
+            for work_id, entry in entries.items()
+            if entry["state"] == RENAMED and not entry["committed"]
+        ]
+        apply_renames_to_db(pending)
+        journal.mark_committed([work_id for work_id, _ in pending])
+
+    print(f"⏯ 再開: 実行 {len(plan)} 件 / DB 反映 {len(pending)} 件")
+
+
+def rollback_renames(journal_path: str):
+    """
+    ジャーナルに記録されたリネームを元に戻す（フォルダ名と DB の両方）
+    - 旧パスが既に存在する、または新パスが無い項目は戻さずエラーとして表示する
+    """
+    entries = load_journal(journal_path)
+    restored = []
+    with RenameJournal(journal_path) as journal:
+        for work_id, entry in entries.items():
+            # 計画のみの項目も、実際にはリネーム済み（記録前に停止）なら戻す
+            if entry["state"] not in (RENAMED, PLANNED):
+                continue
+            old_path, new_path = entry["old_path"], entry["new_path"]
+            if entry["state"] == PLANNED and not os.path.exists(new_path):
+                continue
+            if os.path.exists(old_path) or not os.path.exists(new_path):
+                print(f"[error] 元に戻せません: {new_path} → {old_path}")
+                continue
+            try:
+                os.rename(new_path, old_path)
+            except OSError as e:
+                print(f"[error] work_id={work_id}: {e}")
+                continue
+            journal.mark(work_id, ROLLED_BACK)
+            restored.append((old_path, work_id, new_path))
+            print(f"[restored] {new_path} → {old_path}")
+
+        if restored:
+            with get_connection() as conn:
+                conn.executemany(
+                    """
+                    UPDATE works SET folder_path = ?, status = 'confirmed'
+                    WHERE id = ? AND folder_path = ?
+                    """,
+                    restored,
+                )
+                conn.commit()
+        journal.sync()
+
+    print(f"↩️ ロールバック完了: {len(restored)} 件")
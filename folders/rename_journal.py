@@ -0,0 +1,109 @@
+"🍣"
+
+# folders/rename_journal.py
+
+import json
+import os
+import threading
+from datetime import datetime
+
+# エントリの状態
+PLANNED = "planned"  # 計画のみ（未実行）
+RENAMED = "renamed"  # フォルダ名変更済み（DB未反映の可能性あり）
+SKIPPED = "skipped"
+ERROR = "error"
+ROLLED_BACK = "rolled_back"
+
+
+class RenameJournal:
+    """
+    リネームの先行書き込みジャーナル（JSON Lines）
+
+    - 実行前に全計画（plan）を書き出して fsync する
+    - 各フォルダの結果（state）は追記のみ。書き込みが失われても、
+      resume 時に旧・新パスの実在状況から状態を復元できる
+    - DB 反映が完了した work_id は db_committed として記録する
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    @classmethod
+    def create(cls, log_dir: str, plan: list[tuple[int, str, str]]) -> "RenameJournal":
+        "計画 (work_id, old_path, new_path) の一覧から新しいジャーナルを作成する"
+        os.makedirs(log_dir, exist_ok=True)
+        path = os.path.join(log_dir, f"rename_journal_{datetime.now():%Y%m%d_%H%M%S}.jsonl")
+        journal = cls(path)
+        for work_id, old_path, new_path in plan:
+            journal._write(
+                {"op": "plan", "work_id": work_id, "old_path": old_path, "new_path": new_path}
+            )
+        journal.sync()
+        return journal
+
+    def _write(self, record: dict):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def mark(self, work_id: int, state: str, reason: str = ""):
+        "1件の結果を追記する（スレッドセーフ）"
+        self._write({"op": "state", "work_id": work_id, "state": state, "reason": reason})
+
+    def mark_committed(self, work_ids: list[int]):
+        "DB 反映が完了した work_id を記録し、ディスクへ確定させる"
+        self._write({"op": "db_committed", "work_ids": list(work_ids)})
+        self.sync()
+
+    def sync(self):
+        "バッファをディスクへ確定させる（fsync）"
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        "ジャーナルファイルを閉じる"
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_journal(path: str) -> dict[int, dict]:
+    """
+    ジャーナルを読み込み、work_id → 最終状態 の辞書（計画順）を返す
+    値は {"old_path", "new_path", "state", "reason", "committed"}
+    - 書き込み途中で途切れた最終行は無視する
+    """
+    entries: dict[int, dict] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            op = record.get("op")
+            if op == "plan":
+                entries[record["work_id"]] = {
+                    "old_path": record["old_path"],
+                    "new_path": record["new_path"],
+                    "state": PLANNED,
+                    "reason": "",
+                    "committed": False,
+                }
+            elif op == "state" and record["work_id"] in entries:
+                entry = entries[record["work_id"]]
+                entry["state"] = record["state"]
+                entry["reason"] = record.get("reason", "")
+                if record["state"] == ROLLED_BACK:
+                    entry["committed"] = False
+            elif op == "db_committed":
+                for work_id in record["work_ids"]:
+                    if work_id in entries:
+                        entries[work_id]["committed"] = True
+    return entries
@@ -3,43 +3,499 @@
 # folders/scanner.py
 
 import json
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
+from typing import Callable, Iterable, TypeVar
 
+from config import SCAN_WORKERS
 from db.handler import get_connection
-from utils.image_counter import count_images
+from db.migrator import (
+    FOLDER_INVENTORY_DDL,
+    INVENTORY_SNAPSHOTS_DDL,
+    add_column_if_missing,
+    execute_ddl,
+    table_exists,
+)
+from sync.quarantine import is_quarantine_dir
+from utils.image_counter import map_folders, scan_folder_tree, tree_unchanged
 
+T = TypeVar("T")
+
+def ensure_folder_inventory(conn):
+    """
+    folder_inventory / inventory_snapshots が無い既存DBのために作成しておく
+    - 共有接続の読み出し経路からも呼ばれるので、executescript（先に COMMIT する）は使わない
+    """
+    execute_ddl(conn, FOLDER_INVENTORY_DDL)
+    execute_ddl(conn, INVENTORY_SNAPSHOTS_DDL)
+
+
+def ensure_scan_target_columns(conn):
+    "scan_targets に migration 11 の max_concurrency が無ければ追加する（未移行の既存DB向け）"
+    add_column_if_missing(conn, "scan_targets", "max_concurrency", "INTEGER")
+
+
+def load_inventory(conn, base_dir: str) -> dict[str, tuple[int, int, dict, int]]:
+    """
+    ベースディレクトリ配下の記録済みフォルダ情報を返す
+    folder_path → (inode, mtime_ns, dir_mtimes, image_count)
+    """
+    rows = conn.execute(
+        """
+        SELECT folder_path, inode, mtime_ns, dir_mtimes, image_count
+        FROM folder_inventory
+        WHERE base_dir = ?
+        """,
+        (base_dir,),
+    ).fetchall()
+    return {
+        row["folder_path"]: (
+            row["inode"],
+            row["mtime_ns"],
+            json.loads(row["dir_mtimes"] or "{}"),
+            row["image_count"],
+        )
+        for row in rows
+    }
+
+
+INVENTORY_UPSERT = """
+INSERT INTO folder_inventory (
+    folder_path, base_dir, inode, mtime_ns, dir_mtimes, image_count, scanned_at
+) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(folder_path) DO UPDATE SET
+    base_dir = excluded.base_dir,
+    inode = excluded.inode,
+    mtime_ns = excluded.mtime_ns,
+    dir_mtimes = excluded.dir_mtimes,
+    image_count = excluded.image_count,
+    scanned_at = excluded.scanned_at
+"""
 
-def scan_and_export():
-    """Scan active base directories and export folder info as JSON."""
-    with get_connection() as conn:
-        rows = conn.execute(
-            "SELECT path FROM scan_targets WHERE active = 1"
-        ).fetchall()
-
-    for row in rows:
-        base = Path(row["path"])
-        if not base.exists():
-            print(f"[warn] base directory not found: {base}")
-            continue
 
-        records = []
-        for child in base.iterdir():
-            if not child.is_dir():
+def record_snapshot(conn, base_dir: str, base_mtime_ns: int, scanned_at: str):
+    "ベースディレクトリの走査時点の mtime（直下の追加・削除・改名で変わる）と時刻を記録する"
+    conn.execute(
+        """
+        INSERT INTO inventory_snapshots (base_dir, base_mtime_ns, scanned_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(base_dir) DO UPDATE SET
+            base_mtime_ns = excluded.base_mtime_ns,
+            scanned_at = excluded.scanned_at
+        """,
+        (base_dir, base_mtime_ns, scanned_at),
+    )
+
+
+class BaseDirWalk:
+    "ベースディレクトリ1件分の走査結果（ファイルシステムだけを見て作る。DB には触れない）"
+
+    def __init__(
+        self,
+        base_dir: str,
+        base_mtime_ns: int,
+        children: list,
+        results: dict,
+        rescanned: int,
+    ):
+        self.base_dir = base_dir
+        self.base_mtime_ns = base_mtime_ns
+        self.children = children  # [(Path, stat_result)]
+        self.results = results  # 解決済みパス → (画像数, dir_mtimes)
+        self.rescanned = rescanned
+
+
+def walk_base_dir(
+    base_dir: str,
+    cached: dict[str, tuple[int, int, dict, int]],
+    workers: int | None = None,
+) -> BaseDirWalk:
+    """
+    ベースディレクトリ直下の作品フォルダを列挙し、画像数を数える（DB アクセスなし）
+    - cached（load_inventory の結果）と inode・mtime・配下ディレクトリの mtime が
+      一致するフォルダは数え直さない
+    - 別スレッドから呼んでよい（書き込みは store_base_dir でまとめて行う）
+    """
+    base_mtime_ns = os.stat(base_dir).st_mtime_ns
+    children = []
+    for entry in os.scandir(base_dir):
+        try:
+            if not entry.is_dir() or is_quarantine_dir(entry.path):
                 continue
-            records.append(
-                {
-                    "folder_path": str(child.resolve()),
-                    "original_name": child.name,
-                    "image_count": count_images(child),
-                    "status": "pending",
-                }
+            st = entry.stat()
+        except OSError:
+            continue
+        children.append((Path(entry.path), st))
+
+    results = {}
+    to_scan = []
+    for child, st in children:
+        key = str(child.resolve())
+        hit = cached.get(key)
+        if (
+            hit
+            and hit[0] == st.st_ino
+            and hit[1] == st.st_mtime_ns
+            and tree_unchanged(child, hit[2])
+        ):
+            results[key] = (hit[3], hit[2])
+        else:
+            to_scan.append(child)
+
+    scanned = map_folders(scan_folder_tree, to_scan, workers=workers)
+    for child in to_scan:
+        results[str(child.resolve())] = scanned[str(child)]
+    return BaseDirWalk(base_dir, base_mtime_ns, children, results, len(to_scan))
+
+
+def store_base_dir(conn, walk: BaseDirWalk, incremental: bool = False) -> list[dict]:
+    """
+    walk_base_dir の結果を folder_inventory / scan_targets / inventory_snapshots に書き込み、
+    作品レコードの一覧を返す（消えたフォルダの記録は削除する）
+    """
+    base_dir = walk.base_dir
+    known = {
+        row["folder_path"]
+        for row in conn.execute(
+            "SELECT folder_path FROM folder_inventory WHERE base_dir = ?", (base_dir,)
+        )
+    }
+
+    now = datetime.now().isoformat(timespec="seconds")
+    records = []
+    inventory_rows = []
+    for child, st in walk.children:
+        key = str(child.resolve())
+        image_count, dir_mtimes = walk.results[key]
+        records.append(
+            {
+                "folder_path": key,
+                "original_name": child.name,
+                "image_count": image_count,
+                "status": "pending",
+            }
+        )
+        inventory_rows.append(
+            (
+                key,
+                base_dir,
+                st.st_ino,
+                st.st_mtime_ns,
+                json.dumps(dir_mtimes, ensure_ascii=False),
+                image_count,
+                now,
+            )
+        )
+
+    conn.executemany(INVENTORY_UPSERT, inventory_rows)
+    present = {row[0] for row in inventory_rows}
+    stale = [(path,) for path in known - present]
+    conn.executemany("DELETE FROM folder_inventory WHERE folder_path = ?", stale)
+    conn.execute(
+        "UPDATE scan_targets SET last_scanned_at = ? WHERE path = ?", (now, base_dir)
+    )
+    record_snapshot(conn, base_dir, walk.base_mtime_ns, now)
+    conn.commit()
+
+    reused = len(walk.children) - walk.rescanned
+    if incremental:
+        print(f" - 再カウント: {walk.rescanned} 件 / 変更なし: {reused} 件")
+    return records
+
+
+def scan_base_dir(
+    conn, base_dir: str, workers: int | None = None, incremental: bool = False
+) -> list[dict]:
+    """
+    ベースディレクトリ直下の作品フォルダを走査し、folder_inventory を更新する
+
+    - incremental=True の場合、inode・mtime・配下ディレクトリの mtime が
+      前回と一致するフォルダは再カウントせず記録済みの画像数を使う
+    - 消えたフォルダの記録は削除する
+    - 走査した時刻とベースディレクトリの mtime を inventory_snapshots に記録する
+      （sync / clean 系コマンドはこれを見て再走査が必要か判断する: sync/inventory.py）
+    """
+    cached = load_inventory(conn, base_dir) if incremental else {}
+    walk = walk_base_dir(base_dir, cached, workers=workers)
+    return store_base_dir(conn, walk, incremental=incremental)
+
+
+def refresh_folders(conn, base_dir: str, folders: list[Path | str]) -> list[dict]:
+    """
+    ベースディレクトリ直下の指定フォルダだけを数え直し、folder_inventory を更新する
+    - 存在するフォルダは scan_base_dir と同じ形式のレコードを返す
+    - 消えたフォルダは folder_inventory から記録を消す（レコードは返さない）
+    - commit は呼び出し側で行う
+    """
+    now = datetime.now().isoformat(timespec="seconds")
+    records = []
+    inventory_rows = []
+    gone = []
+    for folder in folders:
+        path = Path(folder)
+        key = str(path.resolve())
+        try:
+            st = path.stat()
+            exists = path.is_dir() and not is_quarantine_dir(path)
+        except OSError:
+            exists = False
+        if not exists:
+            gone.append((key,))
+            continue
+        image_count, dir_mtimes = scan_folder_tree(path)
+        records.append(
+            {
+                "folder_path": key,
+                "original_name": path.name,
+                "image_count": image_count,
+                "status": "pending",
+            }
+        )
+        inventory_rows.append(
+            (
+                key,
+                base_dir,
+                st.st_ino,
+                st.st_mtime_ns,
+                json.dumps(dir_mtimes, ensure_ascii=False),
+                image_count,
+                now,
             )
+        )
+    conn.executemany(INVENTORY_UPSERT, inventory_rows)
+    conn.executemany("DELETE FROM folder_inventory WHERE folder_path = ?", gone)
+    return records
+
+
+class DeviceGroup:
+    "同じデバイス（st_dev）上の scan_targets と、そのデバイスへの同時アクセス数の上限"
+
+    def __init__(self, device: int, limit: int, targets: list[str]):
+        self.device = device
+        self.limit = limit
+        self.targets = targets
+
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-        json_path = base / f"scan_{timestamp}.json"
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(records, f, indent=2, ensure_ascii=False)
+def _device_of(path: str) -> int:
+    "path のあるデバイス（ボリューム）の番号"
+    return os.stat(path).st_dev
+
+
+def _scanned_order(row) -> tuple:
+    "last_scanned_at の古い順（未走査が先頭）"
+    return (row["last_scanned_at"] is not None, row["last_scanned_at"] or "")
+
+
+def plan_device_groups(rows, default_limit: int = SCAN_WORKERS) -> list[DeviceGroup]:
+    """
+    scan_targets の行（path, max_concurrency, last_scanned_at）をデバイスごとにまとめる
+    - 存在しないパスは警告して除外する
+    - デバイス内の順序は last_scanned_at の古い順（未走査が先頭）
+    - 上限はそのデバイス上の max_concurrency の最小値（未設定の対象は default_limit）
+      例: HDD 上の対象に 1 を設定すると、そのディスクには常に1スレッドしかアクセスしない
+    - グループは、最も古い対象を持つものから並べる
+    """
+    grouped: dict[int, list] = {}
+    for row in sorted(rows, key=_scanned_order):
+        try:
+            device = _device_of(row["path"])
+        except OSError:
+            print(f"[warn] base directory not found: {row['path']}")
+            continue
+        grouped.setdefault(device, []).append(row)
+
+    return [
+        DeviceGroup(
+            device,
+            max(1, min(row["max_concurrency"] or default_limit for row in group)),
+            [row["path"] for row in group],
+        )
+        for device, group in grouped.items()
+    ]
+
+
+def _walk_or_warn(base_dir: str, cached: dict, workers: int) -> BaseDirWalk | None:
+    "走査に失敗したベースディレクトリは警告して飛ばす"
+    try:
+        return walk_base_dir(base_dir, cached, workers=workers)
+    except OSError as e:
+        print(f"[warn] {base_dir}: {e}")
+        return None
+
+
+def run_device_groups(groups: list[DeviceGroup], cached: dict[str, dict]):
+    """
+    デバイスごとに1スレッドを割り当てて走査し、終わった順に BaseDirWalk を返すジェネレータ
+    - 同じデバイス上の対象は順に1件ずつ、group.limit スレッドで数える
+      （デバイスへの同時アクセスは常に limit 以下）
+    - 別のデバイスどうしは並列に走査する
+    - DB への書き込みは呼び出し側（メインスレッド）が行う
+    """
+    if len(groups) <= 1:
+        for group in groups:
+            for target in group.targets:
+                walk = _walk_or_warn(target, cached[target], group.limit)
+                if walk is not None:
+                    yield walk
+        return
+
+    done = object()
+    results: queue.Queue = queue.Queue()
+
+    def _run(group: DeviceGroup):
+        try:
+            for target in group.targets:
+                results.put(_walk_or_warn(target, cached[target], group.limit))
+        finally:
+            results.put(done)
+
+    with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+        futures = [pool.submit(_run, group) for group in groups]
+        running = len(groups)
+        while running:
+            item = results.get()
+            if item is done:
+                running -= 1
+            elif item is not None:
+                yield item
+        for future in futures:
+            future.result()
+
+
+def plan_base_dirs(
+    conn, base_dirs: Iterable[str], default_limit: int = SCAN_WORKERS
+) -> list[DeviceGroup]:
+    """
+    scan_targets 以外のベースディレクトリ群（config.BASE_DIRS など）を DeviceGroup にまとめる
+    - 存在しないベースディレクトリは除外する（警告は呼び出し側）
+    - 上限は同じデバイス上の scan_targets の max_concurrency の最小値
+      （base_dirs に含まれない・無効な対象の設定も、そのディスクの上限として効く）
+    """
+    known = {}
+    if table_exists(conn, "scan_targets"):
+        ensure_scan_target_columns(conn)
+        known = {
+            row["path"]: row
+            for row in conn.execute(
+                "SELECT path, max_concurrency, last_scanned_at FROM scan_targets"
+            )
+        }
+    rows = [
+        known.get(base) or {"path": base, "max_concurrency": None, "last_scanned_at": None}
+        for base in base_dirs
+        if os.path.isdir(base)
+    ]
+    groups = plan_device_groups(rows, default_limit=default_limit)
+
+    limits: dict[int, int] = {}
+    for row in known.values():
+        if not row["max_concurrency"]:
+            continue
+        try:
+            device = _device_of(row["path"])
+        except OSError:
+            continue
+        limits[device] = min(limits.get(device, row["max_concurrency"]), row["max_concurrency"])
+    for group in groups:
+        if group.device in limits:
+            group.limit = max(1, min(group.limit, limits[group.device]))
+    return groups
+
+
+def map_folders_on_devices(
+    func: Callable[[Path | str], T],
+    folders: Iterable[Path | str],
+    groups: list[DeviceGroup],
+    default_limit: int = SCAN_WORKERS,
+) -> dict[str, T]:
+    """
+    作品フォルダごとの処理（画像数・指紋など）を、デバイスの同時アクセス数を守って実行する
+    - フォルダ（解決済みの絶対パス）は親＝ベースディレクトリの属する group で数え、
+      デバイスごとに group.limit スレッドで処理する
+    - 別のデバイスどうしは並列に処理する
+    - どの group にも属さないフォルダは default_limit スレッドで処理する
+    - 戻り値は map_folders と同じ {os.fspath(folder): 結果}（入力順を保持）
+    """
+    targets = list(folders)
+    by_base = {
+        str(Path(target).resolve()): group for group in groups for target in group.targets
+    }
+    batches: dict = {}
+    for folder in targets:
+        group = by_base.get(os.path.dirname(os.fspath(folder)))
+        key = None if group is None else group.device
+        limit = default_limit if group is None else group.limit
+        batches.setdefault(key, (limit, []))[1].append(folder)
+
+    results: dict = {}
+    if len(batches) <= 1:
+        for limit, batch in batches.values():
+            results.update(map_folders(func, batch, workers=limit))
+    else:
+        with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+            futures = [
+                pool.submit(map_folders, func, batch, limit)
+                for limit, batch in batches.values()
+            ]
+            for future in futures:
+                results.update(future.result())
+    return {os.fspath(folder): results[os.fspath(folder)] for folder in targets}
+
+
+def iter_scanned_targets(conn, workers: int | None = None, incremental: bool = False):
+    """
+    有効な scan_targets を走査し、(ベースディレクトリ, レコード一覧) を終わった順に返す
+    - JSON を経由せずに DB 登録などへ直接流すためのジェネレータ
+    - デバイス（st_dev）ごとに並列、デバイス内は max_concurrency 以下で走査する（run_device_groups）
+    - workers は max_concurrency 未設定の対象に使う上限（既定は config.SCAN_WORKERS）
+    """
+    ensure_folder_inventory(conn)
+    ensure_scan_target_columns(conn)
+    rows = conn.execute(
+        """
+        SELECT path, max_concurrency, last_scanned_at
+        FROM scan_targets
+        WHERE active = 1
+        """
+    ).fetchall()
+
+    groups = plan_device_groups(rows, default_limit=workers or SCAN_WORKERS)
+    for group in groups:
+        print(f"💽 device {group.device}: 同時 {group.limit} / 対象 {len(group.targets)} 件")
+    cached = {
+        target: load_inventory(conn, target) if incremental else {}
+        for group in groups
+        for target in group.targets
+    }
+
+    for walk in run_device_groups(groups, cached):
+        yield Path(walk.base_dir), store_base_dir(conn, walk, incremental=incremental)
+
+
+def export_scan_json(base: Path, records: list[dict], indent: int | None = 2) -> Path:
+    "スキャン結果をベースディレクトリ直下に scan_YYYYmmdd_HHMM.json として出力する"
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+    json_path = base / f"scan_{timestamp}.json"
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=indent, ensure_ascii=False)
+    return json_path
+
+
+def scan_and_export(workers: int | None = None, incremental: bool = False):
+    """Scan active base directories and export folder info as JSON.
+
+    Image counting runs in parallel per base directory (see count_images_many).
+    With incremental=True, folders whose inode/mtime and subdirectory mtimes
+    match folder_inventory reuse the recorded image count instead of rescanning.
+    """
+    with get_connection() as conn:
+        for base, records in iter_scanned_targets(
+            conn, workers=workers, incremental=incremental
+        ):
+            json_path = export_scan_json(base, records)
 
-        print(f"✅ {base.name} → スキャン結果を出力（{len(records)} 件）")
-        print(f" - JSON: {json_path.name}")
+            print(f"✅ {base.name} → スキャン結果を出力（{len(records)} 件）")
+            print(f" - JSON: {json_path.name}")
@@ -3,10 +3,30 @@
 # main.py
 
 import argparse
-from folders.rename import rename_all_confirmed_works
+from config import (
+    ANALYZE_WORKERS,
+    DUPLICATE_THRESHOLD,
+    INVENTORY_MAX_AGE_MINUTES,
+    PURGE_WORKERS,
+    QUARANTINE_RETENTION_DAYS,
+    REVIEW_BATCH_SIZE,
+    SEARCH_PAGE_SIZE,
+    WATCH_DEBOUNCE_SECONDS,
+    WATCH_POLL_SECONDS,
+)
+from folders.rename import (
+    rename_all_confirmed_works,
+    resume_renames,
+    rollback_renames,
+)
 from analyze.analyzer import parse_original_names
+from analyze.duplicates import report_duplicates
 from analyze.reviewer import apply_draft_to_works
-from db.loader import load_classified_works
+from db.handler import db_session
+from db.migrator import migrate
+from db.loader import ingest_scanned_works, load_classified_works
+from db.search import print_search_results
+from folders.scanner import scan_and_export
 from sync.reconciler import compare_db_and_folders
 from sync.cleaner import (
     delete_works_with_missing_folders,
@@ -14,27 +34,183 @@ from sync.cleaner import (
     delete_folders_with_zero_images,
     delete_orphan_relations,
 )
+from sync.quarantine import purge_quarantine, restore_quarantined
+from sync.watcher import watch_scan_targets
+from utils.diagnostics import diagnostics
 
 
 def main():
     "🍣"
     parser = argparse.ArgumentParser(description="doujin_archive CLI")
+    # 全サブコマンド共通の計測オプション（結果は LOG_DIR に保存）
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="cProfile で計測し、pstats / callgrind 形式で保存",
+    )
+    parser.add_argument(
+        "--trace-malloc",
+        action="store_true",
+        help="tracemalloc でメモリ確保の多い箇所とピークを記録",
+    )
+    parser.add_argument(
+        "--timings", action="store_true", help="処理の区間ごとの wall / CPU 時間を記録"
+    )
     subparsers = parser.add_subparsers(dest="command", help="サブコマンド")
 
+    # migrate
+    subparsers.add_parser("migrate", help="DBスキーマを最新バージョンへ更新")
+
     # rename
-    subparsers.add_parser("rename", help="confirmed 状態の作品をリネームしてログ出力")
+    rename_parser = subparsers.add_parser(
+        "rename", help="confirmed 状態の作品をリネームしてログ出力"
+    )
+    rename_group = rename_parser.add_mutually_exclusive_group()
+    rename_group.add_argument(
+        "--resume", metavar="JOURNAL", help="中断したリネームをジャーナルから再開"
+    )
+    rename_group.add_argument(
+        "--rollback", metavar="JOURNAL", help="ジャーナルのリネームを元に戻す"
+    )
 
     # analyze
-    subparsers.add_parser("analyze", help="original_name を解析して works_draft に登録")
+    analyze_parser = subparsers.add_parser(
+        "analyze", help="original_name を解析して works_draft に登録"
+    )
+    analyze_parser.add_argument(
+        "--workers",
+        type=int,
+        default=ANALYZE_WORKERS,
+        help="解析に使うプロセス数（1 なら並列化しない）",
+    )
+    analyze_parser.add_argument(
+        "--full",
+        action="store_true",
+        help="名前・パーサに変更がない作品も含めて全件を再解析",
+    )
+    analyze_parser.add_argument(
+        "--profile-patterns",
+        action="store_true",
+        help="解析に使うパーサをパターン別に計測（件数・所要時間）してレポート出力",
+    )
 
     # review
-    subparsers.add_parser("review", help="works_draft から補完して works に反映")
+    review_parser = subparsers.add_parser(
+        "review", help="works_draft から補完して works に反映"
+    )
+    review_parser.add_argument(
+        "--batch-size", type=int, default=REVIEW_BATCH_SIZE, help="1 commit あたりの件数"
+    )
+    review_parser.add_argument(
+        "--restart", action="store_true", help="中断時の進捗を破棄して最初から実行"
+    )
 
     # load
     subparsers.add_parser("load", help="未登録フォルダを走査し、DBに初期登録")
 
+    # scan
+    scan_parser = subparsers.add_parser(
+        "scan", help="scan_targets を走査して画像数を集計し JSON 出力"
+    )
+    scan_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="前回から変更のないフォルダは再カウントしない",
+    )
+
+    # ingest
+    ingest_parser = subparsers.add_parser(
+        "ingest", help="scan_targets を走査し、JSON を経由せず works に直接登録"
+    )
+    ingest_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="前回から変更のないフォルダは再カウントしない",
+    )
+    ingest_parser.add_argument(
+        "--export-json", action="store_true", help="scan_*.json も出力する"
+    )
+
+    # search
+    search_parser = subparsers.add_parser(
+        "search", help="タイトル・元フォルダ名・サークル・作者・原作で全文検索"
+    )
+    search_parser.add_argument("query", nargs="+", help="検索語（空白区切りで AND）")
+    search_parser.add_argument(
+        "--limit", type=int, default=SEARCH_PAGE_SIZE, help="1ページあたりの件数"
+    )
+    search_parser.add_argument("--page", type=int, default=1, help="表示するページ")
+    search_parser.add_argument(
+        "--rebuild", action="store_true", help="検索インデックスを作り直してから検索"
+    )
+
+    # dupes
+    dupes_parser = subparsers.add_parser(
+        "dupes", help="タイトル・サークルが似ている重複ダウンロード候補を表示"
+    )
+    dupes_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DUPLICATE_THRESHOLD,
+        help="候補とする類似度（n-gram の Jaccard 係数）の下限",
+    )
+    dupes_parser.add_argument("--limit", type=int, default=50, help="表示するクラスタ数")
+    dupes_parser.add_argument(
+        "--workers",
+        type=int,
+        default=ANALYZE_WORKERS,
+        help="シグネチャ計算に使うプロセス数（1 なら並列化しない）",
+    )
+
     # sync
-    subparsers.add_parser("sync", help="フォルダとDBの整合性チェック")
+    sync_parser = subparsers.add_parser(
+        "sync",
+        help="フォルダとDBの整合性チェック",
+        description=(
+            "フォルダとDBの整合性をチェックする。--apply なしでもパスは変更しないが、"
+            "移動検出用の指紋（works.fingerprint / fingerprint_state）と"
+            "フォルダ一覧（folder_inventory）は毎回記録・更新する"
+        ),
+    )
+    sync_parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="移動とみなしたフォルダの新しいパスを works に反映",
+    )
+    sync_parser.add_argument(
+        "--rescan",
+        action="store_true",
+        help="前回の走査結果を使わずフォルダ一覧を取り直す",
+    )
+
+    # watch
+    watch_parser = subparsers.add_parser(
+        "watch",
+        help="scan_targets を監視し、フォルダの追加・改名・画像数の変化を works に反映",
+        description=(
+            "scan_targets を監視し、フォルダの追加・改名・画像数の変化を works に反映する。"
+            "各作品フォルダ直下の変化は inotify で受け取る（サブフォルダ内は対象外）。"
+            "inotify が使えないマウントや監視数の上限（fs.inotify.max_user_watches）を"
+            "超えた分は、--interval 秒ごとに各作品フォルダの mtime を記録と比べて拾う。"
+        ),
+    )
+    watch_parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="inotify を使わず、ベースディレクトリと作品フォルダの mtime を定期的に確認する",
+    )
+    watch_parser.add_argument(
+        "--debounce",
+        type=float,
+        default=WATCH_DEBOUNCE_SECONDS,
+        help="フォルダへの変更が静まってから反映するまでの秒数",
+    )
+    watch_parser.add_argument(
+        "--interval",
+        type=float,
+        default=WATCH_POLL_SECONDS,
+        help="ポーリング時に mtime を確認する間隔（秒）",
+    )
 
     # clean-db
     subparsers.add_parser(
@@ -42,38 +218,139 @@ def main():
     )
 
     # clean-fs
-    subparsers.add_parser(
+    clean_fs_parser = subparsers.add_parser(
         "clean-fs", help="DBに登録されていない物理フォルダを削除（dry-run）"
     )
+    clean_fs_parser.add_argument(
+        "--apply", action="store_true", help="dry-run せず隔離ディレクトリへ移す"
+    )
+    clean_fs_parser.add_argument(
+        "--rescan",
+        action="store_true",
+        help="前回の走査結果を使わずフォルダ一覧を取り直す",
+    )
 
     # clean-zero
-    subparsers.add_parser("clean-zero", help="画像0枚の物理フォルダを削除（dry-run）")
+    clean_zero_parser = subparsers.add_parser(
+        "clean-zero", help="画像0枚の物理フォルダを削除（dry-run）"
+    )
+    clean_zero_parser.add_argument(
+        "--apply", action="store_true", help="dry-run せず隔離ディレクトリへ移す"
+    )
+    clean_zero_parser.add_argument(
+        "--rescan",
+        action="store_true",
+        help="前回の走査結果を使わずフォルダ一覧を取り直す",
+    )
+
+    # purge
+    purge_parser = subparsers.add_parser(
+        "purge", help="保持期間を過ぎた隔離フォルダを実際に削除"
+    )
+    purge_parser.add_argument(
+        "--days",
+        type=int,
+        default=QUARANTINE_RETENTION_DAYS,
+        help="隔離してからこの日数を過ぎたものを削除（0 なら全件）",
+    )
+    purge_parser.add_argument(
+        "--workers", type=int, default=PURGE_WORKERS, help="並列に削除するスレッド数"
+    )
+    purge_parser.add_argument(
+        "--dry-run", action="store_true", help="対象を表示するだけで削除しない"
+    )
+
+    # restore
+    restore_parser = subparsers.add_parser(
+        "restore", help="隔離したフォルダを元の場所へ戻す"
+    )
+    restore_parser.add_argument("id", type=int, help="quarantine テーブルの id")
 
     # clean-orphan
     subparsers.add_parser("clean-orphan", help="孤立中間テーブルレコードの削除")
 
     args = parser.parse_args()
 
-    if args.command == "rename":
-        rename_all_confirmed_works()
+    if args.command is None:
+        parser.print_help()
+        return
+
+    # コマンド実行中は DB 接続を1本だけ保持して使い回す
+    with diagnostics(
+        args.command,
+        profile=args.profile,
+        trace_malloc=args.trace_malloc,
+        timings=args.timings,
+    ), db_session():
+        run_command(args)
+
+
+def inventory_age(args: argparse.Namespace) -> float:
+    "フォルダ一覧（sync.inventory）の記録を再利用してよい経過時間（--rescan なら 0）"
+    return 0 if args.rescan else INVENTORY_MAX_AGE_MINUTES
+
+
+def run_command(args: argparse.Namespace):
+    "サブコマンドを実行する"
+    if args.command == "migrate":
+        version = migrate()
+        print(f"✅ schema version: {version}")
+    elif args.command == "rename":
+        if args.resume:
+            resume_renames(args.resume)
+        elif args.rollback:
+            rollback_renames(args.rollback)
+        else:
+            rename_all_confirmed_works()
     elif args.command == "analyze":
-        parse_original_names()
+        parse_original_names(
+            workers=args.workers,
+            full=args.full,
+            profile=args.profile_patterns,
+        )
     elif args.command == "review":
-        apply_draft_to_works()
+        apply_draft_to_works(batch_size=args.batch_size, restart=args.restart)
     elif args.command == "load":
         load_classified_works()
+    elif args.command == "scan":
+        scan_and_export(incremental=args.incremental)
+    elif args.command == "ingest":
+        ingest_scanned_works(
+            incremental=args.incremental, export_json=args.export_json
+        )
+    elif args.command == "search":
+        print_search_results(
+            " ".join(args.query), limit=args.limit, page=args.page, rebuild=args.rebuild
+        )
+    elif args.command == "dupes":
+        report_duplicates(
+            threshold=args.threshold, limit=args.limit, workers=args.workers
+        )
     elif args.command == "sync":
-        compare_db_and_folders()
+        compare_db_and_folders(apply=args.apply, max_age_minutes=inventory_age(args))
+    elif args.command == "watch":
+        watch_scan_targets(
+            debounce=args.debounce, poll_interval=args.interval, force_poll=args.poll
+        )
     elif args.command == "clean-db":
         delete_works_with_missing_folders()
     elif args.command == "clean-fs":
-        delete_physical_folders_not_in_db(dry_run=True)  # 安全のため初回は dry-run
+        # 安全のため既定は dry-run（--apply でも削除ではなく隔離）
+        delete_physical_folders_not_in_db(
+            dry_run=not args.apply, max_age_minutes=inventory_age(args)
+        )
     elif args.command == "clean-zero":
-        delete_folders_with_zero_images(dry_run=True)
+        delete_folders_with_zero_images(
+            dry_run=not args.apply, max_age_minutes=inventory_age(args)
+        )
+    elif args.command == "purge":
+        purge_quarantine(
+            retention_days=args.days, workers=args.workers, dry_run=args.dry_run
+        )
+    elif args.command == "restore":
+        restore_quarantined(args.id)
     elif args.command == "clean-orphan":
         delete_orphan_relations()
-    else:
-        parser.print_help()
 
 
 if __name__ == "__main__":
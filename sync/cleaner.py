@@ -2,35 +2,108 @@
 
 # sync/cleaner.py
 
-import shutil
+import os
+import sqlite3
+from collections import defaultdict
 from pathlib import Path
-from db.handler import get_connection
-from config import BASE_DIRS
+from typing import Iterable
+
+from db.handler import foreign_keys_enabled, get_connection
+from config import BASE_DIRS, INVENTORY_MAX_AGE_MINUTES, SCAN_WORKERS
+from folders.scanner import map_folders_on_devices, plan_base_dirs
+from sync.inventory import forget_folders, get_inventory
+from sync.quarantine import ensure_quarantine_table, quarantine_folder
 from utils.image_counter import count_images
 
+# work_id で works を参照するテーブル（孤立レコードの掃除対象）
+ORPHAN_TABLES = (
+    "work_circle_authors",
+    "work_sources",
+    "work_completion_state",
+    "works_draft",
+)
+
+
+def _list_names(parent: str) -> set[str] | None:
+    """
+    親ディレクトリ直下の名前（normcase 済み）の集合
+    - 親が無ければ空集合、権限エラー等で列挙できなければ None
+    """
+    try:
+        return {os.path.normcase(name) for name in os.listdir(parent)}
+    except (FileNotFoundError, NotADirectoryError):
+        return set()
+    except OSError:
+        return None
+
+
+def existing_paths(paths: Iterable[str]) -> set[str]:
+    """
+    paths のうち実在するものを集合で返す（Path.exists 相当）
+    - 親ディレクトリごとに1回だけ listdir し、名前の有無で判定する
+    - 親を列挙できない場合や末尾が区切り文字のパスは os.path.exists で個別に確認する
+    """
+    by_parent: dict[str, list[tuple[str, str]]] = defaultdict(list)
+    result = set()
+    for path in paths:
+        parent, name = os.path.split(path)
+        if not name:
+            if os.path.exists(path):
+                result.add(path)
+            continue
+        by_parent[parent or os.curdir].append((path, os.path.normcase(name)))
+
+    for parent, entries in by_parent.items():
+        names = _list_names(parent)
+        for path, name in entries:
+            if names is None:
+                if os.path.exists(path):
+                    result.add(path)
+            elif name in names:
+                result.add(path)
+    return result
+
 
 def delete_works_with_missing_folders():
     """
     実体が存在しない works レコードを削除（DBのみ）
+    - 存在確認は親ディレクトリ単位の listdir でまとめて行う
+    - 削除対象の id を一時テーブルに入れ、1文で削除する
+    - PRAGMA foreign_keys を有効にして works_draft / 中間テーブルを ON DELETE CASCADE で消す
+      （有効にできない場合は同じ条件で個別に削除する）
     """
     with get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT id, folder_path FROM works")
-        rows = cur.fetchall()
-
-        targets = []
-        for row in rows:
-            folder = Path(row["folder_path"])
-            if not folder.exists():
-                targets.append(row["id"])
+        rows = conn.execute("SELECT id, folder_path FROM works").fetchall()
+        present = existing_paths(row["folder_path"] for row in rows)
+        targets = [row["id"] for row in rows if row["folder_path"] not in present]
 
         print(f"❌ 実体のない works 削除対象: {len(targets)} 件")
-
-        for wid in targets:
-            cur.execute("DELETE FROM works WHERE id = ?", (wid,))
-        conn.commit()
-
-        print(f"✅ 削除完了: {len(targets)} 件")
+        if not targets:
+            return
+
+        with foreign_keys_enabled(conn) as cascade:
+            conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS _delete_work_ids (id INTEGER PRIMARY KEY)"
+            )
+            conn.execute("DELETE FROM _delete_work_ids")
+            conn.executemany(
+                "INSERT OR IGNORE INTO _delete_work_ids (id) VALUES (?)",
+                ((wid,) for wid in targets),
+            )
+            # work_completion_state は CASCADE 指定が無く、残っていると works を消せないので先に消す
+            dependents = ["work_completion_state"]
+            if not cascade:
+                dependents += ["works_draft", "work_circle_authors", "work_sources"]
+            for table in dependents:
+                conn.execute(
+                    f"DELETE FROM {table} WHERE work_id IN (SELECT id FROM _delete_work_ids)"
+                )
+            cur = conn.execute("DELETE FROM works WHERE id IN (SELECT id FROM _delete_work_ids)")
+            deleted = cur.rowcount
+            conn.execute("DELETE FROM _delete_work_ids")
+            conn.commit()
+
+        print(f"✅ 削除完了: {deleted} 件")
 
 
 def get_all_db_folder_paths() -> set[str]:
@@ -41,122 +114,135 @@ def get_all_db_folder_paths() -> set[str]:
         return {str(Path(row["folder_path"]).resolve()) for row in cur.fetchall()}
 
 
-def delete_physical_folders_not_in_db(dry_run: bool = True):
+def quarantine_folders(folders: list[Path], reason: str) -> int:
+    """
+    folders を隔離ディレクトリへ移し（sync.quarantine）、移せた件数を返す
+    - 1件ごとに commit し、移動済みなのに記録が無い状態を残さない
+      （記録できなければ移さず、commit できなければ元の場所へ戻す）
+    - 移したフォルダは folder_inventory からも消す
+    """
+    moved = 0
+    with get_connection() as conn:
+        ensure_quarantine_table(conn)
+        for folder in folders:
+            try:
+                target = quarantine_folder(conn, folder, reason)
+            except (OSError, sqlite3.Error) as e:
+                conn.rollback()
+                print(f"[error] {folder}: {e}")
+                continue
+            try:
+                forget_folders(conn, [str(folder)])
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                os.rename(target, folder)
+                print(f"[error] {folder}: {e}（元の場所へ戻しました）")
+                continue
+            print(f"📦 quarantined: {folder} → {target}")
+            moved += 1
+    return moved
+
+
+def delete_physical_folders_not_in_db(
+    dry_run: bool = True, max_age_minutes: float = INVENTORY_MAX_AGE_MINUTES
+):
     """
     DBに登録されていない物理フォルダを削除（安全のため dry_run=True がデフォルト）
+    - フォルダ一覧は sync.inventory の記録を使う（古ければ増分走査で更新される）
+    - 削除は隔離ディレクトリへの rename で行う（purge で実削除）
     """
     registered_paths = get_all_db_folder_paths()
-    deleted_count = 0
+    targets = []
     skipped_count = 0
 
-    for base in BASE_DIRS:
-        base_path = Path(base)
-        if not base_path.exists():
-            continue
-
-        for folder in base_path.iterdir():
-            if not folder.is_dir():
-                continue
+    with get_connection() as conn:
+        inventory = get_inventory(conn, BASE_DIRS, max_age_minutes=max_age_minutes)
 
-            full_path = str(folder.resolve())
+    for rows in inventory.values():
+        for row in rows:
+            full_path = row["folder_path"]
             if full_path not in registered_paths:
                 print(f"[unregistered] {full_path}")
-                if dry_run:
-                    skipped_count += 1
-                else:
-                    try:
-                        shutil.rmtree(folder)
-                        print(f"🗑️ deleted: {full_path}")
-                        deleted_count += 1
-                    except Exception as e:  # pylint: disable=broad-exception-caught
-                        print(f"[error] {e}")
+                targets.append(Path(full_path))
             else:
                 skipped_count += 1
 
     if dry_run:
-        print(
-            f"🔎 Dry-run: 削除候補 {deleted_count + skipped_count - len(registered_paths)} 件（実行なし）"
-        )
-    else:
-        print(f"✅ 削除完了: {deleted_count} 件 / 無視: {skipped_count} 件")
+        print(f"🔎 Dry-run: 削除候補 {len(targets)} 件（実行なし）")
+        return
 
+    deleted_count = quarantine_folders(targets, "unregistered")
+    skipped_count += len(targets) - deleted_count
+    print(f"✅ 削除完了: {deleted_count} 件 / 無視: {skipped_count} 件")
 
-def delete_folders_with_zero_images(dry_run: bool = True):
+
+def delete_folders_with_zero_images(
+    dry_run: bool = True,
+    workers: int | None = None,
+    max_age_minutes: float = INVENTORY_MAX_AGE_MINUTES,
+):
     """
     画像ファイルが1枚も含まれていないフォルダを削除（再帰走査）
     config.BASE_DIRS 配下の直下フォルダが対象
+    - 画像数は sync.inventory の記録を使い、0枚と記録されたものだけ数え直して確かめる
+      （記録後にフォルダの中へ画像が追加されていても消さない）
+    - 削除は隔離ディレクトリへの rename で行う（purge で実削除）
     """
 
-    deleted = 0
-    skipped = 0
-
-    for base in BASE_DIRS:
-        base_path = Path(base)
-        if not base_path.exists():
-            continue
-
-        for folder in base_path.iterdir():
-            if not folder.is_dir():
-                continue
+    with get_connection() as conn:
+        inventory = get_inventory(
+            conn, BASE_DIRS, max_age_minutes=max_age_minutes, workers=workers
+        )
+        groups = plan_base_dirs(conn, BASE_DIRS, default_limit=workers or SCAN_WORKERS)
 
-            count = count_images(folder)
-            if count == 0:
-                print(f"[zero] {folder}")
-                if dry_run:
-                    skipped += 1
-                else:
-                    try:
-                        shutil.rmtree(folder)
-                        print(f"🗑️ deleted: {folder}")
-                        deleted += 1
-                    except Exception as e:  # pylint: disable=broad-exception-caught
-                        print(f"[error] {e}")
+    candidates = []
+    skipped = 0
+    for rows in inventory.values():
+        for row in rows:
+            if row["image_count"] == 0:
+                candidates.append(Path(row["folder_path"]))
             else:
                 skipped += 1
 
+    # 数え直しもデバイスごとの同時アクセス数（scan_targets.max_concurrency）を守る
+    counts = map_folders_on_devices(
+        count_images, candidates, groups, default_limit=workers or SCAN_WORKERS
+    )
+    targets = []
+    for folder in candidates:
+        if counts[str(folder)] == 0:
+            print(f"[zero] {folder}")
+            targets.append(folder)
+        else:
+            skipped += 1
+
     if dry_run:
-        print(f"🔎 Dry-run: 画像0枚フォルダ候補 {deleted + skipped} 件（実行なし）")
-    else:
-        print(f"✅ 削除完了: {deleted} 件 / 無視: {skipped} 件")
+        print(f"🔎 Dry-run: 画像0枚フォルダ候補 {len(targets)} 件（実行なし）")
+        return
+
+    deleted = quarantine_folders(targets, "zero_images")
+    skipped += len(targets) - deleted
+    print(f"✅ 削除完了: {deleted} 件 / 無視: {skipped} 件")
 
 
 def delete_orphan_relations():
     """
-    works に対応するレコードが存在しない中間テーブルの孤立レコードを削除
+    works に対応するレコードが存在しない中間テーブル・draft の孤立レコードを削除
+    - works.id（主キー）を NOT EXISTS で引くので、テーブル全体の突き合わせにならない
     """
     with get_connection() as conn:
-        cur = conn.cursor()
-
-        # 孤立 work_circle_authors
-        cur.execute(
-            """
-            DELETE FROM work_circle_authors
-            WHERE work_id NOT IN (SELECT id FROM works)
-        """
-        )
-        deleted_authors = cur.rowcount
-
-        # 孤立 work_sources
-        cur.execute(
-            """
-            DELETE FROM work_sources
-            WHERE work_id NOT IN (SELECT id FROM works)
-        """
-        )
-        deleted_sources = cur.rowcount
-
-        # 孤立 work_completion_state
-        cur.execute(
-            """
-            DELETE FROM work_completion_state
-            WHERE work_id NOT IN (SELECT id FROM works)
-        """
-        )
-        deleted_states = cur.rowcount
-
+        deleted = {}
+        for table in ORPHAN_TABLES:
+            cur = conn.execute(
+                f"""
+                DELETE FROM {table}
+                WHERE NOT EXISTS (SELECT 1 FROM works w WHERE w.id = {table}.work_id)
+                """
+            )
+            deleted[table] = cur.rowcount
         conn.commit()
 
     print("✅ 孤立レコード削除完了")
-    print(f" - work_circle_authors: {deleted_authors} 件")
-    print(f" - work_sources: {deleted_sources} 件")
-    print(f" - work_completion_state: {deleted_states} 件")
+    for table, count in deleted.items():
+        print(f" - {table}: {count} 件")
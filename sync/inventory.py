@@ -0,0 +1,100 @@
+"🍣"
+
+# sync/inventory.py
+#
+# sync / clean-fs / clean-zero が共有するフォルダ一覧（folder_inventory）の読み出し。
+# ベースディレクトリごとに、前回の走査（scan / ingest / このモジュール）が新しければ
+# 記録をそのまま使い、古ければ増分走査で更新してから返す。増分走査は scan と同じく
+# デバイスごとに並列、デバイス内は scan_targets.max_concurrency 以下で行う。
+# 連続して実行するメンテナンスでも、アーカイブ全体を歩くのは最初の1回だけになる。
+
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from config import BASE_DIRS, INVENTORY_MAX_AGE_MINUTES, SCAN_WORKERS
+from folders.scanner import (
+    ensure_folder_inventory,
+    load_inventory,
+    plan_base_dirs,
+    run_device_groups,
+    store_base_dir,
+)
+
+
+def snapshot_is_fresh(
+    conn: sqlite3.Connection,
+    base_dir: str,
+    max_age_minutes: float = INVENTORY_MAX_AGE_MINUTES,
+) -> bool:
+    """
+    base_dir の記録をそのまま使ってよいか
+    - 前回の走査から max_age_minutes 分以内で、かつ
+      ベースディレクトリの mtime（直下の追加・削除・改名で変わる）が走査時と同じ
+    """
+    row = conn.execute(
+        "SELECT base_mtime_ns, scanned_at FROM inventory_snapshots WHERE base_dir = ?",
+        (base_dir,),
+    ).fetchone()
+    if row is None:
+        return False
+    scanned_at = datetime.fromisoformat(row["scanned_at"])
+    if datetime.now() - scanned_at > timedelta(minutes=max_age_minutes):
+        return False
+    try:
+        return os.stat(base_dir).st_mtime_ns == row["base_mtime_ns"]
+    except OSError:
+        return False
+
+
+def load_base_inventory(conn: sqlite3.Connection, base_dir: str) -> list[sqlite3.Row]:
+    "base_dir 直下の作品フォルダの記録（folder_path, inode, mtime_ns, image_count, scanned_at）"
+    return conn.execute(
+        """
+        SELECT folder_path, inode, mtime_ns, image_count, scanned_at
+        FROM folder_inventory
+        WHERE base_dir = ?
+        ORDER BY folder_path
+        """,
+        (base_dir,),
+    ).fetchall()
+
+
+def get_inventory(
+    conn: sqlite3.Connection,
+    base_dirs: Iterable[str] | None = None,
+    max_age_minutes: float = INVENTORY_MAX_AGE_MINUTES,
+    workers: int | None = None,
+) -> dict[str, list[sqlite3.Row]]:
+    """
+    ベースディレクトリごとの作品フォルダ一覧 {base_dir: 記録の一覧} を返す
+    - 存在しないベースディレクトリは結果に含めない（警告の表示は呼び出し側）
+    - 記録が古いものだけ増分走査する（中身が変わっていないフォルダは数え直さない）
+    - max_age_minutes=0 なら必ず走査し直す
+    - 走査はデバイスごとに並列、デバイス内は max_concurrency（未設定なら workers）以下
+    """
+    ensure_folder_inventory(conn)
+    bases = BASE_DIRS if base_dirs is None else base_dirs
+    present = [base for base in bases if os.path.isdir(base)]
+    stale = [
+        base
+        for base in present
+        if max_age_minutes <= 0 or not snapshot_is_fresh(conn, base, max_age_minutes)
+    ]
+    if stale:
+        for base in stale:
+            print(f"🔄 フォルダ一覧を更新: {base}")
+        groups = plan_base_dirs(conn, stale, default_limit=workers or SCAN_WORKERS)
+        cached = {base: load_inventory(conn, base) for base in stale}
+        for walk in run_device_groups(groups, cached):
+            store_base_dir(conn, walk, incremental=True)
+    return {base: load_base_inventory(conn, base) for base in present}
+
+
+def forget_folders(conn: sqlite3.Connection, folder_paths: Iterable[str]):
+    "移動・削除したフォルダの記録を消す（commit は呼び出し側）"
+    conn.executemany(
+        "DELETE FROM folder_inventory WHERE folder_path = ?",
+        ((path,) for path in folder_paths),
+    )
@@ -0,0 +1,203 @@
+"🍣"
+
+# sync/quarantine.py
+#
+# clean-fs / clean-zero で消すフォルダは、その場で削除せず同じボリュームの隔離ディレクトリ
+# （既定はベースディレクトリ直下の .doujin_quarantine）へ rename する
+# （同一ボリューム内の rename なので画像数に関係なく一瞬で終わる）。
+# 移した記録は quarantine テーブルに残し、保持期間を過ぎたものを purge で実際に削除する。
+# 保持期間中は restore で元の場所へ戻せる。
+
+import os
+import shutil
+import sqlite3
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from config import (
+    PURGE_WORKERS,
+    QUARANTINE_DIR_NAME,
+    QUARANTINE_RETENTION_DAYS,
+    QUARANTINE_ROOT,
+)
+from db.handler import get_connection
+
+QUARANTINE_DDL = """
+CREATE TABLE IF NOT EXISTS quarantine (
+  id INTEGER PRIMARY KEY,
+  original_path TEXT NOT NULL,
+  quarantine_path TEXT NOT NULL UNIQUE,
+  reason TEXT,
+  quarantined_at TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'quarantined',
+  resolved_at TEXT
+)
+"""
+
+
+def ensure_quarantine_table(conn: sqlite3.Connection):
+    "quarantine テーブルが無い既存DBのために作成しておく"
+    conn.execute(QUARANTINE_DDL)
+
+
+def is_quarantine_dir(path: Path | str) -> bool:
+    "隔離ディレクトリ自身か（ベースディレクトリを走査するときに作品フォルダとみなさない）"
+    return os.path.basename(os.path.normpath(path)) == QUARANTINE_DIR_NAME
+
+
+def _device_of(path: str) -> int:
+    "path のあるデバイス（ボリューム）の番号"
+    return os.stat(path).st_dev
+
+
+def quarantine_root(path: Path | str) -> str:
+    """
+    path の隔離ディレクトリを置く場所
+    - config.QUARANTINE_ROOT が path と同じデバイス上にあればそこ
+    - それ以外は path の親（ベースディレクトリ）。path を rename で動かせる以上、
+      親には書き込めて、同じボリューム上にあることが保証される
+    """
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    if QUARANTINE_ROOT:
+        try:
+            if _device_of(QUARANTINE_ROOT) == _device_of(parent):
+                return os.path.abspath(QUARANTINE_ROOT)
+        except OSError:
+            pass
+    return parent
+
+
+def quarantine_path_for(folder: Path | str) -> str:
+    "folder の移動先（同じボリュームの隔離ディレクトリ内で一意な名前）"
+    name = os.path.basename(os.path.normpath(folder))
+    stamp = f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}"
+    return os.path.join(quarantine_root(folder), QUARANTINE_DIR_NAME, f"{stamp}_{name}")
+
+
+def quarantine_folder(conn: sqlite3.Connection, folder: Path | str, reason: str) -> str:
+    """
+    folder を quarantine に記録してから隔離ディレクトリへ rename し、移動先を返す
+    - 記録を先に書くので、記録できなければ（sqlite3.Error）フォルダは動かさない
+    - rename できなければ記録を消して OSError を送出する（別ボリュームへのコピーにはならない）
+    - commit は呼び出し側で行う（commit に失敗したら呼び出し側で元の場所へ戻す）
+    """
+    original = os.path.abspath(folder)
+    target = quarantine_path_for(original)
+    cur = conn.execute(
+        """
+        INSERT INTO quarantine (original_path, quarantine_path, reason, quarantined_at)
+        VALUES (?, ?, ?, datetime('now', 'localtime'))
+        """,
+        (original, target, reason),
+    )
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.rename(original, target)
+    except OSError:
+        conn.execute("DELETE FROM quarantine WHERE id = ?", (cur.lastrowid,))
+        raise
+    return target
+
+
+def _remove_tree(path: str) -> str | None:
+    "隔離フォルダを削除する（既に無ければ成功扱い）。失敗時はエラー文字列"
+    try:
+        shutil.rmtree(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        return str(e)
+    return None
+
+
+def purge_quarantine(
+    retention_days: int = QUARANTINE_RETENTION_DAYS,
+    workers: int = PURGE_WORKERS,
+    dry_run: bool = False,
+):
+    """
+    🍣 保持期間（retention_days 日）を過ぎた隔離フォルダを削除する（purge サブコマンド）
+    - 削除はスレッドプールで並列に行い、終わったものから purged として記録する
+    """
+    with get_connection() as conn:
+        ensure_quarantine_table(conn)
+        rows = conn.execute(
+            """
+            SELECT id, original_path, quarantine_path
+            FROM quarantine
+            WHERE status = 'quarantined'
+              AND quarantined_at <= datetime('now', 'localtime', ?)
+            ORDER BY id
+            """,
+            (f"-{retention_days} days",),
+        ).fetchall()
+
+        print(f"🧹 purge 対象（{retention_days} 日以上前に隔離）: {len(rows)} 件")
+        if dry_run:
+            for row in rows:
+                print(f"[purge] {row['quarantine_path']}  ({row['original_path']})")
+            print("🔎 Dry-run: 削除は実行していません")
+            return
+
+        purged = 0
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            paths = [row["quarantine_path"] for row in rows]
+            for row, error in zip(rows, pool.map(_remove_tree, paths)):
+                if error is not None:
+                    print(f"[error] {row['quarantine_path']}: {error}")
+                    failed += 1
+                    continue
+                conn.execute(
+                    """
+                    UPDATE quarantine
+                    SET status = 'purged', resolved_at = datetime('now', 'localtime')
+                    WHERE id = ?
+                    """,
+                    (row["id"],),
+                )
+                purged += 1
+        conn.commit()
+
+    print(f"✅ purge 完了: {purged} 件 / 失敗: {failed} 件")
+
+
+def restore_quarantined(quarantine_id: int) -> bool:
+    """
+    🍣 隔離したフォルダを元の場所へ戻す（restore サブコマンド）
+    - 元の場所に同名のフォルダが既にある場合は戻さない
+    """
+    with get_connection() as conn:
+        ensure_quarantine_table(conn)
+        row = conn.execute(
+            "SELECT * FROM quarantine WHERE id = ? AND status = 'quarantined'",
+            (quarantine_id,),
+        ).fetchone()
+        if row is None:
+            print(f"❌ 隔離中の記録がありません: {quarantine_id}")
+            return False
+        if os.path.exists(row["original_path"]):
+            print(f"❌ 元の場所に既に存在します: {row['original_path']}")
+            return False
+
+        try:
+            os.makedirs(os.path.dirname(row["original_path"]), exist_ok=True)
+            os.rename(row["quarantine_path"], row["original_path"])
+        except OSError as e:
+            print(f"[error] {e}")
+            return False
+        conn.execute(
+            """
+            UPDATE quarantine
+            SET status = 'restored', resolved_at = datetime('now', 'localtime')
+            WHERE id = ?
+            """,
+            (quarantine_id,),
+        )
+        conn.commit()
+
+    print(f"↩️ 復元しました: {row['original_path']}")
+    return True
@@ -2,9 +2,26 @@
 
 # sync/reconciler.py
 
+import os
+import re
+from collections import defaultdict
 from pathlib import Path
+from typing import Iterable
+
 from db.handler import get_connection
-from config import BASE_DIRS
+from db.migrator import add_column_if_missing
+from config import BASE_DIRS, INVENTORY_MAX_AGE_MINUTES, SCAN_WORKERS
+from folders.scanner import (
+    DeviceGroup,
+    ensure_folder_inventory,
+    map_folders_on_devices,
+    plan_base_dirs,
+)
+from sync.inventory import get_inventory
+from utils.image_counter import folder_fingerprint
+
+# compose_folder_name がフォルダ名の末尾に付ける作品 id
+ID_SUFFIX_RE = re.compile(r"#id(\d+)$")
 
 
 def get_all_db_paths() -> dict:
@@ -21,42 +38,241 @@ def get_all_db_paths() -> dict:
         }
 
 
-def get_all_physical_folders() -> list[Path]:
+def get_all_physical_folders(
+    max_age_minutes: float = INVENTORY_MAX_AGE_MINUTES, workers: int | None = None
+) -> list[Path]:
     """
     config.BASE_DIRS に登録されたフォルダ以下の直下フォルダ（作品フォルダ）を収集
+    - sync.inventory の記録を使う（古ければ増分走査で更新される）
     """
-    all_folders = []
     for base in BASE_DIRS:
-        base_path = Path(base)
-        if not base_path.exists():
+        if not Path(base).exists():
             print(f"[warn] base directory not found: {base}")
-            continue
-        for child in base_path.iterdir():
-            if child.is_dir():
-                all_folders.append(child.resolve())
-    return all_folders
+    with get_connection() as conn:
+        inventory = get_inventory(
+            conn, BASE_DIRS, max_age_minutes=max_age_minutes, workers=workers
+        )
+    return [Path(row["folder_path"]) for rows in inventory.values() for row in rows]
+
+
+def work_id_from_name(name: str) -> int | None:
+    "compose_folder_name が付けた末尾の #id{work_id} を読み取る（無ければ None）"
+    match = ID_SUFFIX_RE.search(name)
+    return int(match.group(1)) if match else None
+
+
+def ensure_fingerprint_columns(conn):
+    "works に指紋の列（migration 9 / 12）が無ければ追加する"
+    add_column_if_missing(conn, "works", "fingerprint", "TEXT")
+    add_column_if_missing(conn, "works", "fingerprint_state", "TEXT")
+
+
+def inventory_states(paths: Iterable[str]) -> dict[str, str]:
+    """
+    folder_inventory に記録されたフォルダの状態 {folder_path: "inode:mtime_ns:dir_mtimes"}
+    - 配下のファイル・ディレクトリが増減・改名されると変わる（指紋の再計算の目安）
+    """
+    wanted = set(paths)
+    with get_connection() as conn:
+        ensure_folder_inventory(conn)
+        rows = conn.execute(
+            "SELECT folder_path, inode, mtime_ns, dir_mtimes FROM folder_inventory"
+        ).fetchall()
+    return {
+        row["folder_path"]: f"{row['inode']}:{row['mtime_ns']}:{row['dir_mtimes']}"
+        for row in rows
+        if row["folder_path"] in wanted
+    }
 
 
-def compare_db_and_folders():
+def record_fingerprints(
+    db_paths: dict,
+    fs_set: set[str],
+    workers: int | None = None,
+    groups: list[DeviceGroup] | None = None,
+) -> int:
+    """
+    実在する works の指紋（works.fingerprint）を計算して保存し、件数を返す
+    - 未記録のものに加え、前回の計算から folder_inventory の状態（mtime・配下の mtime）が
+      変わったものも計算し直す（中身が変わった後の移動を古い指紋で見逃さないように）
+    - 移動後に元の場所の中身を見ることはできないので、見えているうちに記録しておく
+    - 配下の全ファイルを stat するので、groups（plan_base_dirs）のデバイスごとの上限で並列化する
+    """
+    states = inventory_states(path for path in db_paths if path in fs_set)
+    with get_connection() as conn:
+        ensure_fingerprint_columns(conn)
+        recorded = {
+            row["id"]: (row["fingerprint"], row["fingerprint_state"])
+            for row in conn.execute("SELECT id, fingerprint, fingerprint_state FROM works")
+        }
+        targets = {}
+        for path, (work_id, _original) in db_paths.items():
+            if path not in fs_set:
+                continue
+            fingerprint, state = recorded.get(work_id, (None, None))
+            if fingerprint is None or state != states.get(path):
+                targets[path] = work_id
+        computed = map_folders_on_devices(
+            folder_fingerprint, targets, groups or [], default_limit=workers or SCAN_WORKERS
+        )
+        rows = [
+            (fp, states.get(path), targets[path])
+            for path, fp in computed.items()
+            if fp is not None
+        ]
+        conn.executemany(
+            "UPDATE works SET fingerprint = ?, fingerprint_state = ? WHERE id = ?", rows
+        )
+        conn.commit()
+    return len(rows)
+
+
+def load_fingerprints(work_ids: Iterable[int]) -> dict[int, str]:
+    "指定 works の記録済み指紋 {work_id: fingerprint}"
+    wanted = set(work_ids)
+    if not wanted:
+        return {}
+    with get_connection() as conn:
+        ensure_fingerprint_columns(conn)
+        rows = conn.execute(
+            "SELECT id, fingerprint FROM works WHERE fingerprint IS NOT NULL"
+        ).fetchall()
+    return {row["id"]: row["fingerprint"] for row in rows if row["id"] in wanted}
+
+
+def _unique_pairs(left: dict, right: dict) -> list[tuple]:
+    "キーごとに左右とも1件だけのものを (左の値, 右の値) として対応付ける"
+    return [
+        (left[key][0], right[key][0])
+        for key in left.keys() & right.keys()
+        if len(left[key]) == 1 and len(right[key]) == 1
+    ]
+
+
+def detect_moves(
+    missing: dict[str, int],
+    unregistered: Iterable[str],
+    fingerprints: dict[int, str],
+    workers: int | None = None,
+    groups: list[DeviceGroup] | None = None,
+) -> list[tuple[int, str, str, str]]:
+    """
+    「DBにだけある」パスと「物理にだけある」パスを対応付け、移動とみなせる組を返す
+    - missing は {旧パス: work_id}、戻り値は [(work_id, 旧パス, 新パス, 判定方法)]
+    - 判定は次の順で、前段で決まったものは後段の対象から外す
+      1. フォルダ名末尾の #id{work_id}（rename 済みの作品）
+      2. 指紋（配下ファイル名 + サイズ）が左右とも一意に一致
+      3. 指紋が未記録の作品に限り、フォルダ名が左右とも一意に一致
+         （指紋が一致しなかった作品は中身が違うとみなし、名前だけでは対応付けない）
+    """
+    old_by_id = {work_id: path for path, work_id in missing.items()}
+    remaining = list(unregistered)
+    moves = []
+
+    # 1. #id サフィックス
+    rest = []
+    for new_path in remaining:
+        work_id = work_id_from_name(os.path.basename(new_path))
+        old_path = old_by_id.pop(work_id, None) if work_id is not None else None
+        if old_path is None:
+            rest.append(new_path)
+        else:
+            moves.append((work_id, old_path, new_path, "id"))
+    remaining = rest
+
+    # 2. 指紋
+    known = {wid: fingerprints[wid] for wid in old_by_id if wid in fingerprints}
+    if known and remaining:
+        computed = map_folders_on_devices(
+            folder_fingerprint, remaining, groups or [], default_limit=workers or SCAN_WORKERS
+        )
+        old_by_fp = defaultdict(list)
+        for work_id, fp in known.items():
+            old_by_fp[fp].append(work_id)
+        new_by_fp = defaultdict(list)
+        for path, fp in computed.items():
+            if fp is not None:
+                new_by_fp[fp].append(path)
+        for work_id, new_path in _unique_pairs(old_by_fp, new_by_fp):
+            moves.append((work_id, old_by_id.pop(work_id), new_path, "fingerprint"))
+        matched = {move[2] for move in moves}
+        remaining = [path for path in remaining if path not in matched]
+
+    # 3. フォルダ名（指紋が無く中身で確かめられない作品だけ）
+    old_by_name = defaultdict(list)
+    for work_id, path in old_by_id.items():
+        if work_id not in fingerprints:
+            old_by_name[os.path.basename(path)].append(work_id)
+    new_by_name = defaultdict(list)
+    for path in remaining:
+        new_by_name[os.path.basename(path)].append(path)
+    for work_id, new_path in _unique_pairs(old_by_name, new_by_name):
+        moves.append((work_id, old_by_id.pop(work_id), new_path, "name"))
+
+    return sorted(moves)
+
+
+def apply_moves(moves: list[tuple[int, str, str, str]]) -> int:
+    "検出した移動を works.folder_path に1トランザクションで反映し、件数を返す"
+    with get_connection() as conn:
+        conn.executemany(
+            "UPDATE works SET folder_path = ? WHERE id = ?",
+            [(new_path, work_id) for work_id, _old, new_path, _how in moves],
+        )
+        conn.commit()
+    return len(moves)
+
+
+def compare_db_and_folders(
+    apply: bool = False,
+    workers: int | None = None,
+    max_age_minutes: float = INVENTORY_MAX_AGE_MINUTES,
+):
     """
     DB と 物理フォルダの整合性を比較し、差分を出力する
     - DBにあるが物理にない（消失 or 移動）
     - 物理にあるがDBにない（未登録）
+    - 両者の組のうち移動とみなせるもの（detect_moves）は別に表示し、
+      apply=True なら works.folder_path を新しい場所へ更新する（解析・レビュー結果はそのまま）
+    - apply=False でも works.fingerprint / fingerprint_state と folder_inventory は記録・更新する
     """
     db_paths = get_all_db_paths()
-    physical_paths = get_all_physical_folders()
+    physical_paths = get_all_physical_folders(max_age_minutes=max_age_minutes)
 
     db_set = set(db_paths.keys())
     fs_set = set(str(p) for p in physical_paths)
 
+    # 指紋の計算も scan と同じく、デバイスごとの同時アクセス数（max_concurrency）を守る
+    with get_connection() as conn:
+        groups = plan_base_dirs(conn, BASE_DIRS, default_limit=workers or SCAN_WORKERS)
+    recorded = record_fingerprints(db_paths, fs_set, workers=workers, groups=groups)
+
     missing_on_fs = db_set - fs_set
     missing_on_db = fs_set - db_set
 
+    missing_ids = {path: db_paths[path][0] for path in missing_on_fs}
+    moves = []
+    if missing_on_fs and missing_on_db:
+        fingerprints = load_fingerprints(missing_ids.values())
+        moves = detect_moves(
+            missing_ids, missing_on_db, fingerprints, workers=workers, groups=groups
+        )
+        missing_on_fs -= {old for _wid, old, _new, _how in moves}
+        missing_on_db -= {new for _wid, _old, new, _how in moves}
+
     print("🧩 整合性チェック結果")
     print(f"📁 DB登録：{len(db_set)} 件")
     print(f"📂 実フォルダ：{len(fs_set)} 件")
+    print(f"🚚 移動（DBのパスを更新すれば一致）：{len(moves)} 件")
     print(f"❌ 実体が存在しない（DBにだけある）：{len(missing_on_fs)} 件")
     print(f"➕ 未登録（物理にだけある）：{len(missing_on_db)} 件")
+    if recorded:
+        print(f"🧷 指紋を記録：{recorded} 件")
+
+    if moves:
+        print("\n[移動とみなしたフォルダ一覧]")
+        for work_id, old, new, how in moves:
+            print(f"- [{work_id}] {old} → {new}  ({how})")
 
     if missing_on_fs:
         print("\n[DBにあって物理にないフォルダ一覧]")
@@ -68,3 +284,9 @@ def compare_db_and_folders():
         print("\n[物理にあってDBにないフォルダ一覧]")
         for path in sorted(missing_on_db):
             print(f"- {path}")
+
+    if moves:
+        if apply:
+            print(f"\n✅ パスを更新しました: {apply_moves(moves)} 件")
+        else:
+            print("\n🔎 Dry-run: --apply で移動を DB に反映します")
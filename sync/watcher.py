@@ -0,0 +1,510 @@
+"🍣"
+
+# sync/watcher.py
+#
+# scan_targets を監視し、作品フォルダの追加・改名・消失と画像数の変化を works に反映する（watch）
+# - Linux では inotify（ctypes で libc を直接呼ぶ。追加の依存なし）で変更通知を受け、
+#   通知が無い間は select で待つだけなので、待機中の負荷はほぼ無い
+# - 作品フォルダにも1つずつ inotify の監視を付け、起動前からあるフォルダ内の画像の増減も拾う
+#   （監視の対象は作品フォルダ直下まで。サブフォルダ内の変化は sync / ingest --incremental で拾う）
+# - inotify が使えない環境や、通知が届かないネットワーク系のマウント、
+#   監視数の上限（fs.inotify.max_user_watches）に達した後のフォルダは、一定間隔で
+#   ベースディレクトリと各作品フォルダの mtime を folder_inventory の記録と比べて拾う
+# - 同じフォルダへの連続したイベントはまとめ（デバウンス）、静まってから1回だけ数え直す
+# - フォルダが消えても works は消さない（clean-db / sync で確認してから消す）
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import re
+import select
+import sqlite3
+import struct
+import sys
+import time
+from pathlib import Path
+
+from config import WATCH_DEBOUNCE_SECONDS, WATCH_POLL_SECONDS
+from db.handler import get_connection, insert_works_batch
+from folders.scanner import ensure_folder_inventory, load_inventory, refresh_folders
+from sync.quarantine import is_quarantine_dir
+from utils.image_counter import tree_unchanged
+
+# inotify のイベント種別（<sys/inotify.h>）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# ベースディレクトリ: 作品フォルダの出入り
+BASE_MASK = (
+    IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+)
+# 作品フォルダ: 画像の追加（書き込み完了・移動）と削除
+FOLDER_MASK = IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+
+# struct inotify_event の固定長部分（wd, mask, cookie, len）
+_EVENT_HEADER = struct.Struct("iIII")
+
+_OCTAL_ESCAPE = re.compile(rb"\\([0-7]{3})")
+
+# inotify の通知が届かない（他のマシンからの変更が見えない）ファイルシステム
+POLL_FS_TYPES = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "drvfs", "fuse.sshfs"}
+
+
+class Inotify:
+    "inotify のファイル記述子（libc の inotify_* を ctypes で呼ぶ）"
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str, mask: int) -> int:
+        "path を監視対象に加え、監視記述子（wd）を返す"
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def read_events(self, timeout: float | None) -> list[tuple[int, int, int, str]]:
+        "最大 timeout 秒待ってイベント (wd, mask, cookie, name) を読み出す"
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, mask, cookie, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def open_inotify() -> Inotify | None:
+    "inotify を開く（Linux 以外や上限に達している場合は None）"
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return Inotify()
+    except (OSError, AttributeError):
+        return None
+
+
+def _unescape_mount(field: bytes) -> str:
+    "/proc/self/mounts のフィールド（空白などは \\040 のような8進エスケープ）を戻す"
+    return os.fsdecode(_OCTAL_ESCAPE.sub(lambda m: bytes([int(m.group(1), 8)]), field))
+
+
+def filesystem_type(path: str) -> str | None:
+    "path が載っているマウントのファイルシステム種別（/proc/self/mounts から。分からなければ None）"
+    try:
+        with open("/proc/self/mounts", "rb") as f:
+            mounts = [line.split() for line in f]
+    except OSError:
+        return None
+    real = os.path.realpath(path)
+    best, fstype = "", None
+    for fields in mounts:
+        if len(fields) < 3:
+            continue
+        point = _unescape_mount(fields[1])
+        prefix = point.rstrip("/") + "/"
+        if (real == point or real.startswith(prefix)) and len(point) >= len(best):
+            best, fstype = point, os.fsdecode(fields[2])
+    return fstype
+
+
+def needs_polling(path: str) -> bool:
+    "inotify では変更を取りこぼすマウントか"
+    return filesystem_type(path) in POLL_FS_TYPES
+
+
+def _key(path: str) -> str:
+    "works / folder_inventory と同じ形の絶対パス"
+    return str(Path(path).resolve())
+
+
+class FolderWatcher:
+    """
+    ベースディレクトリ群を監視し、変化のあった作品フォルダだけを works / folder_inventory に反映する
+
+    - inotify: ベースディレクトリ直下の出入りと、各作品フォルダ直下の変化を受け取る
+    - ポーリング: ベースディレクトリの mtime が変わったときだけ直下の一覧を記録と突き合わせ、
+      inotify の監視が無い作品フォルダ（unwatched）は mtime を記録と比べて変化を拾う
+    - 同じフォルダへのイベントは debounce 秒静まるまで待ってから1回だけ数え直す
+    - 同じ cookie の MOVED_FROM / MOVED_TO は改名として works.folder_path を付け替える
+    """
+
+    def __init__(
+        self,
+        conn,
+        base_dirs: list[str],
+        debounce: float = WATCH_DEBOUNCE_SECONDS,
+        poll_interval: float = WATCH_POLL_SECONDS,
+        force_poll: bool = False,
+    ):
+        self.conn = conn
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.inotify = None if force_poll else open_inotify()
+        self.base_by_wd: dict[int, str] = {}
+        self.folder_by_wd: dict[int, tuple[str, str]] = {}
+        self.watched: set[str] = set()  # inotify で監視中の作品フォルダ
+        self.unwatched: dict[str, set[str]] = {}  # ベース → mtime で確認する作品フォルダ
+        self.watch_limit_reached = False
+        self.polled: dict[str, int | None] = {}  # ベースディレクトリ → 前回確認時の mtime_ns
+        self.pending: dict[tuple[str, str], float] = {}  # (ベース, フォルダ) → 最後のイベント時刻
+        self.moved_from: dict[int, tuple[str, str, float]] = {}  # cookie → (ベース, 旧パス, 時刻)
+        self.renames: list[tuple[str, str]] = []  # (旧パス, 新パス)
+        self.next_poll = 0.0
+        self.base_dirs = []
+
+        ensure_folder_inventory(conn)
+        for base in base_dirs:
+            if not os.path.isdir(base):
+                print(f"[warn] base directory not found: {base}")
+                continue
+            self.base_dirs.append(base)
+            if self.inotify is not None and not needs_polling(base):
+                try:
+                    self.base_by_wd[self.inotify.add_watch(base, BASE_MASK)] = base
+                    continue
+                except OSError as e:
+                    print(f"[warn] inotify を使えないためポーリングで監視します: {base} ({e})")
+            self.polled[base] = None
+
+    # --- イベントの受け取り ---
+    def touch(self, base: str, folder: str, now: float):
+        "フォルダに変化があったことを記録する（デバウンス後に数え直す）"
+        self.pending[(base, folder)] = now
+
+    def watch_folder(self, base: str, folder: str):
+        """
+        作品フォルダの中身の変化も受け取るようにする
+        - inotify を使えないベース・監視数の上限に達した後は、ポーリングでの mtime 確認に回す
+        """
+        if folder in self.watched:
+            return
+        if self.inotify is None or base not in self.base_by_wd.values():
+            self.unwatched.setdefault(base, set()).add(folder)
+            return
+        try:
+            wd = self.inotify.add_watch(folder, FOLDER_MASK)
+        except OSError as e:
+            if e.errno != errno.ENOSPC:
+                return
+            if not self.watch_limit_reached:
+                self.watch_limit_reached = True
+                print(
+                    "[warn] inotify の監視数が上限（fs.inotify.max_user_watches）に達したため、"
+                    f"残りの作品フォルダは {self.poll_interval:g} 秒ごとの mtime 確認で監視します"
+                )
+            self.unwatched.setdefault(base, set()).add(folder)
+            return
+        self.folder_by_wd[wd] = (base, folder)
+        self.watched.add(folder)
+
+    def forget_folder(self, base: str, folder: str):
+        "消えたフォルダを mtime 確認の対象から外す（inotify の監視は IN_IGNORED で外れる）"
+        self.unwatched.get(base, set()).discard(folder)
+
+    def catch_up(self, base: str, now: float):
+        """
+        ベースディレクトリ直下の一覧を folder_inventory と突き合わせ、差分のフォルダを記録する
+        - 起動時（停止中の変更）・ポーリング・イベントの取りこぼし（IN_Q_OVERFLOW）で使う
+        """
+        listed = {}
+        try:
+            with os.scandir(base) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir() and not is_quarantine_dir(entry.path):
+                            listed[_key(entry.path)] = entry.path
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"[error] {e}")
+            return
+        known = {
+            row["folder_path"]
+            for row in self.conn.execute(
+                "SELECT folder_path FROM folder_inventory WHERE base_dir = ?", (base,)
+            )
+        }
+        for key in listed.keys() - known:
+            self.touch(base, listed[key], now)
+        for key in known - listed.keys():
+            self.touch(base, key, now)
+        for folder in set(self.unwatched.get(base, ())) - set(listed.values()):
+            self.forget_folder(base, folder)
+        # 起動前からある作品フォルダも含めて、中身の変化を受け取る
+        for path in listed.values():
+            self.watch_folder(base, path)
+
+    def check_unwatched(self, base: str, now: float):
+        """
+        inotify の監視が無い作品フォルダの mtime（サブフォルダ含む）を folder_inventory と比べ、
+        変わったものを記録する
+        """
+        folders = self.unwatched.get(base)
+        if not folders:
+            return
+        inventory = load_inventory(self.conn, base)
+        for folder in list(folders):
+            hit = inventory.get(_key(folder))
+            try:
+                st = os.stat(folder)
+            except OSError:
+                self.forget_folder(base, folder)
+                self.touch(base, folder, now)
+                continue
+            if (
+                hit is None
+                or hit[0] != st.st_ino
+                or hit[1] != st.st_mtime_ns
+                or not tree_unchanged(folder, hit[2])
+            ):
+                self.touch(base, folder, now)
+
+    def handle_event(self, wd: int, mask: int, cookie: int, name: str, now: float):
+        "inotify のイベント1件を処理する"
+        if mask & IN_Q_OVERFLOW:
+            print("[warn] inotify のイベントがあふれたため一覧を突き合わせ直します")
+            for base in self.base_dirs:
+                self.catch_up(base, now)
+            return
+
+        if wd in self.folder_by_wd:
+            base, folder = self.folder_by_wd[wd]
+            if mask & IN_IGNORED:
+                del self.folder_by_wd[wd]
+                self.watched.discard(folder)
+            else:
+                self.touch(base, folder, now)
+            return
+
+        base = self.base_by_wd.get(wd)
+        if base is None:
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+            print(f"[warn] 監視中のベースディレクトリが移動・削除されました: {base}")
+            del self.base_by_wd[wd]
+            return
+        if not name or not mask & IN_ISDIR:
+            return
+        path = os.path.join(base, name)
+        if is_quarantine_dir(path):
+            return
+
+        if mask & IN_MOVED_FROM:
+            self.moved_from[cookie] = (base, path, now)
+            return
+        if mask & IN_MOVED_TO and cookie in self.moved_from:
+            _old_base, old_path, _at = self.moved_from.pop(cookie)
+            self.renames.append((old_path, path))
+            for folder_wd, (watched_base, folder) in list(self.folder_by_wd.items()):
+                if folder == old_path:
+                    self.folder_by_wd[folder_wd] = (watched_base, path)
+                    self.watched.discard(old_path)
+                    self.watched.add(path)
+            self.forget_folder(base, old_path)
+        if mask & (IN_CREATE | IN_MOVED_TO):
+            self.watch_folder(base, path)
+        self.touch(base, path, now)
+
+    # --- 反映 ---
+    def apply_renames(self) -> int:
+        """
+        改名されたフォルダの works.folder_path を付け替える（解析・レビュー結果はそのまま）
+        - 1件ずつ反映し、失敗した改名は警告だけ出して次へ進む（監視は止めない）
+        """
+        renamed = 0
+        while self.renames:
+            old_path, new_path = self.renames[0]
+            try:
+                renamed += self.apply_rename(old_path, new_path)
+            except sqlite3.Error as e:
+                print(f"[warn] 改名を反映できません: {old_path} → {new_path} ({e})")
+            # 反映したもの・諦めたものだけを取り除く
+            del self.renames[0]
+        return renamed
+
+    def apply_rename(self, old_path: str, new_path: str) -> int:
+        """
+        改名1件を反映し、付け替えた works の件数を返す
+        - 改名先のパスが works に残っている（消えたフォルダの行を残している）場合は付け替えず、
+          改名先の数え直し（touch 済み）でその行の画像数を更新する
+        """
+        old_key, new_key = _key(old_path), _key(new_path)
+        self.conn.execute("DELETE FROM folder_inventory WHERE folder_path = ?", (old_key,))
+        taken = self.conn.execute(
+            "SELECT 1 FROM works WHERE folder_path = ?", (new_key,)
+        ).fetchone()
+        if taken is not None:
+            print(f"[warn] 改名先が既に works にあるため付け替えません: {old_path} → {new_path}")
+            return 0
+        cur = self.conn.execute(
+            "UPDATE works SET folder_path = ? WHERE folder_path = ?", (new_key, old_key)
+        )
+        if cur.rowcount:
+            print(f"✏️ renamed: {old_path} → {new_path}")
+        return cur.rowcount
+
+    def flush(self, now: float) -> int:
+        """
+        デバウンス時間を過ぎたフォルダを数え直して works / folder_inventory に反映し、件数を返す
+        - 対応する MOVED_TO が来なかった MOVED_FROM は、外へ出ていったフォルダとして扱う
+        """
+        for cookie, (base, path, at) in list(self.moved_from.items()):
+            if now - at >= self.debounce:
+                del self.moved_from[cookie]
+                self.touch(base, path, at)
+
+        ready = [key for key, at in self.pending.items() if now - at >= self.debounce]
+        if not ready and not self.renames:
+            return 0
+
+        renamed = self.apply_renames()
+        by_base: dict[str, list[str]] = {}
+        for key in ready:
+            del self.pending[key]
+            base, folder = key
+            by_base.setdefault(base, []).append(folder)
+
+        for base, folders in by_base.items():
+            records = refresh_folders(self.conn, base, folders)
+            inserted = insert_works_batch(self.conn, records)
+            updated = self.conn.executemany(
+                """
+                UPDATE works SET image_count = ?
+                WHERE folder_path = ? AND image_count IS NOT ?
+                """,
+                [(r["image_count"], r["folder_path"], r["image_count"]) for r in records],
+            ).rowcount
+            gone = len(folders) - len(records)
+            print(
+                f"👀 {Path(base).name}: 新規 {inserted} 件 / 画像数更新 {max(updated, 0)} 件"
+                f" / 消失 {gone} 件"
+            )
+        self.conn.commit()
+        return len(ready) + renamed
+
+    def poll_due(self, now: float):
+        """
+        ポーリング対象のベースディレクトリの mtime を確認し、変わっていれば突き合わせる
+        - inotify の監視が無い作品フォルダは、mtime を記録と比べて変化を拾う
+        """
+        if not (self.polled or self.unwatched) or now < self.next_poll:
+            return
+        self.next_poll = now + self.poll_interval
+        for base, last in self.polled.items():
+            try:
+                mtime_ns = os.stat(base).st_mtime_ns
+            except OSError:
+                continue
+            if mtime_ns != last:
+                self.polled[base] = mtime_ns
+                self.catch_up(base, now)
+        for base in list(self.unwatched):
+            self.check_unwatched(base, now)
+
+    # --- ループ ---
+    def next_timeout(self, now: float) -> float | None:
+        "次にやることがあるまでの秒数（何も無ければ None = イベントが来るまで待つ）"
+        deadlines = [at + self.debounce for at in self.pending.values()]
+        deadlines += [at + self.debounce for _b, _p, at in self.moved_from.values()]
+        if self.polled or self.unwatched:
+            deadlines.append(self.next_poll)
+        if not deadlines:
+            return None
+        return max(min(deadlines) - now, 0.0)
+
+    def step(self, timeout: float | None):
+        "イベントを最大 timeout 秒待ち、期限の来た反映・ポーリングを行う"
+        if self.inotify is not None and self.base_by_wd:
+            for wd, mask, cookie, name in self.inotify.read_events(timeout):
+                self.handle_event(wd, mask, cookie, name, time.monotonic())
+        elif timeout is not None:
+            time.sleep(timeout)
+        now = time.monotonic()
+        self.poll_due(now)
+        self.flush(now)
+
+    def start(self):
+        "停止中に起きた変更を拾うため、全ベースディレクトリを一度突き合わせる"
+        now = time.monotonic()
+        for base in self.base_dirs:
+            self.catch_up(base, now)
+            if base in self.polled:
+                self.polled[base] = os.stat(base).st_mtime_ns
+        self.next_poll = now + self.poll_interval
+
+    def run(self):
+        "Ctrl+C まで監視を続ける"
+        self.start()
+        print(
+            f"👀 監視を開始: inotify {len(self.base_by_wd)} 件 / ポーリング {len(self.polled)} 件"
+            "（Ctrl+C で終了）"
+        )
+        unwatched = sum(len(folders) for folders in self.unwatched.values())
+        if unwatched:
+            print(f" - mtime 確認（{self.poll_interval:g} 秒ごと）の作品フォルダ: {unwatched} 件")
+        if not self.base_by_wd and not self.polled:
+            return
+        try:
+            while True:
+                self.step(self.next_timeout(time.monotonic()))
+        except KeyboardInterrupt:
+            print("🛑 監視を終了します")
+        finally:
+            self.flush(float("inf"))
+            self.close()
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+
+def watch_scan_targets(
+    debounce: float = WATCH_DEBOUNCE_SECONDS,
+    poll_interval: float = WATCH_POLL_SECONDS,
+    force_poll: bool = False,
+):
+    """
+    🍣 有効な scan_targets を監視し続け、変化を works に反映する（watch サブコマンド）
+    """
+    with get_connection() as conn:
+        rows = conn.execute("SELECT path FROM scan_targets WHERE active = 1").fetchall()
+        watcher = FolderWatcher(
+            conn,
+            [row["path"] for row in rows],
+            debounce=debounce,
+            poll_interval=poll_interval,
+            force_poll=force_poll,
+        )
+        watcher.run()
@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 import sqlite3
@@ -101,3 +102,117 @@ def test_parse_original_names_skips_unmatched(tmp_path, monkeypatch, capsys):
     rows = conn.execute("SELECT * FROM works_draft").fetchall()
     conn.close()
     assert rows == []
+
+
+def _draft_rows(db_path: Path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT work_id, circle_raw, author_raw, source_raw, type_raw, title_raw"
+        " FROM works_draft ORDER BY work_id"
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def test_parse_original_names_parallel_matches_serial(tmp_path, monkeypatch, capsys):
+    names = [
+        "｛CG集｝[サークル (作者)] タイトル (ソース)",
+        "〔非表示〕｛漫画｝[サークル] タイトル (ジャンプ) #id12",
+        "[サークル] タイトル_2",
+        "タイトル (ソース)",
+        "#id5",
+    ] * 5
+    results = []
+    for mode, workers in (("serial", 1), ("parallel", 2)):
+        db_path = tmp_path / f"{mode}.sqlite"
+        conn = setup_db(db_path)
+        conn.executemany(
+            "INSERT INTO works (id, folder_path, original_name, image_count, status)"
+            " VALUES (?, ?, ?, 0, 'pending')",
+            [(i, f"p{i}", name) for i, name in enumerate(names, start=1)],
+        )
+        conn.commit()
+        conn.close()
+
+        patch_get_connection(monkeypatch, db_path)
+        parse_original_names(workers=workers, chunk_size=4)
+        assert "20 件の draft" in capsys.readouterr().out
+        results.append(_draft_rows(db_path))
+
+    assert results[0] == results[1]
+    assert results[0][1] == (2, "サークル", None, "ジャンプ", "漫画", "タイトル")
+
+
+def test_parse_original_names_incremental(tmp_path, monkeypatch, capsys):
+    db_path = tmp_path / "test.sqlite"
+    conn = setup_db(db_path)
+    conn.executemany(
+        "INSERT INTO works (id, folder_path, original_name, image_count, status)"
+        " VALUES (?, ?, ?, 0, 'pending')",
+        [(1, "p1", "[A] タイトル1"), (2, "p2", "[B] タイトル2"), (3, "p3", "[C] タイトル3")],
+    )
+    conn.commit()
+    conn.close()
+    patch_get_connection(monkeypatch, db_path)
+
+    parse_original_names()
+    assert "3 件の draft" in capsys.readouterr().out
+
+    # 変更なし → 全件スキップ
+    parse_original_names()
+    out = capsys.readouterr().out
+    assert "解析対象: 0" in out
+    assert "スキップ: 3" in out
+
+    # 名前が変わった作品と、新規の作品だけが対象
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE works SET original_name = '[X] 新タイトル' WHERE id = 2")
+    conn.execute(
+        "INSERT INTO works (id, folder_path, original_name, image_count, status)"
+        " VALUES (4, 'p4', '[D] タイトル4', 0, 'pending')"
+    )
+    conn.commit()
+    conn.close()
+    parse_original_names()
+    out = capsys.readouterr().out
+    assert "解析対象: 2" in out
+    assert "スキップ: 2" in out
+    assert _draft_rows(db_path)[1][1] == "X"
+
+    # パーサのバージョンが上がれば全件再解析
+    monkeypatch.setattr(analyzer, "PARSER_VERSION", analyzer.PARSER_VERSION + 1)
+    parse_original_names()
+    assert "解析対象: 4" in capsys.readouterr().out
+
+    # full=True は変更がなくても全件
+    parse_original_names(full=True)
+    assert "解析対象: 4" in capsys.readouterr().out
+
+
+def test_parse_original_names_profile_writes_report(tmp_path, monkeypatch, capsys):
+    db_path = tmp_path / "test.sqlite"
+    conn = setup_db(db_path)
+    conn.executemany(
+        "INSERT INTO works (id, folder_path, original_name, image_count, status)"
+        " VALUES (?, ?, ?, 0, 'pending')",
+        [(1, "p1", "[A] タイトル1"), (2, "p2", "タイトル (ソース)")],
+    )
+    conn.commit()
+    conn.close()
+    patch_get_connection(monkeypatch, db_path)
+    monkeypatch.setattr(analyzer, "LOG_DIR", str(tmp_path / "logs"))
+
+    parse_original_names(workers=2, chunk_size=1, profile=True, adaptive=True)
+
+    out = capsys.readouterr().out
+    assert "2 件の draft" in out
+    assert "PATTERN_CIRCLE_TITLE" in out
+    # 標準のパーサを計測するので、並列解析のまま（適用順の入れ替えは無い）
+    assert "並列解析: 2 プロセス" in out
+    assert "適用順の入れ替えは行いません" in out
+    reports = list((tmp_path / "logs").glob("pattern_profile_*.json"))
+    assert len(reports) == 1
+    with open(reports[0], encoding="utf-8") as f:
+        report = json.load(f)
+    assert report["parser"] == "delimiter"
+    assert report["names"] == 2
@@ -0,0 +1,69 @@
+import os
+import random
+import sys
+import sqlite3
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import db.handler
+import sync.cleaner
+from analyze.parser import parse_with_index
+from analyze.patterns import PATTERN_SEQUENCE
+from benchmarks import bench_commands
+from benchmarks.synthetic import generate_archive, make_work_name
+
+
+def test_work_names_cover_every_pattern():
+    rng = random.Random(0)
+    for index in range(50):
+        name, parts = make_work_name(index, rng)
+        matched, groups = parse_with_index(name)
+        # PATTERN_SEQUENCE の形式を順に巡回する
+        assert matched == index % len(PATTERN_SEQUENCE), name
+        assert "/" not in name
+        if matched == 0:
+            assert groups["author"] == parts["author"]
+
+
+def test_generate_archive_is_deterministic(tmp_path):
+    first = generate_archive(tmp_path / "a", bases=2, works=60, images=2, seed=1)
+    second = generate_archive(tmp_path / "b", bases=2, works=60, images=2, seed=1)
+    assert first.counts == second.counts
+    assert sorted(p.name for p in (tmp_path / "a" / "archive" / "base_00").iterdir()) == sorted(
+        p.name for p in (tmp_path / "b" / "archive" / "base_00").iterdir()
+    )
+
+    conn = sqlite3.connect(first.db_path)
+    registered = conn.execute("SELECT COUNT(*) FROM works").fetchone()[0]
+    targets = conn.execute("SELECT COUNT(*) FROM scan_targets").fetchone()[0]
+    conn.close()
+    assert registered == first.counts["registered"]
+    assert targets == 2
+
+
+def test_run_commands_stays_in_archive(tmp_path):
+    archive = generate_archive(tmp_path / "bench", bases=2, works=40, images=1)
+    names = [name for name, _ in bench_commands.COMMANDS]
+    real_db_path = db.handler.DB_PATH
+
+    timings = bench_commands.run_commands(archive, names)
+
+    assert list(timings) == names
+    assert all(seconds >= 0 for seconds in timings.values())
+    # 差し替えた設定は元に戻る
+    assert db.handler.DB_PATH == real_db_path
+    assert sync.cleaner.BASE_DIRS != archive.base_dirs
+    assert any(archive.log_dir.glob("rename_journal_*.jsonl"))
+
+
+def test_load_registers_classified_folders(tmp_path):
+    archive = generate_archive(tmp_path / "bench", bases=2, works=80, images=1, seed=2)
+    assert archive.counts["classified"] > 0
+
+    bench_commands.run_commands(archive, ["load"])
+
+    conn = sqlite3.connect(archive.db_path)
+    registered = conn.execute("SELECT COUNT(*) FROM works").fetchone()[0]
+    conn.close()
+    # 分類済みで未登録のフォルダだけが新たに登録される（unregistered は JSON に無い）
+    assert registered == archive.counts["registered"] + archive.counts["classified"]
@@ -6,7 +6,11 @@ from contextlib import contextmanager
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import pytest
+
 import sync.cleaner as cleaner
+from config import QUARANTINE_DIR_NAME
+import sync.quarantine as quarantine
 
 
 def setup_db(path: Path):
@@ -31,6 +35,17 @@ def patch_get_connection(monkeypatch, path: Path):
     monkeypatch.setattr(cleaner, "get_connection", _connect)
 
 
+@pytest.fixture(autouse=True)
+def isolated_quarantine(tmp_path, monkeypatch):
+    "隔離先と quarantine の記録先を tmp_path 内に閉じ込める"
+    db_path = tmp_path / "quarantine.sqlite"
+    setup_db(db_path).close()
+    patch_get_connection(monkeypatch, db_path)
+    volume = tmp_path / "volume"
+    monkeypatch.setattr(quarantine, "quarantine_root", lambda _p: str(volume))
+    return db_path, volume / QUARANTINE_DIR_NAME
+
+
 def test_delete_works_with_missing_folders(tmp_path, monkeypatch):
     db_path = tmp_path / "db.sqlite"
     conn = setup_db(db_path)
@@ -221,10 +236,10 @@ def test_delete_physical_folders_rmtree_error(tmp_path, monkeypatch, capsys):
     monkeypatch.setattr(cleaner, "BASE_DIRS", [str(base)])
     monkeypatch.setattr(cleaner, "get_all_db_folder_paths", lambda: set())
 
-    def fail(_path):
+    def fail(*_args):
         raise OSError("boom")
 
-    monkeypatch.setattr(cleaner.shutil, "rmtree", fail)
+    monkeypatch.setattr(cleaner, "quarantine_folder", fail)
 
     cleaner.delete_physical_folders_not_in_db(dry_run=False)
 
@@ -284,13 +299,207 @@ def test_delete_folders_with_zero_images_rmtree_error(tmp_path, monkeypatch, cap
     monkeypatch.setattr(cleaner, "BASE_DIRS", [str(base)])
     monkeypatch.setattr(cleaner, "count_images", lambda _p: 0)
 
-    def fail(_p):
+    def fail(*_args):
         raise OSError("err")
 
-    monkeypatch.setattr(cleaner.shutil, "rmtree", fail)
+    monkeypatch.setattr(cleaner, "quarantine_folder", fail)
 
     cleaner.delete_folders_with_zero_images(dry_run=False)
 
     out = capsys.readouterr().out
     assert "[error]" in out
     assert bad.exists()
+
+
+def test_delete_works_with_missing_folders_cascades(tmp_path, monkeypatch):
+    db_path = tmp_path / "db.sqlite"
+    conn = setup_db(db_path)
+    existing = tmp_path / "exist"
+    existing.mkdir()
+    cur = conn.cursor()
+    for wid, path in ((1, existing), (2, tmp_path / "gone1"), (3, tmp_path / "gone2")):
+        cur.execute(
+            "INSERT INTO works (id, folder_path, original_name, image_count, status)"
+            " VALUES (?, ?, 'n', 1, 'pending')",
+            (wid, str(path)),
+        )
+        cur.execute("INSERT INTO works_draft (work_id, title_raw) VALUES (?, 't')", (wid,))
+        cur.execute(
+            "INSERT INTO work_circle_authors (work_id, circle_id, author_id) VALUES (?,1,NULL)",
+            (wid,),
+        )
+        cur.execute("INSERT INTO work_sources (work_id, source_id) VALUES (?,1)", (wid,))
+        cur.execute("INSERT INTO work_completion_state (work_id) VALUES (?)", (wid,))
+    conn.commit()
+    conn.close()
+
+    listed = []
+    real_list_names = cleaner._list_names
+
+    def counting_list_names(parent):
+        listed.append(parent)
+        return real_list_names(parent)
+
+    # os.listdir はプロセス全体で共有されるので、cleaner 内の呼び出し口だけを差し替える
+    monkeypatch.setattr(cleaner, "_list_names", counting_list_names)
+    patch_get_connection(monkeypatch, db_path)
+    cleaner.delete_works_with_missing_folders()
+
+    # 3件とも同じ親なので listdir は1回だけ
+    assert listed == [str(tmp_path)]
+
+    conn = sqlite3.connect(db_path)
+    for table, column in (
+        ("works", "id"),
+        ("works_draft", "work_id"),
+        ("work_circle_authors", "work_id"),
+        ("work_sources", "work_id"),
+        ("work_completion_state", "work_id"),
+    ):
+        ids = [row[0] for row in conn.execute(f"SELECT {column} FROM {table}")]
+        assert ids == [1], table
+    conn.close()
+
+
+def test_delete_works_without_foreign_keys_falls_back(tmp_path, monkeypatch):
+    db_path = tmp_path / "db.sqlite"
+    conn = setup_db(db_path)
+    conn.execute(
+        "INSERT INTO works (id, folder_path, original_name, image_count, status)"
+        " VALUES (1, ?, 'n', 1, 'pending')",
+        (str(tmp_path / "gone"),),
+    )
+    conn.execute("INSERT INTO works_draft (work_id, title_raw) VALUES (1, 't')")
+    conn.execute("INSERT INTO work_sources (work_id, source_id) VALUES (1,1)")
+    conn.commit()
+    conn.close()
+
+    @contextmanager
+    def _disabled(_conn):
+        yield False
+
+    monkeypatch.setattr(cleaner, "foreign_keys_enabled", _disabled)
+    patch_get_connection(monkeypatch, db_path)
+    cleaner.delete_works_with_missing_folders()
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM works").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM works_draft").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM work_sources").fetchone()[0] == 0
+    conn.close()
+
+
+def test_existing_paths(tmp_path):
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "file.txt").write_text("x", encoding="utf-8")
+    paths = [
+        str(tmp_path / "dir"),
+        str(tmp_path / "file.txt"),
+        str(tmp_path / "missing"),
+        str(tmp_path / "no_parent" / "child"),
+    ]
+    assert cleaner.existing_paths(paths) == {paths[0], paths[1]}
+
+
+def test_delete_orphan_relations_covers_draft(tmp_path, monkeypatch, capsys):
+    db_path = tmp_path / "db.sqlite"
+    conn = setup_db(db_path)
+    conn.execute(
+        "INSERT INTO works (id, folder_path, original_name, image_count, status)"
+        " VALUES (1, 'p', 'o', 1, 'pending')"
+    )
+    conn.execute("INSERT INTO works_draft (work_id, title_raw) VALUES (1, 'keep')")
+    conn.execute("INSERT INTO works_draft (work_id, title_raw) VALUES (2, 'orphan')")
+    conn.commit()
+    conn.close()
+
+    patch_get_connection(monkeypatch, db_path)
+    cleaner.delete_orphan_relations()
+
+    conn = sqlite3.connect(db_path)
+    ids = [row[0] for row in conn.execute("SELECT work_id FROM works_draft")]
+    conn.close()
+    assert ids == [1]
+    assert "works_draft: 1 件" in capsys.readouterr().out
+
+
+def test_delete_physical_folders_quarantines(tmp_path, monkeypatch, isolated_quarantine):
+    db_path, quarantine_dir = isolated_quarantine
+    base = tmp_path / "base"
+    base.mkdir()
+    remove = base / "remove"
+    remove.mkdir()
+    (remove / "a.jpg").write_bytes(b"x")
+
+    monkeypatch.setattr(cleaner, "BASE_DIRS", [str(base)])
+    monkeypatch.setattr(cleaner, "get_all_db_folder_paths", lambda: set())
+
+    cleaner.delete_physical_folders_not_in_db(dry_run=False)
+
+    assert not remove.exists()
+    moved = list(quarantine_dir.iterdir())
+    assert len(moved) == 1
+    assert moved[0].name.endswith("_remove")
+    assert (moved[0] / "a.jpg").exists()
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT * FROM quarantine").fetchone()
+    conn.close()
+    assert row["original_path"] == str(remove)
+    assert row["quarantine_path"] == str(moved[0])
+    assert row["reason"] == "unregistered"
+    assert row["status"] == "quarantined"
+
+
+def test_quarantine_folders_moves_back_when_commit_fails(
+    tmp_path, monkeypatch, isolated_quarantine, capsys
+):
+    db_path, quarantine_dir = isolated_quarantine
+    folder = tmp_path / "base" / "work"
+    folder.mkdir(parents=True)
+    (folder / "a.jpg").write_bytes(b"x")
+
+    def locked(_conn, _paths):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(cleaner, "forget_folders", locked)
+
+    assert cleaner.quarantine_folders([folder], "test") == 0
+
+    # 記録が確定しなかったので、フォルダは元の場所に戻り、記録も残らない
+    assert (folder / "a.jpg").exists()
+    assert list(quarantine_dir.iterdir()) == []
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM quarantine").fetchone()[0] == 0
+    conn.close()
+    assert "元の場所へ戻しました" in capsys.readouterr().out
+
+
+def test_clean_skips_quarantine_dir(tmp_path, monkeypatch):
+    base = tmp_path / "base"
+    base.mkdir()
+    (base / QUARANTINE_DIR_NAME).mkdir()
+
+    monkeypatch.setattr(cleaner, "BASE_DIRS", [str(base)])
+    monkeypatch.setattr(cleaner, "get_all_db_folder_paths", lambda: set())
+
+    cleaner.delete_physical_folders_not_in_db(dry_run=False)
+    cleaner.delete_folders_with_zero_images(dry_run=False)
+
+    assert (base / QUARANTINE_DIR_NAME).exists()
+
+
+def test_zero_images_rechecks_inventory(tmp_path, monkeypatch):
+    base = tmp_path / "base"
+    base.mkdir()
+    folder = base / "later"
+    folder.mkdir()
+    monkeypatch.setattr(cleaner, "BASE_DIRS", [str(base)])
+
+    # 1回目で画像0枚として記録された後、画像が追加された
+    cleaner.delete_folders_with_zero_images(dry_run=True)
+    (folder / "1.jpg").write_bytes(b"x")
+    cleaner.delete_folders_with_zero_images(dry_run=False)
+
+    assert folder.exists()
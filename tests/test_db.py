@@ -43,6 +43,75 @@ def test_get_connection_closes(tmp_path):
         conn.execute("SELECT 1")
 
 
+def test_get_connection_reuses_nested(tmp_path):
+    db_path = tmp_path / "db.sqlite"
+    with handler.get_connection(db_path) as outer:
+        with handler.get_connection(db_path) as inner:
+            assert inner is outer
+        outer.execute("SELECT 1")
+    with pytest.raises(sqlite3.ProgrammingError):
+        outer.execute("SELECT 1")
+
+
+def test_get_connection_applies_pragmas(tmp_path):
+    db_path = tmp_path / "db.sqlite"
+    with handler.get_connection(db_path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+
+
+def test_foreign_keys_enabled_restores(tmp_path):
+    db_path = tmp_path / "db.sqlite"
+    with handler.get_connection(db_path) as conn:
+        with handler.foreign_keys_enabled(conn) as enabled:
+            assert enabled
+            assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 0
+
+        conn.execute("CREATE TABLE sample(id INTEGER)")
+        conn.execute("INSERT INTO sample VALUES (1)")
+        # トランザクション中は有効にできない
+        with handler.foreign_keys_enabled(conn) as enabled:
+            assert not enabled
+        conn.rollback()
+
+
+def test_db_session_holds_connection(tmp_path):
+    db_path = tmp_path / "db.sqlite"
+    with handler.db_session(db_path) as session_conn:
+        with handler.get_connection(db_path) as conn:
+            assert conn is session_conn
+            conn.execute("CREATE TABLE t(id INTEGER)")
+            conn.commit()
+            conn.execute("INSERT INTO t VALUES (1)")  # commit しない
+        # スコープを抜けた時点で未 commit の変更は破棄される
+        assert session_conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+        with handler.get_connection(db_path) as conn:
+            assert conn is session_conn
+        session_conn.execute("SELECT 1")
+    with pytest.raises(sqlite3.ProgrammingError):
+        session_conn.execute("SELECT 1")
+
+
+def test_get_connection_per_thread(tmp_path):
+    import threading
+
+    db_path = tmp_path / "db.sqlite"
+    seen = []
+
+    def worker():
+        with handler.get_connection(db_path) as conn:
+            seen.append(conn)
+
+    with handler.db_session(db_path) as main_conn:
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+    assert seen and seen[0] is not main_conn
+
+
 # --- insert_work, work_exists, get_all_works ---
 def test_basic_work_functions(tmp_path, monkeypatch):
     db_path = tmp_path / "works.sqlite"
@@ -134,3 +203,99 @@ def test_load_classified_works_no_json(tmp_path, monkeypatch, capsys):
     rows = conn.execute("SELECT * FROM works").fetchall()
     conn.close()
     assert rows == []
+
+
+def test_insert_works_batch_skips_existing(tmp_path):
+    db_path = tmp_path / "batch.sqlite"
+    conn = setup_db(db_path)
+    conn.execute("INSERT INTO works (folder_path, original_name, image_count, status) VALUES ('p1', 'exist', 1, 'pending')")
+    records = [
+        {"folder_path": "p1", "original_name": "N1", "image_count": 5},
+        {"folder_path": "p2", "original_name": "N2", "image_count": 7},
+        {"folder_path": "p2", "original_name": "dup", "image_count": 0},
+    ]
+    assert handler.insert_works_batch(conn, records) == 1
+    conn.commit()
+    rows = conn.execute("SELECT folder_path, original_name FROM works ORDER BY folder_path").fetchall()
+    conn.close()
+    assert [(r["folder_path"], r["original_name"]) for r in rows] == [("p1", "exist"), ("p2", "N2")]
+
+
+def test_ingest_scanned_works(tmp_path, monkeypatch, capsys):
+    db_path = tmp_path / "ingest.sqlite"
+    conn = setup_db(db_path)
+    base = tmp_path / "base"
+    base.mkdir()
+    for name in ["A", "B", "C"]:
+        (base / name).mkdir()
+        (base / name / "1.jpg").write_bytes(b"x")
+    conn.execute("INSERT INTO scan_targets (path, active) VALUES (?, 1)", (str(base),))
+    conn.execute(
+        "INSERT INTO works (folder_path, original_name, image_count, status) VALUES (?, 'A', 1, 'pending')",
+        (str((base / "A").resolve()),),
+    )
+    conn.commit()
+    conn.close()
+
+    @contextmanager
+    def _connect():
+        c = sqlite3.connect(db_path)
+        c.row_factory = sqlite3.Row
+        try:
+            yield c
+        finally:
+            c.close()
+
+    monkeypatch.setattr(loader, "get_connection", _connect)
+    loader.ingest_scanned_works(batch_size=1)
+
+    out = capsys.readouterr().out
+    assert "新規登録: 2 件（スキップ: 1）" in out
+    assert not list(base.glob("scan_*.json"))
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT original_name, image_count, status FROM works ORDER BY original_name").fetchall()
+    conn.close()
+    assert rows == [("A", 1, "pending"), ("B", 1, "pending"), ("C", 1, "pending")]
+
+    loader.ingest_scanned_works(incremental=True, export_json=True)
+    assert "新規登録: 0 件（スキップ: 3）" in capsys.readouterr().out
+    assert len(list(base.glob("scan_*.json"))) == 1
+
+
+def test_exists_many_and_bulk_insert(tmp_path, monkeypatch):
+    db_path = tmp_path / "bulk.sqlite"
+    setup_db(db_path).close()
+    patch_get_connection(monkeypatch, db_path)
+
+    handler.insert_work("p1", "N1", 1)
+    assert handler.exists_many(["p1", "p2", "p1"]) == {"p1"}
+    assert handler.exists_many([]) == set()
+
+    records = [
+        {"folder_path": f"p{i}", "original_name": f"N{i}", "image_count": i}
+        for i in range(1, 5)
+    ]
+    assert handler.bulk_insert_works(records) == (3, 1)
+    assert handler.exists_many(["p1", "p2", "p3", "p4", "p5"]) == {"p1", "p2", "p3", "p4"}
+
+
+def test_load_classified_works_counts_per_base(tmp_path, monkeypatch, capsys):
+    db_path = tmp_path / "loader.sqlite"
+    setup_db(db_path).close()
+    patch_get_connection(monkeypatch, db_path)
+
+    bases = []
+    for name, paths in [("b1", ["p1", "p2"]), ("b2", ["p2", "p3", "p4"])]:
+        base = tmp_path / name
+        base.mkdir()
+        records = [{"folder_path": p, "original_name": p, "image_count": 1} for p in paths]
+        (base / f"{loader.CLASSIFY_OUTPUT_PREFIX}_x.json").write_text(json.dumps(records), encoding="utf-8")
+        bases.append(str(base))
+    monkeypatch.setattr(loader, "BASE_DIRS", bases)
+
+    loader.load_classified_works()
+
+    out = capsys.readouterr().out
+    assert "b1 → 新規登録: 2 件（スキップ: 0）" in out
+    assert "b2 → 新規登録: 2 件（スキップ: 1）" in out
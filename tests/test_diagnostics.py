@@ -0,0 +1,68 @@
+import os
+import sys
+import json
+import pstats
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import utils.diagnostics as diagnostics
+
+
+def busy_work():
+    with diagnostics.stage("demo.build"):
+        data = [str(i) * 10 for i in range(20000)]
+    with diagnostics.stage("demo.join"):
+        return len("".join(data))
+
+
+def test_stage_is_noop_without_timings():
+    assert diagnostics._timings is None
+    with diagnostics.stage("anything"):
+        pass
+    assert diagnostics._timings is None
+
+
+def test_diagnostics_disabled_writes_nothing(tmp_path):
+    with diagnostics.diagnostics("review", log_dir=str(tmp_path / "logs")):
+        busy_work()
+    assert not (tmp_path / "logs").exists()
+
+
+def test_diagnostics_writes_all_reports(tmp_path, capsys):
+    log_dir = tmp_path / "logs"
+    with diagnostics.diagnostics(
+        "review", profile=True, trace_malloc=True, timings=True, log_dir=str(log_dir)
+    ):
+        busy_work()
+        busy_work()
+
+    names = sorted(p.name.split("_")[0] for p in log_dir.iterdir())
+    assert names == ["profile", "profile", "timings", "tracemalloc"]
+    assert diagnostics._timings is None
+
+    timings = json.loads(next(log_dir.glob("timings_review_*.json")).read_text("utf-8"))
+    stages = {row["stage"]: row for row in timings["stages"]}
+    assert set(stages) == {"review", "demo.build", "demo.join"}
+    assert stages["demo.build"]["calls"] == 2
+    assert stages["review"]["wall_sec"] >= stages["demo.build"]["wall_sec"]
+
+    stats = pstats.Stats(str(next(log_dir.glob("profile_review_*.pstats"))))
+    assert any(func[2] == "busy_work" for func in stats.stats)
+    callgrind = next(log_dir.glob("profile_review_*.callgrind")).read_text("utf-8")
+    assert "events: Microseconds" in callgrind
+    assert "fn=busy_work:" in callgrind and "cfn=" in callgrind
+
+    tracemalloc_report = next(log_dir.glob("tracemalloc_review_*.txt")).read_text("utf-8")
+    assert tracemalloc_report.startswith("peak:")
+    assert "ピーク" in capsys.readouterr().out
+
+
+def test_diagnostics_reports_on_error(tmp_path):
+    log_dir = tmp_path / "logs"
+    try:
+        with diagnostics.diagnostics("rename", timings=True, log_dir=str(log_dir)):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert len(list(log_dir.glob("timings_rename_*.json"))) == 1
+    assert diagnostics._timings is None
@@ -0,0 +1,100 @@
+import os
+import sys
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import analyze.duplicates as duplicates
+from analyze.duplicates import cluster_pairs, find_duplicate_clusters, update_signatures
+
+
+def setup_db(path: Path):
+    with open(Path(__file__).resolve().parents[1] / "db" / "schema.sql", "r") as f:
+        schema = f.read()
+    conn = sqlite3.connect(path)
+    conn.executescript(schema)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def patch_get_connection(monkeypatch, path: Path):
+    @contextmanager
+    def _connect():
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    monkeypatch.setattr(duplicates, "get_connection", _connect)
+
+
+NAMES = [
+    (1, "[海鮮堂] まぐろ少女の休日 総集編"),
+    (2, "〔非表示〕[海鮮堂] まぐろ少女の休日　総集編 [DL版] #id2"),
+    (3, "[海鮮堂] まぐろ少女の休日 総集編(中国翻訳)"),
+    (4, "[別サークル] 勇者と魔王の放課後日誌"),
+    (5, "[別サークル] 先輩が教えてくれた夏の秘密"),
+]
+
+
+def insert_works(conn, names):
+    conn.executemany(
+        "INSERT INTO works (id, folder_path, original_name, image_count, status)"
+        " VALUES (?, ?, ?, 0, 'pending')",
+        [(work_id, f"/base/{work_id}", name) for work_id, name in names],
+    )
+    conn.commit()
+
+
+def test_find_duplicate_clusters(tmp_path):
+    conn = setup_db(tmp_path / "test.sqlite")
+    insert_works(conn, NAMES)
+
+    clusters = find_duplicate_clusters(conn, threshold=0.5)
+
+    assert [c["work_ids"] for c in clusters] == [[1, 2, 3]]
+    assert all(0.5 <= similarity <= 1 for _, _, similarity in clusters[0]["pairs"])
+
+
+def test_update_signatures_is_incremental(tmp_path, capsys):
+    conn = setup_db(tmp_path / "test.sqlite")
+    insert_works(conn, NAMES)
+    first = update_signatures(conn)
+    assert "計算 5 件 / 再利用 0 件" in capsys.readouterr().out
+
+    conn.execute("UPDATE works SET title = '新しいタイトル' WHERE id = 4")
+    conn.execute("DELETE FROM works WHERE id = 5")
+    insert_works(conn, [(6, "[海鮮堂] いくら少女の冬休み")])
+    second = update_signatures(conn)
+
+    assert "計算 2 件 / 再利用 3 件" in capsys.readouterr().out
+    assert second[1][2] == first[1][2]
+    assert second[4][0] == "新しいタイトル"
+    assert [row[0] for row in conn.execute("SELECT work_id FROM work_minhash ORDER BY work_id")] == [
+        1, 2, 3, 4, 6
+    ]
+
+
+def test_cluster_pairs_merges_transitively():
+    clusters = cluster_pairs([(1, 2, 0.9), (5, 6, 0.6), (2, 3, 0.7)])
+    assert [c["work_ids"] for c in clusters] == [[1, 2, 3], [5, 6]]
+    assert clusters[0]["max_similarity"] == 0.9
+
+
+def test_report_duplicates_writes_json(tmp_path, monkeypatch, capsys):
+    db_path = tmp_path / "test.sqlite"
+    conn = setup_db(db_path)
+    insert_works(conn, NAMES)
+    conn.close()
+    patch_get_connection(monkeypatch, db_path)
+    monkeypatch.setattr(duplicates, "LOG_DIR", str(tmp_path / "logs"))
+
+    duplicates.report_duplicates(threshold=0.5)
+
+    out = capsys.readouterr().out
+    assert "重複候補: 1 クラスタ" in out
+    assert "[2] 〔非表示〕[海鮮堂]" in out
+    assert len(list((tmp_path / "logs").glob("duplicates_*.json"))) == 1
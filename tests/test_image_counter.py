@@ -2,7 +2,12 @@ import os
 import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from utils.image_counter import count_images
+from utils.image_counter import (
+    count_images,
+    count_images_many,
+    folder_fingerprint,
+    is_image_name,
+)
 
 
 def test_count_images(tmp_path):
@@ -16,3 +21,72 @@ def test_count_images(tmp_path):
 def test_count_images_nonexistent(tmp_path):
     nonexistent = tmp_path / "nonexistent"
     assert count_images(nonexistent) == 0
+
+
+def test_count_images_case_and_hidden(tmp_path):
+    (tmp_path / "A.JPG").write_bytes(b"")
+    (tmp_path / "b.WebP").write_bytes(b"")
+    (tmp_path / ".jpg").write_bytes(b"")
+    (tmp_path / "noext").write_bytes(b"")
+    assert count_images(tmp_path) == 2
+
+
+def test_count_images_skips_symlinked_dirs(tmp_path):
+    real = tmp_path / "real"
+    real.mkdir()
+    (real / "a.png").write_bytes(b"")
+    work = tmp_path / "work"
+    work.mkdir()
+    (work / "b.png").write_bytes(b"")
+    try:
+        os.symlink(real, work / "link", target_is_directory=True)
+    except (OSError, NotImplementedError):
+        return
+    assert count_images(work) == 1
+
+
+def test_is_image_name():
+    assert is_image_name("x.jpeg")
+    assert is_image_name("..jpg")
+    assert not is_image_name(".png")
+    assert not is_image_name("x.txt")
+
+
+def test_count_images_many(tmp_path):
+    folders = []
+    for i in range(5):
+        folder = tmp_path / f"w{i}"
+        folder.mkdir()
+        for j in range(i):
+            (folder / f"{j}.jpg").write_bytes(b"")
+        folders.append(folder)
+    missing = tmp_path / "missing"
+
+    result = count_images_many(folders + [missing], workers=3)
+    assert list(result) == [str(f) for f in folders + [missing]]
+    assert [result[str(f)] for f in folders] == [0, 1, 2, 3, 4]
+    assert result[str(missing)] == 0
+
+    assert count_images_many([]) == {}
+    assert count_images_many(folders, workers=1, counter=lambda _p: 7)[str(folders[0])] == 7
+
+
+def test_folder_fingerprint(tmp_path):
+    a = tmp_path / "a"
+    (a / "sub").mkdir(parents=True)
+    (a / "1.jpg").write_bytes(b"xx")
+    (a / "sub" / "2.png").write_bytes(b"yyy")
+    b = tmp_path / "b"
+    (b / "sub").mkdir(parents=True)
+    (b / "1.jpg").write_bytes(b"zz")
+    (b / "sub" / "2.png").write_bytes(b"www")
+
+    # 中身（ファイル名とサイズ）が同じならフォルダ名・内容のバイト列によらず一致
+    assert folder_fingerprint(a) == folder_fingerprint(b)
+    (b / "1.jpg").write_bytes(b"zzz")
+    assert folder_fingerprint(a) != folder_fingerprint(b)
+
+    empty = tmp_path / "empty"
+    empty.mkdir()
+    assert folder_fingerprint(empty) is None
+    assert folder_fingerprint(tmp_path / "missing") is None
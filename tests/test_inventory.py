@@ -0,0 +1,115 @@
+import os
+import sys
+import sqlite3
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import folders.scanner as scanner
+import sync.inventory as inventory
+
+
+def setup_db(path: Path):
+    with open(Path(__file__).resolve().parents[1] / "db" / "schema.sql", "r") as f:
+        schema = f.read()
+    conn = sqlite3.connect(path)
+    conn.executescript(schema)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def counting_scans(monkeypatch, limits: list | None = None) -> list[str]:
+    """
+    walk_base_dir の呼び出し（再走査したベースディレクトリ）を記録する
+    - limits を渡すと、各呼び出しのスレッド数（workers）も記録する
+    """
+    calls = []
+    real_walk = scanner.walk_base_dir
+
+    def _walk(base_dir, cached, workers=None):
+        calls.append(base_dir)
+        if limits is not None:
+            limits.append(workers)
+        return real_walk(base_dir, cached, workers=workers)
+
+    monkeypatch.setattr(scanner, "walk_base_dir", _walk)
+    return calls
+
+
+def make_base(tmp_path: Path) -> Path:
+    base = tmp_path / "base"
+    (base / "A").mkdir(parents=True)
+    (base / "A" / "1.jpg").write_bytes(b"x")
+    (base / "B").mkdir()
+    return base
+
+
+def test_get_inventory_reuses_fresh_snapshot(tmp_path, monkeypatch):
+    base = make_base(tmp_path)
+    conn = setup_db(tmp_path / "db.sqlite")
+    calls = counting_scans(monkeypatch)
+
+    first = inventory.get_inventory(conn, [str(base)])
+    second = inventory.get_inventory(conn, [str(base)])
+
+    assert calls == [str(base)]
+    counts = {Path(row["folder_path"]).name: row["image_count"] for row in second[str(base)]}
+    assert counts == {"A": 1, "B": 0}
+    assert [tuple(row) for row in first[str(base)]] == [tuple(row) for row in second[str(base)]]
+    conn.close()
+
+
+def test_get_inventory_rescans_when_base_changes(tmp_path, monkeypatch):
+    base = make_base(tmp_path)
+    conn = setup_db(tmp_path / "db.sqlite")
+    calls = counting_scans(monkeypatch)
+
+    inventory.get_inventory(conn, [str(base)])
+    (base / "C").mkdir()
+    # mtime の分解能が粗いファイルシステムでも変化が分かるようにする
+    os.utime(base, ns=(0, os.stat(base).st_mtime_ns + 1_000_000_000))
+    result = inventory.get_inventory(conn, [str(base)])
+
+    assert calls == [str(base), str(base)]
+    assert {Path(row["folder_path"]).name for row in result[str(base)]} == {"A", "B", "C"}
+    conn.close()
+
+
+def test_get_inventory_rescans_when_stale(tmp_path, monkeypatch):
+    base = make_base(tmp_path)
+    conn = setup_db(tmp_path / "db.sqlite")
+    calls = counting_scans(monkeypatch)
+
+    inventory.get_inventory(conn, [str(base)])
+    conn.execute("UPDATE inventory_snapshots SET scanned_at = '2000-01-01T00:00:00'")
+    inventory.get_inventory(conn, [str(base)])
+    inventory.get_inventory(conn, [str(base)], max_age_minutes=0)
+
+    assert calls == [str(base)] * 3
+    conn.close()
+
+
+def test_get_inventory_skips_missing_base(tmp_path):
+    conn = setup_db(tmp_path / "db.sqlite")
+    assert inventory.get_inventory(conn, [str(tmp_path / "missing")]) == {}
+    conn.close()
+
+
+def test_get_inventory_respects_device_concurrency(tmp_path, monkeypatch):
+    base = make_base(tmp_path)
+    other = tmp_path / "other"
+    other.mkdir()
+    conn = setup_db(tmp_path / "db.sqlite")
+    # 同じディスク上の別の対象に設定した上限も、そのディスク全体に効く
+    conn.execute(
+        "INSERT INTO scan_targets (path, active, max_concurrency) VALUES (?, 0, 1)",
+        (str(other),),
+    )
+    limits = []
+    calls = counting_scans(monkeypatch, limits)
+
+    inventory.get_inventory(conn, [str(base)], workers=8)
+
+    assert calls == [str(base)]
+    assert limits == [1]
+    conn.close()
@@ -0,0 +1,183 @@
+import os
+import sys
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import db.migrator as migrator
+
+
+OLD_SCHEMA = """
+CREATE TABLE works (
+  id INTEGER PRIMARY KEY,
+  folder_path TEXT NOT NULL,
+  original_name TEXT NOT NULL,
+  image_count INTEGER,
+  status TEXT,
+  type_id INTEGER,
+  title TEXT
+);
+CREATE TABLE work_circle_authors (
+  work_id INTEGER NOT NULL,
+  circle_id INTEGER NOT NULL,
+  author_id INTEGER,
+  PRIMARY KEY (work_id, circle_id, author_id)
+);
+CREATE TABLE work_sources (
+  work_id INTEGER NOT NULL,
+  source_id INTEGER NOT NULL,
+  PRIMARY KEY (work_id, source_id)
+);
+"""
+
+
+def index_names(conn) -> set[str]:
+    return {
+        row[0]
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    }
+
+
+def open_old_db(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.executescript(OLD_SCHEMA)
+    return conn
+
+
+def test_migrate_existing_db(tmp_path, capsys):
+    conn = open_old_db(tmp_path / "old.sqlite")
+    conn.execute("INSERT INTO works (folder_path, original_name) VALUES ('p1', 'n1')")
+    conn.commit()
+
+    assert migrator.get_schema_version(conn) == 0
+    assert migrator.migrate(conn) == migrator.LATEST_VERSION
+    assert migrator.get_schema_version(conn) == migrator.LATEST_VERSION
+
+    names = index_names(conn)
+    assert {
+        "idx_works_folder_path",
+        "idx_works_status",
+        "idx_work_circle_authors_circle",
+        "idx_work_sources_source",
+    } <= names
+    assert migrator.table_exists(conn, "folder_inventory")
+    assert migrator.column_exists(conn, "works", "circle_id")
+
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT 1 FROM works WHERE folder_path = 'p1'"
+    ).fetchall()
+    assert "idx_works_folder_path" in " ".join(row[3] for row in plan)
+
+    # 2回目は何もしない
+    capsys.readouterr()
+    assert migrator.migrate(conn) == migrator.LATEST_VERSION
+    assert "migration" not in capsys.readouterr().out
+    conn.close()
+
+
+def test_migrate_duplicate_paths_falls_back(tmp_path, capsys):
+    conn = open_old_db(tmp_path / "dup.sqlite")
+    conn.execute("INSERT INTO works (folder_path, original_name) VALUES ('p1', 'a')")
+    conn.execute("INSERT INTO works (folder_path, original_name) VALUES ('p1', 'b')")
+    conn.commit()
+
+    migrator.migrate(conn, target=1)
+    assert migrator.get_schema_version(conn) == 1
+    assert "重複 1 件" in capsys.readouterr().out
+    unique = conn.execute(
+        "SELECT \"unique\" FROM pragma_index_list('works') WHERE name = 'idx_works_folder_path'"
+    ).fetchone()[0]
+    assert unique == 0
+    conn.close()
+
+
+def test_migrate_failure_rolls_back(tmp_path, monkeypatch):
+    conn = open_old_db(tmp_path / "fail.sqlite")
+
+    def broken(c):
+        c.execute("CREATE INDEX idx_tmp ON works (title)")
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(
+        migrator, "MIGRATIONS", migrator.MIGRATIONS[:1] + [(2, "broken", broken)]
+    )
+    with pytest.raises(RuntimeError):
+        migrator.migrate(conn, target=2)
+    assert migrator.get_schema_version(conn) == 1
+    assert "idx_tmp" not in index_names(conn)
+    conn.close()
+
+
+def test_migrate_fresh_db(tmp_path):
+    conn = sqlite3.connect(tmp_path / "fresh.sqlite")
+    assert migrator.migrate(conn) == migrator.LATEST_VERSION
+    assert migrator.table_exists(conn, "works")
+    assert migrator.table_exists(conn, "scan_targets")
+    # folder_inventory / inventory_snapshots は migration 2 / 10 が作る
+    assert migrator.table_exists(conn, "folder_inventory")
+    assert migrator.table_exists(conn, "inventory_snapshots")
+    assert migrator.column_exists(conn, "folder_inventory", "dir_mtimes")
+    conn.close()
+
+
+def test_old_migrations_create_only_their_tables(tmp_path):
+    conn = open_old_db(tmp_path / "step.sqlite")
+    assert migrator.migrate(conn, target=2) == 2
+    assert migrator.table_exists(conn, "folder_inventory")
+    assert not migrator.table_exists(conn, "inventory_snapshots")
+    assert migrator.migrate(conn, target=10) == 10
+    assert migrator.table_exists(conn, "inventory_snapshots")
+    conn.close()
+
+
+def test_draft_name_triggers_clear_name_hash(tmp_path):
+    conn = open_old_db(tmp_path / "draft.sqlite")
+    conn.execute("CREATE TABLE works_draft (work_id INTEGER PRIMARY KEY, name_hash TEXT)")
+    conn.execute("INSERT INTO works (id, folder_path, original_name) VALUES (1, 'p1', 'n1')")
+    conn.execute("INSERT INTO works (id, folder_path, original_name) VALUES (2, 'p2', 'n2')")
+    conn.execute("INSERT INTO works_draft (work_id, name_hash) VALUES (1, 'h1'), (2, 'h2')")
+    conn.commit()
+
+    # トリガーが無かった間の変更は分からないので、作成時に一度消す
+    migrator.migrate(conn)
+    assert conn.execute("SELECT COUNT(*) FROM works_draft WHERE name_hash IS NULL").fetchone()[0] == 2
+
+    conn.execute("UPDATE works_draft SET name_hash = 'h'")
+    conn.execute("UPDATE works SET original_name = 'n1' WHERE id = 1")
+    conn.execute("UPDATE works SET original_name = 'renamed' WHERE id = 2")
+    hashes = dict(conn.execute("SELECT work_id, name_hash FROM works_draft").fetchall())
+    assert hashes == {1: "h", 2: None}
+
+    # 削除後に id が再利用されても古い draft のハッシュは使わない
+    conn.execute("UPDATE works_draft SET name_hash = 'h'")
+    conn.execute("DELETE FROM works WHERE id = 1")
+    conn.execute("INSERT INTO works (id, folder_path, original_name) VALUES (1, 'p9', 'other')")
+    hashes = dict(conn.execute("SELECT work_id, name_hash FROM works_draft").fetchall())
+    assert hashes == {1: None, 2: "h"}
+    conn.close()
+
+
+def test_execute_ddl_stays_in_transaction(tmp_path):
+    conn = sqlite3.connect(tmp_path / "ddl.sqlite")
+    conn.execute("BEGIN")
+    migrator.execute_ddl(conn, migrator.FOLDER_INVENTORY_DDL)
+    migrator.execute_ddl(conn, migrator.INVENTORY_SNAPSHOTS_DDL)
+    conn.rollback()
+    assert not migrator.table_exists(conn, "folder_inventory")
+    assert not migrator.table_exists(conn, "inventory_snapshots")
+    conn.close()
+
+
+def test_migrate_populates_match_keys(tmp_path):
+    conn = open_old_db(tmp_path / "keys.sqlite")
+    conn.execute("CREATE TABLE circles (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE)")
+    conn.execute("INSERT INTO circles (name) VALUES ('Ｆｏｏ Ｂａｒ！')")
+    conn.commit()
+
+    migrator.migrate(conn)
+    assert conn.execute("SELECT match_key FROM circles").fetchone()[0] == "foobar"
+    assert "idx_circles_match_key" in index_names(conn)
+    conn.close()
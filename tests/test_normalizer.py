@@ -7,6 +7,7 @@ from utils.normalizer import (
     normalize_for_filename,
     normalize_text,
     normalize_for_matching,
+    normalize_many,
 )
 
 @pytest.mark.parametrize('original,expected', [
@@ -38,3 +39,15 @@ def test_normalize_text(original, expected):
 )
 def test_normalize_for_matching(original, expected):
     assert normalize_for_matching(original) == expected
+
+
+def test_normalize_many_keeps_order_and_dedupes():
+    texts = ['ＦｏｏーＢａｒ！', 'abc', 'ＦｏｏーＢａｒ！', ' ばなな★ ']
+    assert normalize_many(texts) == ['fooーbar', 'abc', 'fooーbar', 'ばなな']
+    assert normalize_many(['a/b', 'c'], normalize_for_filename) == ['a／b', 'c']
+
+
+def test_normalize_ascii_fast_path_matches_nfkc():
+    assert normalize_text('  foo \t bar ') == 'foo bar'
+    assert normalize_for_matching('Foo-Bar_1!') == 'foobar_1'
+    assert normalize_for_filename('a<b>c') == 'a＜b＞c'
@@ -0,0 +1,71 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from analyze.parser import parse_folder_name, parse_with_index
+from analyze.patterns import PATTERN_SEQUENCE
+
+
+def regex_match(name: str):
+    for index, pattern in enumerate(PATTERN_SEQUENCE):
+        match = pattern.match(name)
+        if match:
+            return index, match.groupdict()
+    return None
+
+
+# 区切り記号を多めに含む部品から名前を組み立てる
+TOKENS = [
+    "｛", "｝", "[", "]", "(", ")", " (", ") ", ")] ", "] ", "｝[", " ",
+    "_", "1", "23", "タイトル", "サークル", "作者", "ソース", "CG集", "a", "　", "#",
+]
+
+CORPUS = [
+    "",
+    " ",
+    "1",
+    "_1",
+    "｛CG集｝[サークル (作者)] タイトル (ソース)",
+    "｛CG集｝[サークル (作者)] タイトル (ソース)_2",
+    "｛漫画｝[サークル] タイトル (ジャンプ) 3",
+    "｛漫画｝[] タイトル ()",
+    "｛漫画｝[サークル (作者)] タイトル (上) (下)",
+    "｛漫画｝[サークル (作者)] タイトル",
+    "[サークル] タイトル1",
+    "[サークル] タイトル_12",
+    "[サークル (作者)] タイトル (ソース)",
+    "[サークル] 1",
+    "[] タイトル",
+    "タイトル (ソース)",
+    "タイトル (ソース) (続き)",
+    "タイトル ()",
+    "random text",
+    "タイトル 2023",
+    "(ソース)",
+    "｛CG集｝[サークル (作者)] タイトル (ソース)\n2",
+]
+
+
+def test_parser_matches_regex_on_corpus():
+    for name in CORPUS:
+        assert parse_with_index(name) == regex_match(name), name
+
+
+def test_parser_matches_regex_on_random_names():
+    rng = random.Random(20240611)
+    for _ in range(20000):
+        name = "".join(rng.choice(TOKENS) for _ in range(rng.randint(0, 14)))
+        assert parse_with_index(name) == regex_match(name), repr(name)
+
+
+def test_parse_folder_name_long_bracket_title():
+    title = "タイトル" + "[角](括弧)_" * 2000
+    name = f"｛CG集｝[サークル (作者)] {title} (ソース)_1"
+    assert parse_folder_name(name) == regex_match(name)[1] == {
+        "type": "CG集",
+        "circle": "サークル",
+        "author": "作者",
+        "title": title,
+        "source": "ソース",
+    }
@@ -0,0 +1,109 @@
+import json
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from analyze import patterns
+from analyze.profiler import PatternProfiler, can_swap, leading_literal
+
+
+NAMES = [
+    "[サークル] タイトル1",
+    "[サークル (作者)] タイトル (ソース)",
+    "[サークル] タイトル_2",
+    "｛CG集｝[サークル (作者)] タイトル (ソース)",
+    "｛漫画｝[サークル] タイトル (ジャンプ)",
+    "タイトル (ソース)",
+    "random text",
+    "",
+]
+
+
+def regex_match(name):
+    for pattern in patterns.PATTERN_SEQUENCE:
+        match = pattern.match(name)
+        if match:
+            return match.groupdict()
+    return None
+
+
+def test_leading_literal_and_can_swap():
+    assert leading_literal(patterns.PATTERN_WITH_AUTHOR) == "｛"
+    assert leading_literal(patterns.PATTERN_CIRCLE_TITLE) == "["
+    assert leading_literal(patterns.PATTERN_TITLE_ONLY) is None
+
+    assert can_swap(patterns.PATTERN_NO_AUTHOR, patterns.PATTERN_CIRCLE_TITLE)
+    assert not can_swap(patterns.PATTERN_WITH_AUTHOR, patterns.PATTERN_NO_AUTHOR)
+    assert not can_swap(patterns.PATTERN_CIRCLE_TITLE, patterns.PATTERN_TITLE_SOURCE)
+
+
+def test_profiler_times_the_delimiter_parser():
+    profiler = PatternProfiler()
+    for name in NAMES:
+        assert profiler.match(name) == regex_match(name)
+
+    report = profiler.report()
+    by_name = {p["pattern"]: p for p in report["patterns"]}
+    assert report["parser"] == "delimiter"
+    assert report["names"] == len(NAMES)
+    assert report["unmatched"] == 1
+    # 一致したパターンにだけ記録される（正規表現を順に試すわけではない）
+    assert by_name["PATTERN_WITH_AUTHOR"]["attempts"] == 1
+    assert by_name["PATTERN_CIRCLE_TITLE"]["hits"] == 3
+    assert by_name["PATTERN_TITLE_ONLY"]["hits"] == 1
+    assert sum(p["hits"] for p in report["patterns"]) == len(NAMES) - 1
+
+    # 標準のパーサには適用順が無い
+    assert not PatternProfiler(adaptive=True).adaptive
+
+
+def test_profiler_merges_worker_measurements():
+    profiler = PatternProfiler()
+    for chunk in (NAMES[:4], NAMES[4:]):
+        worker = pickle.loads(pickle.dumps(profiler.fresh()))
+        for name in chunk:
+            worker.match(name)
+        profiler.merge(pickle.loads(pickle.dumps(worker)))
+
+    report = profiler.report()
+    by_name = {p["pattern"]: p for p in report["patterns"]}
+    assert report["names"] == len(NAMES)
+    assert report["unmatched"] == 1
+    assert by_name["PATTERN_CIRCLE_TITLE"]["hits"] == 3
+    assert len(by_name["PATTERN_CIRCLE_TITLE"]["worst"]) == 3
+
+
+def test_regex_profiler_counts_attempts_and_hits():
+    profiler = PatternProfiler(list(patterns.PATTERN_SEQUENCE))
+    for name in NAMES:
+        assert profiler.match(name) == regex_match(name)
+
+    report = profiler.report()
+    by_name = {p["pattern"]: p for p in report["patterns"]}
+    assert report["parser"] == "regex"
+    assert report["unmatched"] == 1
+    assert by_name["PATTERN_WITH_AUTHOR"]["attempts"] == len(NAMES)
+    assert by_name["PATTERN_CIRCLE_TITLE"]["hits"] == 3
+    assert by_name["PATTERN_TITLE_ONLY"]["hits"] == 1
+    assert len(by_name["PATTERN_WITH_AUTHOR"]["worst"]) == 5
+
+
+def test_adaptive_order_keeps_results(tmp_path):
+    profiler = PatternProfiler(list(patterns.PATTERN_SEQUENCE), adaptive=True)
+    for name in NAMES:
+        profiler.match(name)
+    assert profiler.reorder()
+    assert profiler.report()["order"] == [
+        "PATTERN_CIRCLE_TITLE",
+        "PATTERN_WITH_AUTHOR",
+        "PATTERN_NO_AUTHOR",
+        "PATTERN_TITLE_SOURCE",
+        "PATTERN_TITLE_ONLY",
+    ]
+    for name in NAMES:
+        assert profiler.match(name) == regex_match(name)
+
+    path = profiler.write_report(str(tmp_path))
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["names"] == len(NAMES) * 2
@@ -0,0 +1,181 @@
+import os
+import sys
+import sqlite3
+from pathlib import Path
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import sync.quarantine as quarantine
+from config import QUARANTINE_DIR_NAME
+
+
+def setup_db(path: Path):
+    with open(Path(__file__).resolve().parents[1] / "db" / "schema.sql", "r") as f:
+        schema = f.read()
+    conn = sqlite3.connect(path)
+    conn.executescript(schema)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def patch_get_connection(monkeypatch, path: Path):
+    @contextmanager
+    def _connect():
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    monkeypatch.setattr(quarantine, "get_connection", _connect)
+
+
+def quarantine_one(tmp_path, monkeypatch, name: str, age_days: int = 0):
+    "tmp_path/base/name を作って隔離し、(元のパス, 隔離先, DB) を返す"
+    db_path = tmp_path / "db.sqlite"
+    if not db_path.exists():
+        setup_db(db_path).close()
+    monkeypatch.setattr(quarantine, "quarantine_root", lambda _p: str(tmp_path / "volume"))
+    folder = tmp_path / "base" / name
+    folder.mkdir(parents=True)
+    (folder / "a.jpg").write_bytes(b"x")
+
+    conn = sqlite3.connect(db_path)
+    target = quarantine.quarantine_folder(conn, folder, "test")
+    conn.execute(
+        "UPDATE quarantine SET quarantined_at = datetime('now', 'localtime', ?)"
+        " WHERE quarantine_path = ?",
+        (f"-{age_days} days", target),
+    )
+    conn.commit()
+    conn.close()
+    patch_get_connection(monkeypatch, db_path)
+    return folder, Path(target), db_path
+
+
+def statuses(db_path: Path) -> list[str]:
+    conn = sqlite3.connect(db_path)
+    rows = [row[0] for row in conn.execute("SELECT status FROM quarantine ORDER BY id")]
+    conn.close()
+    return rows
+
+
+def test_quarantine_root_defaults_to_base_dir(tmp_path):
+    base = tmp_path / "base"
+    assert not os.path.ismount(base.parent)
+    assert quarantine.quarantine_root(base / "work") == str(base)
+
+
+def test_quarantine_root_uses_configured_root_on_same_device(tmp_path, monkeypatch):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    (tmp_path / "base").mkdir()
+    monkeypatch.setattr(quarantine, "QUARANTINE_ROOT", str(shared))
+    assert quarantine.quarantine_root(tmp_path / "base" / "work") == str(shared)
+
+    # 別のデバイス扱いなら rename できないので使わない
+    real_device_of = quarantine._device_of
+    monkeypatch.setattr(
+        quarantine, "_device_of", lambda p: -1 if p == str(shared) else real_device_of(p)
+    )
+    assert quarantine.quarantine_root(tmp_path / "base" / "work") == str(tmp_path / "base")
+
+
+def test_quarantine_folder_without_patching(tmp_path):
+    "隔離先を差し替えずに、ボリュームのマウントポイントではないベースディレクトリで隔離できる"
+    base = tmp_path / "base"
+    folder = base / "work"
+    folder.mkdir(parents=True)
+    (folder / "a.jpg").write_bytes(b"x")
+    conn = setup_db(tmp_path / "db.sqlite")
+
+    target = Path(quarantine.quarantine_folder(conn, folder, "test"))
+
+    assert not folder.exists()
+    assert target.parent == base / QUARANTINE_DIR_NAME
+    assert (target / "a.jpg").exists()
+    conn.close()
+
+
+def test_quarantine_folder_keeps_folder_when_record_fails(tmp_path):
+    "記録（INSERT）に失敗したらフォルダは動かさない"
+    folder = tmp_path / "base" / "work"
+    folder.mkdir(parents=True)
+    conn = sqlite3.connect(tmp_path / "empty.sqlite")  # quarantine テーブルなし
+
+    with pytest.raises(sqlite3.Error):
+        quarantine.quarantine_folder(conn, folder, "test")
+
+    assert folder.exists()
+    assert not (tmp_path / "base" / QUARANTINE_DIR_NAME).exists()
+    conn.close()
+
+
+def test_quarantine_folder_drops_record_when_rename_fails(tmp_path):
+    "rename に失敗したら記録を残さない"
+    conn = setup_db(tmp_path / "db.sqlite")
+
+    with pytest.raises(OSError):
+        quarantine.quarantine_folder(conn, tmp_path / "base" / "missing", "test")
+
+    assert conn.execute("SELECT COUNT(*) FROM quarantine").fetchone()[0] == 0
+    conn.close()
+
+
+def test_quarantine_path_for_is_unique(tmp_path, monkeypatch):
+    monkeypatch.setattr(quarantine, "quarantine_root", lambda _p: str(tmp_path))
+    first = quarantine.quarantine_path_for(tmp_path / "work")
+    second = quarantine.quarantine_path_for(tmp_path / "work")
+    assert first != second
+    assert Path(first).parent == tmp_path / QUARANTINE_DIR_NAME
+    assert first.endswith("_work")
+
+
+def test_purge_respects_retention(tmp_path, monkeypatch):
+    _, old, db_path = quarantine_one(tmp_path, monkeypatch, "old", age_days=40)
+    _, new, _ = quarantine_one(tmp_path, monkeypatch, "new", age_days=1)
+
+    quarantine.purge_quarantine(retention_days=30, workers=2)
+
+    assert not old.exists()
+    assert new.exists()
+    assert statuses(db_path) == ["purged", "quarantined"]
+
+
+def test_purge_dry_run_and_missing_tree(tmp_path, monkeypatch, capsys):
+    _, target, db_path = quarantine_one(tmp_path, monkeypatch, "work", age_days=40)
+
+    quarantine.purge_quarantine(retention_days=30, dry_run=True)
+    assert target.exists()
+    assert "[purge]" in capsys.readouterr().out
+
+    # 手で消されていても purged として記録する
+    (target / "a.jpg").unlink()
+    target.rmdir()
+    quarantine.purge_quarantine(retention_days=30)
+    assert statuses(db_path) == ["purged"]
+
+
+def test_restore_quarantined(tmp_path, monkeypatch):
+    folder, target, db_path = quarantine_one(tmp_path, monkeypatch, "work")
+
+    assert quarantine.restore_quarantined(1)
+    assert (folder / "a.jpg").exists()
+    assert not target.exists()
+    assert statuses(db_path) == ["restored"]
+    # 復元済みのものは再度戻さない
+    assert not quarantine.restore_quarantined(1)
+
+
+def test_restore_refuses_existing_destination(tmp_path, monkeypatch, capsys):
+    folder, target, db_path = quarantine_one(tmp_path, monkeypatch, "work")
+    folder.mkdir()
+
+    assert not quarantine.restore_quarantined(1)
+    assert target.exists()
+    assert statuses(db_path) == ["quarantined"]
+    assert "既に存在します" in capsys.readouterr().out
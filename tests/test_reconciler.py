@@ -68,6 +68,9 @@ def test_get_all_physical_folders(tmp_path, monkeypatch):
     f2 = base / "B"
     f2.mkdir()
     (base / "notdir.txt").write_text("x", encoding="utf-8")
+    db_path = tmp_path / "db.sqlite"
+    setup_db(db_path).close()
+    patch_get_connection(monkeypatch, db_path)
 
     monkeypatch.setattr(reconciler, "BASE_DIRS", [str(base)])
 
@@ -84,6 +87,9 @@ def test_get_all_physical_folders_missing_base(tmp_path, monkeypatch, capsys):
     d2 = base / "B"
     d2.mkdir()
     (base / "note.txt").write_text("x", encoding="utf-8")
+    db_path = tmp_path / "db.sqlite"
+    setup_db(db_path).close()
+    patch_get_connection(monkeypatch, db_path)
 
     monkeypatch.setattr(reconciler, "BASE_DIRS", [str(missing), str(base)])
 
@@ -97,6 +103,9 @@ def test_compare_db_and_folders(capsys, tmp_path, monkeypatch):
     p1 = (tmp_path / "p1").resolve()
     p2 = (tmp_path / "p2").resolve()
     p3 = (tmp_path / "p3").resolve()
+    db_path = tmp_path / "db.sqlite"
+    setup_db(db_path).close()
+    patch_get_connection(monkeypatch, db_path)
 
     monkeypatch.setattr(
         reconciler,
@@ -106,7 +115,7 @@ def test_compare_db_and_folders(capsys, tmp_path, monkeypatch):
     monkeypatch.setattr(
         reconciler,
         "get_all_physical_folders",
-        lambda: [p2, p3],
+        lambda **_kwargs: [p2, p3],
     )
 
     reconciler.compare_db_and_folders()
@@ -115,3 +124,163 @@ def test_compare_db_and_folders(capsys, tmp_path, monkeypatch):
     assert "実フォルダ：2 件" in out
     assert "❌ 実体が存在しない（DBにだけある）：1 件" in out
     assert "➕ 未登録（物理にだけある）：1 件" in out
+
+
+def insert_work(conn, work_id: int, path: Path, fingerprint: str | None = None):
+    conn.execute(
+        "INSERT INTO works (id, folder_path, original_name, image_count, status, fingerprint)"
+        " VALUES (?, ?, ?, 1, 'pending', ?)",
+        (work_id, str(path), path.name, fingerprint),
+    )
+
+
+def make_folder(path: Path, *files: tuple[str, bytes]) -> Path:
+    path.mkdir(parents=True)
+    for name, data in files:
+        (path / name).write_bytes(data)
+    return path
+
+
+def test_work_id_from_name():
+    assert reconciler.work_id_from_name("｛漫画｝[A] タイトル #id42") == 42
+    assert reconciler.work_id_from_name("タイトル #id42 (2)") is None
+    assert reconciler.work_id_from_name("タイトル") is None
+
+
+def test_detect_moves_by_id_fingerprint_and_name(tmp_path):
+    new_base = tmp_path / "new"
+    by_id = make_folder(new_base / "｛漫画｝[A] 改名後 #id1", ("1.jpg", b"a"))
+    by_fp = make_folder(new_base / "renamed", ("1.jpg", b"bb"), ("2.jpg", b"ccc"))
+    by_name = make_folder(new_base / "same_name", ("1.jpg", b"d"))
+    other = make_folder(new_base / "unrelated", ("1.jpg", b"eeee"))
+
+    old_fp = reconciler.folder_fingerprint(by_fp)
+    missing = {
+        str(tmp_path / "old" / "anything"): 1,
+        str(tmp_path / "old" / "before_rename"): 2,
+        str(tmp_path / "old" / "same_name"): 3,
+        str(tmp_path / "old" / "changed"): 4,
+    }
+    moves = reconciler.detect_moves(
+        missing,
+        [str(by_id), str(by_fp), str(by_name), str(other)],
+        {2: old_fp, 4: "0" * 32},
+        workers=1,
+    )
+    assert [(wid, new, how) for wid, _old, new, how in moves] == [
+        (1, str(by_id), "id"),
+        (2, str(by_fp), "fingerprint"),
+        (3, str(by_name), "name"),
+    ]
+
+
+def test_detect_moves_skips_ambiguous_fingerprint(tmp_path):
+    a = make_folder(tmp_path / "a", ("1.jpg", b"x"))
+    b = make_folder(tmp_path / "b", ("1.jpg", b"x"))
+    fp = reconciler.folder_fingerprint(a)
+    moves = reconciler.detect_moves(
+        {str(tmp_path / "old" / "w"): 1}, [str(a), str(b)], {1: fp}, workers=1
+    )
+    assert moves == []
+
+
+def test_compare_db_and_folders_applies_moves(tmp_path, monkeypatch, capsys):
+    old_base = tmp_path / "old"
+    new_base = tmp_path / "new"
+    work = make_folder(old_base / "work", ("1.jpg", b"abc"), ("2.jpg", b"de"))
+    db_path = tmp_path / "db.sqlite"
+    conn = setup_db(db_path)
+    insert_work(conn, 1, work.resolve())
+    conn.execute("INSERT INTO work_completion_state (work_id, title_done) VALUES (1, 1)")
+    conn.commit()
+    conn.close()
+    patch_get_connection(monkeypatch, db_path)
+    monkeypatch.setattr(reconciler, "BASE_DIRS", [str(old_base), str(new_base)])
+
+    # 1回目の sync で指紋を記録しておき、移動後の sync で照合する
+    new_base.mkdir()
+    reconciler.compare_db_and_folders()
+    assert "指紋を記録：1 件" in capsys.readouterr().out
+
+    moved = work.rename(new_base / "renamed")
+    reconciler.compare_db_and_folders()
+    out = capsys.readouterr().out
+    assert "移動（DBのパスを更新すれば一致）：1 件" in out
+    assert "❌ 実体が存在しない（DBにだけある）：0 件" in out
+    assert "Dry-run" in out
+
+    reconciler.compare_db_and_folders(apply=True)
+    assert "パスを更新しました: 1 件" in capsys.readouterr().out
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT folder_path FROM works").fetchone()[0] == str(moved.resolve())
+    # レビュー状態は残る
+    assert conn.execute("SELECT title_done FROM work_completion_state").fetchone()[0] == 1
+    conn.close()
+
+
+def test_detect_moves_ignores_name_when_fingerprint_differs(tmp_path):
+    # 記録済みの指紋と中身が違うフォルダは、名前が同じでも移動とみなさない
+    moved = make_folder(tmp_path / "new" / "work", ("1.jpg", b"a"), ("2.jpg", b"added"))
+    moves = reconciler.detect_moves(
+        {str(tmp_path / "old" / "work"): 1}, [str(moved)], {1: "0" * 32}, workers=1
+    )
+    assert moves == []
+
+
+def test_compare_db_and_folders_refreshes_changed_fingerprints(tmp_path, monkeypatch, capsys):
+    old_base = tmp_path / "old"
+    new_base = tmp_path / "new"
+    new_base.mkdir()
+    work = make_folder(old_base / "work", ("1.jpg", b"abc"))
+    other = make_folder(old_base / "other", ("1.jpg", b"xyz"))
+    db_path = tmp_path / "db.sqlite"
+    conn = setup_db(db_path)
+    insert_work(conn, 1, work.resolve())
+    insert_work(conn, 2, other.resolve())
+    conn.commit()
+    conn.close()
+    patch_get_connection(monkeypatch, db_path)
+    monkeypatch.setattr(reconciler, "BASE_DIRS", [str(old_base), str(new_base)])
+
+    reconciler.compare_db_and_folders(max_age_minutes=0)
+    assert "指紋を記録：2 件" in capsys.readouterr().out
+
+    # 変化の無い作品は計算し直さず、中身が変わった作品だけ指紋を更新する
+    (work / "2.jpg").write_bytes(b"added")
+    reconciler.compare_db_and_folders(max_age_minutes=0)
+    assert "指紋を記録：1 件" in capsys.readouterr().out
+
+    # 更新後の指紋で、改名を伴う移動も検出できる
+    work.rename(new_base / "renamed")
+    # 前回の sync の後に中身が変わってから移動した作品は、名前が同じでも対応付けない
+    (other / "3.jpg").write_bytes(b"more")
+    other.rename(new_base / "other")
+    reconciler.compare_db_and_folders(max_age_minutes=0)
+    out = capsys.readouterr().out
+    assert "移動（DBのパスを更新すれば一致）：1 件" in out
+    assert "renamed  (fingerprint)" in out
+    assert "❌ 実体が存在しない（DBにだけある）：1 件" in out
+    assert "➕ 未登録（物理にだけある）：1 件" in out
+
+
+def test_compare_db_and_folders_on_unmigrated_works(tmp_path, monkeypatch, capsys):
+    # migration 9 / 12 より前の works（指紋の列なし）
+    db_path = tmp_path / "old.sqlite"
+    conn = setup_db(db_path)
+    conn.execute("ALTER TABLE works DROP COLUMN fingerprint_state")
+    conn.execute("ALTER TABLE works DROP COLUMN fingerprint")
+    base = tmp_path / "base"
+    work = make_folder(base / "work", ("1.jpg", b"a"))
+    conn.execute(
+        "INSERT INTO works (id, folder_path, original_name, image_count, status)"
+        " VALUES (1, ?, 'work', 1, 'pending')",
+        (str(work.resolve()),),
+    )
+    conn.commit()
+    conn.close()
+    patch_get_connection(monkeypatch, db_path)
+    monkeypatch.setattr(reconciler, "BASE_DIRS", [str(base)])
+
+    reconciler.compare_db_and_folders()
+    assert "指紋を記録：1 件" in capsys.readouterr().out
@@ -59,6 +59,37 @@ def test_compose_folder_name(tmp_path, monkeypatch):
     assert result == expected
 
 
+def test_compose_folder_names_batch(tmp_path, monkeypatch):
+    db_path = tmp_path / "test.sqlite"
+    conn = setup_db(db_path)
+    cur = conn.cursor()
+    cur.execute("INSERT INTO types (id,name) VALUES (1,'CG集'),(2,'同人誌')")
+    cur.execute("INSERT INTO circles (id,name) VALUES (1,'C1'),(2,'C2')")
+    cur.execute("INSERT INTO authors (id,name) VALUES (1,'A1'),(2,'A2')")
+    cur.execute("INSERT INTO sources (id,name) VALUES (1,'S1'),(2,'S2')")
+    cur.execute(
+        "INSERT INTO works (id, folder_path, original_name, image_count, status, type_id, title)"
+        " VALUES (1, 'p1', 'o', 0, 'confirmed', 1, 'T1'),"
+        " (2, 'p2', 'o', 0, 'confirmed', 2, 'T/2'),"
+        " (3, 'p3', 'o', 0, 'confirmed', NULL, 'T3')"
+    )
+    cur.execute("INSERT INTO work_circle_authors VALUES (1,2,NULL),(1,1,2),(1,1,1),(2,2,2)")
+    cur.execute("INSERT INTO work_sources VALUES (1,2),(1,1),(3,1)")
+    conn.commit()
+    conn.close()
+
+    patch_get_connection(monkeypatch, db_path)
+
+    names = rename.compose_folder_names([3, 1, 2, 99])
+    assert names == {
+        1: normalize_for_filename('｛CG集｝[C1 (A1、A2)、C2] T1 （S1、S2） #id1'),
+        2: normalize_for_filename('｛同人誌｝[C2 (A2)] T/2 #id2'),
+        3: normalize_for_filename('｛None｝[] T3 （S1） #id3'),
+    }
+    for work_id, name in names.items():
+        assert rename.compose_folder_name(work_id) == name
+
+
 def test_rename_one_work(tmp_path, monkeypatch):
     db_path = tmp_path / "db.sqlite"
     conn = setup_db(db_path)
@@ -106,7 +137,7 @@ def test_rename_all_confirmed_works(tmp_path, monkeypatch):
     conn.close()
 
     patch_get_connection(monkeypatch, db_path)
-    monkeypatch.setattr(rename, "compose_folder_name", lambda _id: "new #id1")
+    monkeypatch.setattr(rename, "compose_folder_names", lambda ids: {i: "new #id1" for i in ids})
     class DummyDatetime:
         @classmethod
         def now(cls):
@@ -206,7 +237,7 @@ def prepare_confirmed(db_path: Path, folder: Path) -> None:
 
 def run_confirmed(monkeypatch, db_path: Path, date: datetime, tmp_path: Path):
     patch_get_connection(monkeypatch, db_path)
-    monkeypatch.setattr(rename, "compose_folder_name", lambda _id: "new #id1")
+    monkeypatch.setattr(rename, "compose_folder_names", lambda ids: {i: "new #id1" for i in ids})
     class DummyDatetime:
         @classmethod
         def now(cls):
@@ -253,7 +284,7 @@ def test_rename_all_confirmed_exception(tmp_path, monkeypatch):
     folder.mkdir()
     prepare_confirmed(db, folder)
     patch_get_connection(monkeypatch, db)
-    monkeypatch.setattr(rename, "compose_folder_name", lambda _id: "new #id1")
+    monkeypatch.setattr(rename, "compose_folder_names", lambda ids: {i: "new #id1" for i in ids})
     def fail(*args, **kwargs):
         raise RuntimeError("boom")
     monkeypatch.setattr(os, "rename", fail)
@@ -267,3 +298,105 @@ def test_rename_all_confirmed_exception(tmp_path, monkeypatch):
     logs = read_log(tmp_path, datetime(2022, 1, 5))
     assert logs[0][3] == "error"
     assert "boom" in logs[0][4]
+
+
+# --- journal / executor ---
+from folders.rename_journal import RenameJournal, load_journal
+
+
+def prepare_confirmed_many(db_path: Path, folders: list[Path]) -> None:
+    conn = setup_db(db_path)
+    for i, folder in enumerate(folders, start=1):
+        conn.execute(
+            "INSERT INTO works (id, folder_path, original_name, image_count, status, title)"
+            " VALUES (?, ?, 'o', 0, 'confirmed', 'T')",
+            (i, str(folder)),
+        )
+        conn.execute(
+            "INSERT INTO work_completion_state (work_id,circle_id_done,author_id_done,source_id_done,type_id_done,title_done)"
+            " VALUES (?,1,1,1,1,1)",
+            (i,),
+        )
+    conn.commit()
+    conn.close()
+
+
+def read_works(db_path: Path) -> list:
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT id, folder_path, status FROM works ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+def test_rename_all_parallel_dirs_and_journal(tmp_path, monkeypatch):
+    db = tmp_path / "db.sqlite"
+    folders = []
+    for base in ["b1", "b2"]:
+        for name in ["x", "y"]:
+            folder = tmp_path / base / name
+            folder.mkdir(parents=True)
+            folders.append(folder)
+    prepare_confirmed_many(db, folders)
+    patch_get_connection(monkeypatch, db)
+    monkeypatch.setattr(rename, "compose_folder_names", lambda ids: {i: f"new #id{i}" for i in ids})
+    monkeypatch.chdir(tmp_path)
+
+    rename.rename_all_confirmed_works(workers=2)
+
+    rows = read_works(db)
+    assert all(status == "renamed" for _, _, status in rows)
+    assert all(Path(path).is_dir() and Path(path).name == f"new #id{i}" for i, path, _ in rows)
+
+    journals = list((tmp_path / "data" / "logs").glob("rename_journal_*.jsonl"))
+    assert len(journals) == 1
+    entries = load_journal(str(journals[0]))
+    assert all(e["state"] == "renamed" and e["committed"] for e in entries.values())
+
+
+def test_resume_renames_after_crash(tmp_path, monkeypatch):
+    db = tmp_path / "db.sqlite"
+    base = tmp_path / "base"
+    done_old, done_new = base / "a", base / "a2"
+    todo_old, todo_new = base / "b", base / "b2"
+    done_new.mkdir(parents=True)  # リネーム済みだが記録前に停止
+    todo_old.mkdir()
+    prepare_confirmed_many(db, [done_old, todo_old])
+    patch_get_connection(monkeypatch, db)
+
+    journal = RenameJournal.create(
+        str(tmp_path), [(1, str(done_old), str(done_new)), (2, str(todo_old), str(todo_new))]
+    )
+    journal.close()
+
+    rename.resume_renames(journal.path)
+
+    assert todo_new.is_dir() and not todo_old.exists()
+    assert read_works(db) == [(1, str(done_new), "renamed"), (2, str(todo_new), "renamed")]
+    entries = load_journal(journal.path)
+    assert all(e["committed"] for e in entries.values())
+
+    # 再実行しても何もしない
+    rename.resume_renames(journal.path)
+    assert read_works(db)[1] == (2, str(todo_new), "renamed")
+
+
+def test_rollback_renames(tmp_path, monkeypatch):
+    db = tmp_path / "db.sqlite"
+    base = tmp_path / "base"
+    old_dir = base / "old"
+    old_dir.mkdir(parents=True)
+    prepare_confirmed_many(db, [old_dir])
+    patch_get_connection(monkeypatch, db)
+    monkeypatch.setattr(rename, "compose_folder_names", lambda ids: {i: "new #id1" for i in ids})
+    monkeypatch.chdir(tmp_path)
+
+    rename.rename_all_confirmed_works()
+    journal = next((tmp_path / "data" / "logs").glob("rename_journal_*.jsonl"))
+    assert (base / "new #id1").is_dir()
+
+    rename.rollback_renames(str(journal))
+
+    assert old_dir.is_dir()
+    assert not (base / "new #id1").exists()
+    assert read_works(db) == [(1, str(old_dir), "confirmed")]
+    assert load_journal(str(journal))[1]["state"] == "rolled_back"
@@ -125,3 +125,140 @@ def test_apply_draft_to_works(tmp_path, monkeypatch):
     assert state["source_id_done"] == 1
     assert state["type_id_done"] == 1
     conn.close()
+
+
+def reference_get_or_create_id(cursor, table, name):
+    # 変更前の全件走査による照合（比較用）
+    key = reviewer.normalize_for_matching(name)
+    cursor.execute(f"SELECT id, name FROM {table}")
+    for row in cursor.fetchall():
+        if reviewer.normalize_for_matching(row["name"]) == key:
+            return row["id"]
+    cursor.execute(f"INSERT INTO {table} (name) VALUES (?)", (reviewer.normalize_for_filename(name),))
+    return cursor.lastrowid
+
+
+def test_get_or_create_id_match_key_column():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE circles (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, match_key TEXT)")
+    # match_key 未設定の行も照合対象になる
+    cur.execute("INSERT INTO circles (name) VALUES ('Foo★Bar')")
+    assert get_or_create_id(cur, "circles", "foobar") == 1
+
+    new_id = get_or_create_id(cur, "circles", "Ｂａｚ")
+    row = cur.execute("SELECT name, match_key FROM circles WHERE id = ?", (new_id,)).fetchone()
+    assert (row["name"], row["match_key"]) == ("Baz", "baz")
+    assert get_or_create_id(cur, "circles", "BAZ!") == new_id
+    conn.close()
+
+
+def test_get_or_create_id_cache_matches_reference():
+    names = ["Foo Bar", "foo-bar", "ＦＯＯ ＢＡＲ", "サークル", "さーくる", "サークル！", "A/B", "a b", "x", "X?"]
+    results = []
+    for use_cache in (False, True):
+        conn = sqlite3.connect(":memory:")
+        conn.row_factory = sqlite3.Row
+        cur = conn.cursor()
+        cur.execute("CREATE TABLE circles (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, match_key TEXT)")
+        cache = reviewer.MatchKeyCache() if use_cache else None
+        results.append([get_or_create_id(cur, "circles", n, cache) for n in names * 2])
+        conn.close()
+
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE circles (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE)")
+    expected = [reference_get_or_create_id(cur, "circles", n) for n in names * 2]
+    conn.close()
+
+    assert results[0] == expected
+    assert results[1] == expected
+
+
+def test_match_key_cache_loads_once():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE circles (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, match_key TEXT)")
+    cur.execute("INSERT INTO circles (name, match_key) VALUES ('Foo', 'foo')")
+    statements = []
+    conn.set_trace_callback(statements.append)
+    cache = reviewer.MatchKeyCache()
+    for _ in range(5):
+        assert get_or_create_id(cur, "circles", "FOO", cache) == 1
+    conn.set_trace_callback(None)
+    assert sum("FROM circles" in s for s in statements) == 1
+    conn.close()
+
+
+def test_apply_draft_to_works_resumes_after_crash(tmp_path, monkeypatch, capsys):
+    db_path = tmp_path / "test.sqlite"
+    patch_get_connection(monkeypatch, db_path)
+    conn = setup_db(db_path)
+    for i in range(1, 6):
+        conn.execute(
+            "INSERT INTO works (id, folder_path, original_name, image_count, status) VALUES (?, ?, 'n', 1, 'pending')",
+            (i, f"p{i}"),
+        )
+        conn.execute(
+            "INSERT INTO works_draft (work_id, circle_raw, title_raw) VALUES (?, ?, ?)",
+            (i, f"C{i}", f"T{i}"),
+        )
+    conn.commit()
+    conn.close()
+
+    original = reviewer.resolve_draft_ids
+
+    def crash_on_4(cur, row, cache):
+        if row["work_id"] == 4:
+            raise RuntimeError("crash")
+        return original(cur, row, cache)
+
+    monkeypatch.setattr(reviewer, "resolve_draft_ids", crash_on_4)
+    with pytest.raises(RuntimeError):
+        apply_draft_to_works(batch_size=2)
+
+    conn = sqlite3.connect(db_path)
+    titles = [r[0] for r in conn.execute("SELECT title FROM works ORDER BY id")]
+    checkpoint = conn.execute("SELECT last_id FROM job_checkpoints WHERE job = 'review'").fetchone()
+    circles = conn.execute("SELECT COUNT(*) FROM circles").fetchone()[0]
+    conn.close()
+    # 1チャンク目（id 1,2）は確定、2チャンク目は巻き戻し
+    assert titles == ["T1", "T2", None, None, None]
+    assert checkpoint == (2,)
+    assert circles == 2
+
+    monkeypatch.setattr(reviewer, "resolve_draft_ids", original)
+    capsys.readouterr()
+    apply_draft_to_works(batch_size=2)
+    out = capsys.readouterr().out
+    assert "work_id > 2" in out
+    assert "3 件を更新" in out
+
+    conn = sqlite3.connect(db_path)
+    titles = [r[0] for r in conn.execute("SELECT title FROM works ORDER BY id")]
+    remaining = conn.execute("SELECT COUNT(*) FROM job_checkpoints").fetchone()[0]
+    states = conn.execute("SELECT COUNT(*) FROM work_completion_state WHERE circle_id_done = 1").fetchone()[0]
+    conn.close()
+    assert titles == ["T1", "T2", "T3", "T4", "T5"]
+    assert remaining == 0
+    assert states == 5
+
+
+def test_apply_draft_to_works_restart(tmp_path, monkeypatch, capsys):
+    db_path = tmp_path / "test.sqlite"
+    patch_get_connection(monkeypatch, db_path)
+    conn = setup_db(db_path)
+    conn.execute("INSERT INTO works (id, folder_path, original_name, image_count, status) VALUES (1, 'p1', 'n', 1, 'pending')")
+    conn.execute("INSERT INTO works_draft (work_id, title_raw) VALUES (1, 'T1')")
+    conn.execute("INSERT INTO job_checkpoints (job, last_id, updated_at) VALUES ('review', 1, 'x')")
+    conn.commit()
+    conn.close()
+
+    apply_draft_to_works()
+    assert "0 件を更新" in capsys.readouterr().out
+
+    apply_draft_to_works(restart=True)
+    assert "1 件を更新" in capsys.readouterr().out
@@ -132,3 +132,202 @@ def test_non_dir_entries_skipped(tmp_path, monkeypatch):
 
     data = json.loads(json_path.read_text(encoding="utf-8"))
     assert data == []
+
+
+def test_incremental_scan_reuses_unchanged(tmp_path, monkeypatch):
+    db_path = tmp_path / "db.sqlite"
+    conn = setup_db(db_path)
+    base = tmp_path / "base"
+    base.mkdir()
+    conn.execute(
+        "INSERT INTO scan_targets (path, active) VALUES (?, 1)",
+        (str(base),),
+    )
+    conn.commit()
+    conn.close()
+
+    (base / "A").mkdir()
+    (base / "A" / "img.jpg").write_bytes(b"x")
+    (base / "B" / "sub").mkdir(parents=True)
+    (base / "B" / "sub" / "img.png").write_bytes(b"x")
+    (base / "C").mkdir()
+
+    patch_get_connection(monkeypatch, db_path)
+    monkeypatch.setattr(scanner, "datetime", FixedDatetime)
+    scanner.scan_and_export()
+
+    # 変更: B のサブディレクトリに追加、C を削除
+    (base / "B" / "sub" / "img2.png").write_bytes(b"x")
+    st = os.stat(base / "B" / "sub")
+    os.utime(base / "B" / "sub", ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    (base / "C").rmdir()
+
+    counted = []
+    original = scanner.scan_folder_tree
+
+    def tracking(path):
+        counted.append(Path(path).name)
+        return original(path)
+
+    monkeypatch.setattr(scanner, "scan_folder_tree", tracking)
+    scanner.scan_and_export(incremental=True)
+
+    assert counted == ["B"]
+    data = json.loads((base / "scan_20220102_0304.json").read_text(encoding="utf-8"))
+    counts = {rec["original_name"]: rec["image_count"] for rec in data}
+    assert counts == {"A": 1, "B": 2}
+
+    conn = sqlite3.connect(db_path)
+    paths = [r[0] for r in conn.execute("SELECT folder_path FROM folder_inventory")]
+    scanned_at = conn.execute("SELECT last_scanned_at FROM scan_targets").fetchone()[0]
+    conn.close()
+    assert sorted(Path(p).name for p in paths) == ["A", "B"]
+    assert scanned_at == "2022-01-02T03:04:00"
+
+
+def target_row(path, max_concurrency=None, last_scanned_at=None):
+    return {
+        "path": path,
+        "max_concurrency": max_concurrency,
+        "last_scanned_at": last_scanned_at,
+    }
+
+
+def test_plan_device_groups(monkeypatch, capsys):
+    devices = {"/hdd/a": 1, "/hdd/b": 1, "/ssd/a": 2, "/ssd/b": 2}
+
+    def _device_of(path):
+        if path not in devices:
+            raise FileNotFoundError(path)
+        return devices[path]
+
+    monkeypatch.setattr(scanner, "_device_of", _device_of)
+    rows = [
+        target_row("/ssd/a", None, "2024-01-03T00:00:00"),
+        target_row("/hdd/a", 1, "2024-01-02T00:00:00"),
+        target_row("/ssd/b", 8, None),
+        target_row("/hdd/b", None, "2024-01-01T00:00:00"),
+        target_row("/missing", None, None),
+    ]
+
+    groups = scanner.plan_device_groups(rows, default_limit=16)
+
+    # 未走査の対象を持つ SSD が先、デバイス内は古い順、上限は最小値
+    assert [(g.device, g.limit, g.targets) for g in groups] == [
+        (2, 8, ["/ssd/b", "/ssd/a"]),
+        (1, 1, ["/hdd/b", "/hdd/a"]),
+    ]
+    assert "[warn] base directory not found: /missing" in capsys.readouterr().out
+
+
+def test_run_device_groups_limits_workers(monkeypatch):
+    calls = []
+
+    def _walk(base_dir, cached, workers=None):
+        calls.append((base_dir, workers))
+        return scanner.BaseDirWalk(base_dir, 0, [], {}, 0)
+
+    monkeypatch.setattr(scanner, "walk_base_dir", _walk)
+    groups = [
+        scanner.DeviceGroup(1, 1, ["/hdd/a", "/hdd/b"]),
+        scanner.DeviceGroup(2, 8, ["/ssd/a"]),
+    ]
+    cached = {t: {} for g in groups for t in g.targets}
+
+    walks = list(scanner.run_device_groups(groups, cached))
+
+    assert sorted(w.base_dir for w in walks) == ["/hdd/a", "/hdd/b", "/ssd/a"]
+    assert sorted(calls) == [("/hdd/a", 1), ("/hdd/b", 1), ("/ssd/a", 8)]
+    # 同じデバイス上は登録順（古い順）に1件ずつ
+    assert [c[0] for c in calls if c[0].startswith("/hdd")] == ["/hdd/a", "/hdd/b"]
+
+
+def test_scan_multiple_targets_with_concurrency(tmp_path, monkeypatch):
+    db_path = tmp_path / "db.sqlite"
+    conn = setup_db(db_path)
+    bases = [tmp_path / "hdd", tmp_path / "ssd"]
+    for i, base in enumerate(bases):
+        (base / f"W{i}").mkdir(parents=True)
+        (base / f"W{i}" / "1.jpg").write_bytes(b"x")
+    conn.execute(
+        "INSERT INTO scan_targets (path, active, max_concurrency) VALUES (?, 1, 1)",
+        (str(bases[0]),),
+    )
+    conn.execute("INSERT INTO scan_targets (path, active) VALUES (?, 1)", (str(bases[1]),))
+    conn.commit()
+
+    # 別デバイス扱いにして並列経路を通す
+    monkeypatch.setattr(scanner, "_device_of", lambda path: Path(path).name)
+    results = dict(scanner.iter_scanned_targets(conn))
+
+    assert {base.name: [r["original_name"] for r in recs] for base, recs in results.items()} == {
+        "hdd": ["W0"],
+        "ssd": ["W1"],
+    }
+    assert conn.execute(
+        "SELECT COUNT(*) FROM scan_targets WHERE last_scanned_at IS NOT NULL"
+    ).fetchone()[0] == 2
+    conn.close()
+
+
+def test_ensure_folder_inventory_keeps_open_transaction(tmp_path):
+    conn = setup_db(tmp_path / "tx.sqlite")
+    conn.execute("INSERT INTO scan_targets (path, active) VALUES ('x', 1)")
+    # 共有接続の未確定の書き込みを COMMIT しない
+    scanner.ensure_folder_inventory(conn)
+    conn.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM scan_targets").fetchone()[0] == 0
+    conn.close()
+
+
+def test_scan_on_unmigrated_scan_targets(tmp_path):
+    # migration 11 より前の scan_targets（max_concurrency 列なし）
+    conn = sqlite3.connect(tmp_path / "old.sqlite")
+    conn.row_factory = sqlite3.Row
+    conn.execute(
+        """
+        CREATE TABLE scan_targets (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          path TEXT NOT NULL UNIQUE,
+          active BOOLEAN NOT NULL DEFAULT 1,
+          note TEXT DEFAULT NULL,
+          last_scanned_at TEXT
+        )
+        """
+    )
+    base = tmp_path / "base"
+    (base / "W").mkdir(parents=True)
+    conn.execute("INSERT INTO scan_targets (path, active) VALUES (?, 1)", (str(base),))
+    conn.commit()
+
+    results = dict(scanner.iter_scanned_targets(conn, workers=1))
+
+    assert [r["original_name"] for r in results[base]] == ["W"]
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(scan_targets)")]
+    assert "max_concurrency" in columns
+    conn.close()
+
+
+def test_map_folders_on_devices_uses_group_limits(monkeypatch):
+    calls = []
+
+    def fake_map_folders(func, folders, workers=None):
+        calls.append((sorted(os.fspath(f) for f in folders), workers))
+        return {os.fspath(f): func(f) for f in folders}
+
+    monkeypatch.setattr(scanner, "map_folders", fake_map_folders)
+    groups = [
+        scanner.DeviceGroup("hdd", 1, ["/hdd/a", "/hdd/b"]),
+        scanner.DeviceGroup("ssd", 8, ["/ssd/a"]),
+    ]
+    folders = ["/ssd/a/W3", "/hdd/a/W1", "/hdd/b/W2", "/other/W4"]
+
+    result = scanner.map_folders_on_devices(len, folders, groups, default_limit=4)
+
+    # 入力順を保ち、デバイスごとにその上限で処理する（どこにも属さないものは既定値）
+    assert list(result) == folders
+    assert sorted(calls) == [
+        (["/hdd/a/W1", "/hdd/b/W2"], 1),
+        (["/other/W4"], 4),
+        (["/ssd/a/W3"], 8),
+    ]
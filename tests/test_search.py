@@ -0,0 +1,111 @@
+import os
+import sys
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import db.search as search
+from db.search import ensure_search_index, rebuild_search_index, search_works
+
+
+def setup_db(path: Path):
+    with open(Path(__file__).resolve().parents[1] / "db" / "schema.sql", "r") as f:
+        schema = f.read()
+    conn = sqlite3.connect(path)
+    conn.executescript(schema)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def patch_get_connection(monkeypatch, path: Path):
+    @contextmanager
+    def _connect():
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    monkeypatch.setattr(search, "get_connection", _connect)
+
+
+def add_work(conn, work_id, original_name, title=None):
+    conn.execute(
+        "INSERT INTO works (id, folder_path, original_name, image_count, status, title)"
+        " VALUES (?, ?, ?, 0, 'pending', ?)",
+        (work_id, f"/base/{original_name}", original_name, title),
+    )
+
+
+def ids(conn, query, **kwargs):
+    return [row["id"] for row in search_works(conn, query, **kwargs)[1]]
+
+
+def test_triggers_keep_index_in_sync(tmp_path):
+    conn = setup_db(tmp_path / "test.sqlite")
+    add_work(conn, 1, "｛CG集｝[海鮮堂 (すし太郎)] まぐろの休日 (オリジナル)")
+    ensure_search_index(conn)
+    assert rebuild_search_index(conn) == 1
+
+    # 新規登録・draft の解析結果が反映される
+    add_work(conn, 2, "[別サークル] さーもんの休日")
+    conn.execute(
+        "INSERT INTO works_draft (work_id, circle_raw, author_raw, title_raw)"
+        " VALUES (1, '海鮮堂', 'すし太郎', 'まぐろの休日')"
+    )
+    assert ids(conn, "休日") == [1, 2]
+    assert ids(conn, "すし太郎") == [1]
+
+    # 辞書名の変更は中間テーブル経由で反映される
+    conn.execute("INSERT INTO circles (id, name) VALUES (10, '回転寿司工房')")
+    conn.execute("INSERT INTO work_circle_authors (work_id, circle_id) VALUES (2, 10)")
+    assert ids(conn, "回転寿司") == [2]
+    conn.execute("UPDATE circles SET name = '立ち食い工房' WHERE id = 10")
+    assert ids(conn, "回転寿司") == []
+    assert ids(conn, "立ち食い") == [2]
+
+    # 削除すると検索されない
+    conn.execute("DELETE FROM works WHERE id = 1")
+    assert ids(conn, "休日") == [2]
+
+
+def test_search_ranking_short_terms_and_paging(tmp_path):
+    conn = setup_db(tmp_path / "test.sqlite")
+    ensure_search_index(conn)
+    add_work(conn, 1, "まぐろ丼", title="いくら丼")
+    add_work(conn, 2, "いくら丼", title="いくら丼 特盛")
+    add_work(conn, 3, "いくら", title="うに")
+    for work_id in range(4, 30):
+        add_work(conn, work_id, f"ちらし寿司 {work_id}")
+
+    add_work(conn, 30, "いくら丼 大盛", title="まぐろ丼")
+    # title に一致する作品が original_name だけに一致する作品より上位
+    ranked = ids(conn, "いくら丼")
+    assert set(ranked[:2]) == {1, 2}
+    assert ranked[2] == 30
+    assert set(ids(conn, "いくら")) == {1, 2, 3, 30}
+    # 3文字未満は LIKE（記号もそのまま部分一致）
+    assert ids(conn, "丼 特") == [2]
+    assert ids(conn, "%") == []
+
+    total, rows = search_works(conn, "ちらし寿司", limit=10, offset=20)
+    assert total == 26
+    assert len(rows) == 6
+
+
+def test_print_search_results_builds_index(tmp_path, monkeypatch, capsys):
+    db_path = tmp_path / "test.sqlite"
+    conn = setup_db(db_path)
+    add_work(conn, 1, "[サークル] 検索できる作品")
+    conn.commit()
+    conn.close()
+    patch_get_connection(monkeypatch, db_path)
+
+    search.print_search_results("検索できる", limit=5)
+
+    out = capsys.readouterr().out
+    assert "検索インデックスを作成しました: 1 件" in out
+    assert "1 件（1/1 ページ）" in out
+    assert "[1]" in out
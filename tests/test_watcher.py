@@ -0,0 +1,286 @@
+import os
+import sys
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import sync.watcher as watcher
+
+requires_inotify = pytest.mark.skipif(
+    watcher.open_inotify() is None, reason="inotify が使えない環境"
+)
+
+
+def setup_db(path: Path):
+    with open(Path(__file__).resolve().parents[1] / "db" / "schema.sql", "r") as f:
+        schema = f.read()
+    conn = sqlite3.connect(path)
+    conn.executescript(schema)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def make_work(base: Path, name: str, images: int) -> Path:
+    folder = base / name
+    folder.mkdir()
+    for i in range(images):
+        (folder / f"{i}.jpg").write_bytes(b"x")
+    return folder
+
+
+def pump(w: watcher.FolderWatcher, rounds: int = 5):
+    "届いているイベントを処理してから、デバウンスを待たずに反映する"
+    for _ in range(rounds):
+        w.step(0.05)
+    return w.flush(float("inf"))
+
+
+def works(conn) -> dict[str, int]:
+    rows = conn.execute("SELECT folder_path, image_count FROM works").fetchall()
+    return {Path(row["folder_path"]).name: row["image_count"] for row in rows}
+
+
+@requires_inotify
+def test_watch_registers_new_folder(tmp_path):
+    base = tmp_path / "base"
+    base.mkdir()
+    conn = setup_db(tmp_path / "db.sqlite")
+    w = watcher.FolderWatcher(conn, [str(base)], debounce=0)
+    w.start()
+    assert w.base_by_wd and not w.polled
+
+    make_work(base, "new_work", 2)
+    pump(w)
+    assert works(conn) == {"new_work": 2}
+
+    # 監視中に現れたフォルダは中身の変化も拾う
+    (base / "new_work" / "2.png").write_bytes(b"x")
+    pump(w)
+    assert works(conn) == {"new_work": 3}
+    w.close()
+    conn.close()
+
+
+@requires_inotify
+def test_watch_rename_keeps_work(tmp_path):
+    base = tmp_path / "base"
+    base.mkdir()
+    conn = setup_db(tmp_path / "db.sqlite")
+    old = make_work(base, "before", 1)
+    w = watcher.FolderWatcher(conn, [str(base)], debounce=0)
+    w.start()
+    w.flush(float("inf"))
+    work_id = conn.execute("SELECT id FROM works").fetchone()[0]
+
+    old.rename(base / "after")
+    pump(w)
+
+    rows = conn.execute("SELECT id, folder_path FROM works").fetchall()
+    assert [(row["id"], Path(row["folder_path"]).name) for row in rows] == [(work_id, "after")]
+    inventory = {
+        Path(row[0]).name for row in conn.execute("SELECT folder_path FROM folder_inventory")
+    }
+    assert inventory == {"after"}
+    w.close()
+    conn.close()
+
+
+def test_watch_debounces_events(tmp_path):
+    base = tmp_path / "base"
+    base.mkdir()
+    conn = setup_db(tmp_path / "db.sqlite")
+    make_work(base, "busy", 1)
+    w = watcher.FolderWatcher(conn, [str(base)], debounce=5, force_poll=True)
+    w.next_poll = 1000.0
+
+    w.touch(str(base), str(base / "busy"), now=100.0)
+    w.touch(str(base), str(base / "busy"), now=103.0)
+    assert w.flush(now=106.0) == 0
+    assert w.next_timeout(now=106.0) == pytest.approx(2.0)
+    assert w.flush(now=108.0) == 1
+    assert works(conn) == {"busy": 1}
+    conn.close()
+
+
+def test_watch_polling_fallback(tmp_path):
+    base = tmp_path / "base"
+    base.mkdir()
+    conn = setup_db(tmp_path / "db.sqlite")
+    make_work(base, "existing", 1)
+    w = watcher.FolderWatcher(
+        conn, [str(base)], debounce=0, poll_interval=60, force_poll=True
+    )
+    assert w.inotify is None and list(w.polled) == [str(base)]
+
+    # 起動時に停止中の変更を拾う
+    w.start()
+    w.flush(float("inf"))
+    assert works(conn) == {"existing": 1}
+
+    make_work(base, "dropped", 3)
+    st = os.stat(base)
+    os.utime(base, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    # 間隔が来るまでは確認しない
+    w.poll_due(w.next_poll - 1)
+    assert w.flush(float("inf")) == 0
+    w.poll_due(w.next_poll)
+    w.flush(float("inf"))
+    assert works(conn) == {"existing": 1, "dropped": 3}
+    conn.close()
+
+
+def test_watch_keeps_works_of_vanished_folder(tmp_path):
+    base = tmp_path / "base"
+    base.mkdir()
+    conn = setup_db(tmp_path / "db.sqlite")
+    folder = make_work(base, "gone", 1)
+    w = watcher.FolderWatcher(conn, [str(base)], debounce=0, force_poll=True)
+    w.start()
+    w.flush(float("inf"))
+
+    (folder / "0.jpg").unlink()
+    folder.rmdir()
+    w.catch_up(str(base), 0.0)
+    w.flush(float("inf"))
+
+    assert works(conn) == {"gone": 1}
+    assert conn.execute("SELECT COUNT(*) FROM folder_inventory").fetchone()[0] == 0
+    conn.close()
+
+
+def test_filesystem_type_and_unescape():
+    assert watcher.filesystem_type("/") is not None
+    assert watcher._unescape_mount(b"/mnt/my\\040drive") == "/mnt/my drive"
+
+
+@requires_inotify
+def test_watch_rename_onto_kept_path(tmp_path):
+    base = tmp_path / "base"
+    base.mkdir()
+    conn = setup_db(tmp_path / "db.sqlite")
+    kept = make_work(base, "X", 1)
+    w = watcher.FolderWatcher(conn, [str(base)], debounce=0)
+    w.start()
+    w.flush(float("inf"))
+
+    # X が消えても works の行は残る
+    (kept / "0.jpg").unlink()
+    kept.rmdir()
+    pump(w)
+    make_work(base, "Z", 3)
+    pump(w)
+    assert works(conn) == {"X": 1, "Z": 3}
+
+    # 残っている X の行へ改名しても止まらず、X の行の画像数を更新する
+    (base / "Z").rename(base / "X")
+    pump(w)
+
+    assert not w.renames
+    assert works(conn) == {"X": 3, "Z": 3}
+    inventory = {
+        Path(row[0]).name for row in conn.execute("SELECT folder_path FROM folder_inventory")
+    }
+    assert inventory == {"X"}
+    w.close()
+    conn.close()
+
+
+def test_watch_rename_failure_keeps_running(tmp_path):
+    base = tmp_path / "base"
+    base.mkdir()
+    conn = setup_db(tmp_path / "db.sqlite")
+    w = watcher.FolderWatcher(conn, [str(base)], debounce=0, force_poll=True)
+    w.renames = [(str(base / "a"), str(base / "b")), (str(base / "c"), str(base / "d"))]
+    calls = []
+
+    def failing(old_path, new_path):
+        calls.append(old_path)
+        raise sqlite3.IntegrityError("UNIQUE constraint failed: works.folder_path")
+
+    w.apply_rename = failing
+    assert w.apply_renames() == 0
+    assert len(calls) == 2 and not w.renames
+    conn.close()
+
+
+def bump_mtime(path: Path):
+    "mtime の分解能が粗いファイルシステムでも変化が分かるようにする"
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+@requires_inotify
+def test_watch_existing_folder_contents(tmp_path):
+    base = tmp_path / "base"
+    base.mkdir()
+    conn = setup_db(tmp_path / "db.sqlite")
+    folder = make_work(base, "downloading", 1)
+    first = watcher.FolderWatcher(conn, [str(base)], debounce=0)
+    first.start()
+    first.flush(float("inf"))
+    first.close()
+
+    # 2回目の起動時には記録済み（新規ではない）フォルダでも中身の変化を拾う
+    w = watcher.FolderWatcher(conn, [str(base)], debounce=0)
+    w.start()
+    assert str(folder) in w.watched
+    (folder / "1.jpg").write_bytes(b"x")
+    pump(w)
+    assert works(conn) == {"downloading": 2}
+    w.close()
+    conn.close()
+
+
+def test_watch_polling_checks_folder_mtimes(tmp_path):
+    base = tmp_path / "base"
+    base.mkdir()
+    conn = setup_db(tmp_path / "db.sqlite")
+    folder = make_work(base, "existing", 1)
+    w = watcher.FolderWatcher(conn, [str(base)], debounce=0, force_poll=True)
+    w.start()
+    w.flush(float("inf"))
+    assert w.unwatched == {str(base): {str(folder)}}
+
+    # ベースディレクトリの mtime は変わらない（作品フォルダの中だけが変わる）
+    base_mtime = os.stat(base).st_mtime_ns
+    (folder / "1.jpg").write_bytes(b"x")
+    bump_mtime(folder)
+    os.utime(base, ns=(os.stat(base).st_atime_ns, base_mtime))
+
+    w.poll_due(w.next_poll)
+    w.flush(float("inf"))
+    assert works(conn) == {"existing": 2}
+    conn.close()
+
+
+@requires_inotify
+def test_watch_limit_falls_back_to_mtime(tmp_path, capsys):
+    base = tmp_path / "base"
+    base.mkdir()
+    conn = setup_db(tmp_path / "db.sqlite")
+    folder = make_work(base, "over_limit", 1)
+    w = watcher.FolderWatcher(conn, [str(base)], debounce=0)
+    real_add_watch = w.inotify.add_watch
+
+    def limited(path, mask):
+        if mask == watcher.FOLDER_MASK:
+            raise OSError(watcher.errno.ENOSPC, "No space left on device")
+        return real_add_watch(path, mask)
+
+    w.inotify.add_watch = limited
+    w.start()
+    w.flush(float("inf"))
+    assert "max_user_watches" in capsys.readouterr().out
+    assert w.unwatched == {str(base): {str(folder)}}
+
+    (folder / "1.jpg").write_bytes(b"x")
+    bump_mtime(folder)
+    w.poll_due(w.next_poll)
+    w.flush(float("inf"))
+    assert works(conn) == {"over_limit": 2}
+    w.close()
+    conn.close()
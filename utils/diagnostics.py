@@ -0,0 +1,212 @@
+"🍣"
+
+# utils/diagnostics.py
+#
+# main.py の全サブコマンド共通の計測オプション（--profile / --trace-malloc / --timings）。
+# 計測結果は LOG_DIR に <種類>_<サブコマンド>_YYYYmmdd_HHMMSS.* として保存する。
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import LOG_DIR, PROFILE_TOP_N, TRACEMALLOC_FRAMES
+
+
+class StageTimings:
+    "stage() で囲んだ区間ごとの回数・経過時間（wall）・CPU時間（プロセス全体）を集計する"
+
+    def __init__(self):
+        self.stages: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, wall: float, cpu: float):
+        with self._lock:
+            # [回数, wall 秒, CPU 秒]
+            entry = self.stages.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += wall
+            entry[2] += cpu
+
+    def report(self) -> list[dict]:
+        "区間の一覧（終わった順。全体の区間は最後）"
+        return [
+            {"stage": name, "calls": calls, "wall_sec": wall, "cpu_sec": cpu}
+            for name, (calls, wall, cpu) in self.stages.items()
+        ]
+
+    def print_report(self):
+        print("⏱ 区間ごとの所要時間（wall / CPU）")
+        for row in self.report():
+            print(
+                f" - {row['stage']:<28} {row['wall_sec']:8.3f}s / {row['cpu_sec']:8.3f}s"
+                f"  ×{row['calls']}"
+            )
+
+
+# --timings 指定中だけ設定される（未指定なら stage() は何もしない）
+_timings: StageTimings | None = None
+
+
+@contextmanager
+def stage(name: str):
+    """
+    処理の区間を計測する（--timings 指定時のみ）
+    - 同じ名前の区間はループ内で何度通っても1行に合算する
+    - CPU 時間はプロセス全体（スレッド並列の区間では wall を超えうる）
+    """
+    timings = _timings
+    if timings is None:
+        yield
+        return
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+
+def report_path(log_dir: str, kind: str, command: str, suffix: str) -> str:
+    "log_dir/<kind>_<command>_YYYYmmdd_HHMMSS.<suffix>"
+    os.makedirs(log_dir, exist_ok=True)
+    return os.path.join(
+        log_dir, f"{kind}_{command}_{datetime.now():%Y%m%d_%H%M%S}.{suffix}"
+    )
+
+
+def _callgrind_name(func: tuple) -> tuple[str, str]:
+    "pstats の (ファイル, 行, 関数名) → callgrind の (fl, fn)"
+    filename, lineno, name = func
+    if filename == "~":
+        # 組み込み関数（{built-in method ...}）
+        return "~", name
+    return filename, f"{name}:{lineno}"
+
+
+def write_callgrind(stats: pstats.Stats, path: str):
+    """
+    pstats の結果を callgrind 形式（KCachegrind / QCacheGrind で開ける）で書き出す
+    - コストはマイクロ秒。関数自身の時間と、呼び出し先ごとの累積時間を記録する
+    """
+    callees: dict[tuple, list] = {}
+    for func, (_cc, _nc, _tt, _ct, callers) in stats.stats.items():
+        for caller, (_ccc, calls, _ctt, cct) in callers.items():
+            callees.setdefault(caller, []).append((func, calls, cct))
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# callgrind format\nversion: 1\ncreator: doujin_archive\n")
+        f.write("events: Microseconds\n\n")
+        for func, (_cc, _nc, tt, _ct, _callers) in stats.stats.items():
+            fl, fn = _callgrind_name(func)
+            lineno = func[1]
+            f.write(f"fl={fl}\nfn={fn}\n{lineno} {int(tt * 1e6)}\n")
+            for callee, calls, cumulative in callees.get(func, []):
+                cfl, cfn = _callgrind_name(callee)
+                f.write(f"cfl={cfl}\ncfn={cfn}\ncalls={calls} {callee[1]}\n")
+                f.write(f"{lineno} {int(cumulative * 1e6)}\n")
+            f.write("\n")
+
+
+def _finish_profile(profiler: cProfile.Profile, command: str, log_dir: str):
+    "上位 PROFILE_TOP_N 件を表示し、.pstats と .callgrind を保存する"
+    stats = pstats.Stats(profiler)
+    pstats_path = report_path(log_dir, "profile", command, "pstats")
+    stats.dump_stats(pstats_path)
+    callgrind_path = pstats_path[: -len("pstats")] + "callgrind"
+    write_callgrind(stats, callgrind_path)
+
+    buffer = io.StringIO()
+    pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(
+        PROFILE_TOP_N
+    )
+    print(f"🔬 プロファイル（累積時間の上位 {PROFILE_TOP_N} 件）")
+    print(buffer.getvalue().strip())
+    print(f"📝 pstats: {pstats_path}")
+    print(f"📝 callgrind: {callgrind_path}")
+
+
+def _finish_tracemalloc(command: str, log_dir: str):
+    "確保量の多い行の上位 PROFILE_TOP_N 件とピークを表示・保存する"
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    snapshot = snapshot.filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        )
+    )
+    top = snapshot.statistics("traceback")[:PROFILE_TOP_N]
+
+    peak_mib, current_mib = peak / 1024 / 1024, current / 1024 / 1024
+    lines = [f"peak: {peak_mib:.1f} MiB / current: {current_mib:.1f} MiB"]
+    for index, stat in enumerate(top, 1):
+        lines.append(f"#{index}: {stat.size / 1024:.1f} KiB（{stat.count} 個）")
+        lines.extend(f"    {line}" for line in stat.traceback.format())
+    path = report_path(log_dir, "tracemalloc", command, "txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+    print(f"🧠 メモリ: ピーク {peak_mib:.1f} MiB（終了時 {current_mib:.1f} MiB）")
+    # 表示は確保した行ごとの集計（ファイルには呼び出し経路ごとの集計を保存）
+    for stat in snapshot.statistics("lineno")[:5]:
+        frame = stat.traceback[0]
+        print(f" - {stat.size / 1024:9.1f} KiB  {frame.filename}:{frame.lineno}")
+    print(f"📝 tracemalloc: {path}")
+
+
+def _finish_timings(timings: StageTimings, command: str, log_dir: str):
+    timings.print_report()
+    path = report_path(log_dir, "timings", command, "json")
+    with open(path, "w", encoding="utf-8") as f:
+        report = {"command": command, "stages": timings.report()}
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📝 timings: {path}")
+
+
+@contextmanager
+def diagnostics(
+    command: str,
+    profile: bool = False,
+    trace_malloc: bool = False,
+    timings: bool = False,
+    log_dir: str = LOG_DIR,
+):
+    """
+    サブコマンド1回分を計測し、終了時（例外時も）にレポートを表示・保存する
+    - profile: cProfile（このプロセスのメインスレッドのみ。analyze の子プロセスは含まない）
+    - trace_malloc: tracemalloc による確保量の上位とピーク
+    - timings: サブコマンド全体と、各処理の stage() 区間の wall / CPU 時間
+    計測なしの場合は何もしない
+    """
+    global _timings
+    if not (profile or trace_malloc or timings):
+        yield
+        return
+
+    if trace_malloc:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    if timings:
+        _timings = StageTimings()
+    profiler = cProfile.Profile() if profile else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        with stage(command):
+            yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if timings:
+            collected, _timings = _timings, None
+            _finish_timings(collected, command, log_dir)
+        if profiler is not None:
+            _finish_profile(profiler, command, log_dir)
+        if trace_malloc:
+            _finish_tracemalloc(command, log_dir)
@@ -2,25 +2,167 @@
 
 # utils/image_counter.py
 
+import hashlib
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Iterable, TypeVar
+
+from config import SCAN_WORKERS
 
 # 判定対象の画像拡張子（小文字）
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
 
+T = TypeVar("T")
+
+
+def is_image_name(name: str) -> bool:
+    """
+    ファイル名の拡張子が画像かどうかを判定する（Path を生成しない）
+    - 先頭のドットのみ（隠しファイル名）は拡張子とみなさない（Path.suffix と同じ）
+    """
+    idx = name.rfind(".")
+    if idx <= 0:
+        return False
+    return name[idx:].lower() in IMAGE_EXTENSIONS
+
+
+def _count_tree(root: str, dir_mtimes: dict[str, int] | None = None) -> int:
+    """
+    os.scandir によるスタック走査で画像数を数える
+    - os.walk と同様、シンボリックリンクのディレクトリには潜らない
+    - 読めないディレクトリは無視する
+    - dir_mtimes を渡すと、配下サブディレクトリの mtime_ns を相対パスで記録する
+    """
+    count = 0
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        if not entry.is_symlink():
+                            stack.append(entry.path)
+                            if dir_mtimes is not None:
+                                rel = os.path.relpath(entry.path, root)
+                                try:
+                                    dir_mtimes[rel] = entry.stat().st_mtime_ns
+                                except OSError:
+                                    dir_mtimes[rel] = -1
+                    elif is_image_name(entry.name):
+                        count += 1
+        except OSError:
+            continue
+    return count
+
 
 def count_images(folder_path: Path | str) -> int:
     """
     指定フォルダ以下の画像ファイル数を再帰的にカウントする。
     """
-    folder = Path(folder_path)
-    if not folder.exists() or not folder.is_dir():
+    folder = os.fspath(folder_path)
+    if not os.path.isdir(folder):
         return 0
+    return _count_tree(folder)
 
-    count = 0
-    for _root, _, files in os.walk(folder):
-        for file in files:
-            ext = Path(file).suffix.lower()
-            if ext in IMAGE_EXTENSIONS:
-                count += 1
-    return count
+
+def scan_folder_tree(folder_path: Path | str) -> tuple[int, dict[str, int]]:
+    """
+    画像数と、配下サブディレクトリの mtime_ns（相対パス → mtime_ns）を同時に取得する
+    - 増分スキャンの変更検出用（エントリの追加・削除・改名は親ディレクトリの mtime を更新する）
+    """
+    folder = os.fspath(folder_path)
+    dir_mtimes: dict[str, int] = {}
+    if not os.path.isdir(folder):
+        return 0, dir_mtimes
+    return _count_tree(folder, dir_mtimes), dir_mtimes
+
+
+def folder_fingerprint(folder_path: Path | str) -> str | None:
+    """
+    フォルダの中身の指紋（配下ファイルの相対パスとサイズの一覧のハッシュ）
+    - フォルダ名や置き場所には依存しないので、移動・改名の前後で同じ値になる
+    - 中身を読まないので、画像数のカウントと同程度のコストで済む
+    - ファイルが1つも無い、または読めない場合は None（空フォルダ同士を同一視しない）
+    """
+    root = os.fspath(folder_path)
+    entries = []
+    stack = [(root, "")]
+    while stack:
+        current, prefix = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append((entry.path, f"{prefix}{entry.name}/"))
+                        else:
+                            size = entry.stat(follow_symlinks=False).st_size
+                            entries.append(f"{prefix}{entry.name}\t{size}")
+                    except OSError:
+                        continue
+        except OSError:
+            if current == root:
+                return None
+            continue
+    if not entries:
+        return None
+    entries.sort()
+    data = "\n".join(entries).encode("utf-8", "surrogatepass")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def tree_unchanged(folder_path: Path | str, dir_mtimes: dict[str, int]) -> bool:
+    """
+    記録済みのサブディレクトリ mtime がすべて一致するか（一覧取得なしで stat のみ）
+    """
+    folder = os.fspath(folder_path)
+    for rel, mtime_ns in dir_mtimes.items():
+        try:
+            if os.stat(os.path.join(folder, rel)).st_mtime_ns != mtime_ns:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def map_folders(
+    func: Callable[[Path | str], T],
+    folders: Iterable[Path | str],
+    workers: int | None = None,
+) -> dict[str, T]:
+    """
+    フォルダごとの処理をスレッドプールで並列に実行する
+    - 戻り値は {os.fspath(folder): 結果}（入力順を保持）
+    """
+    targets = list(folders)
+    if not targets:
+        return {}
+
+    max_workers = max(1, min(workers or SCAN_WORKERS, len(targets)))
+    if max_workers == 1:
+        return {os.fspath(f): func(f) for f in targets}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(func, targets)
+        return {os.fspath(f): r for f, r in zip(targets, results)}
+
+
+def count_images_many(
+    folders: Iterable[Path | str],
+    workers: int | None = None,
+    counter: Callable[[Path | str], int] | None = None,
+) -> dict[str, int]:
+    """
+    複数フォルダの画像数をスレッドプールで並列にカウントする
+
+    - 走査はほぼ I/O 待ちなので、ディレクトリ読み取りを重ねることで短縮する
+    - プールはベースディレクトリ単位の呼び出しごとに、対象数に合わせて確保する
+    - 戻り値は {os.fspath(folder): 画像数}（入力順を保持）
+    """
+    return map_folders(counter or count_images, folders, workers=workers)
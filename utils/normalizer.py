@@ -2,6 +2,8 @@
 
 import unicodedata
 import re
+from functools import lru_cache
+from typing import Callable, Iterable
 
 # 禁止記号 → 全角置換（Windows準拠）
 FILENAME_REPLACEMENTS = {
@@ -16,17 +18,35 @@ FILENAME_REPLACEMENTS = {
     "|": "｜",
 }
 
+# 各正規化関数がメモ化する件数（辞書・フォルダ名の種類数より十分大きく）
+NORMALIZE_CACHE_SIZE = 65536
 
+# 事前コンパイル済みの正規表現・置換テーブル
+_WHITESPACE_RE = re.compile(r"\s+")
+_NON_WORD_RE = re.compile(r"[^\wぁ-んァ-ン一-龥]")
+_FILENAME_TABLE = str.maketrans(FILENAME_REPLACEMENTS)
+_FORBIDDEN_RE = re.compile("[" + re.escape("".join(FILENAME_REPLACEMENTS)) + "]")
+
+
+def _normalize_text(text: str) -> str:
+    "normalize_text の本体（メモ化なし。各正規化関数の内部で使う）"
+    if not text.isascii():
+        # NFKC で全角空白（U+3000）も半角になる
+        text = unicodedata.normalize("NFKC", text)
+    text = _WHITESPACE_RE.sub(" ", text)
+    return text.strip()
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_text(text: str) -> str:
     """
     一般的な正規化（Unicode正規化・空白処理）
+    - ASCII のみの文字列は NFKC で変化しないため、Unicode正規化を省略する
     """
-    text = unicodedata.normalize("NFKC", text)
-    text = text.replace("　", " ")
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
+    return _normalize_text(text)
 
 
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_for_matching(text: str) -> str:
     """
     照合キー用の厳密正規化（差異吸収を目的とする）
@@ -34,19 +54,32 @@ def normalize_for_matching(text: str) -> str:
     - 小文字化（case-folding）
     - 記号類はすべて削除（中黒・波ダッシュ含む）
     """
-    text = normalize_text(text)
+    text = _normalize_text(text)
     text = text.lower()
-    text = re.sub(r"[^\wぁ-んァ-ン一-龥]", "", text)
+    text = _NON_WORD_RE.sub("", text)
     return text
 
 
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_for_filename(text: str) -> str:
     """
     ファイル・フォルダ名として安全な正規化
     - normalize_text を適用
-    - 禁止記号を全角に置換
+    - 禁止記号を全角に置換（禁止記号を含む場合のみ str.translate で1パス）
     """
-    text = normalize_text(text)
-    for k, v in FILENAME_REPLACEMENTS.items():
-        text = text.replace(k, v)
-    return text
+    text = _normalize_text(text)
+    if _FORBIDDEN_RE.search(text) is None:
+        return text
+    return text.translate(_FILENAME_TABLE)
+
+
+def normalize_many(
+    texts: Iterable[str], normalizer: Callable[[str], str] = normalize_for_matching
+) -> list[str]:
+    """
+    複数の文字列をまとめて正規化する（入力と同じ順序のリストを返す）
+    - 重複する文字列は1回だけ正規化する
+    """
+    texts = list(texts)
+    results = {text: normalizer(text) for text in dict.fromkeys(texts)}
+    return [results[text] for text in texts]